@@ -0,0 +1,246 @@
+"""随时可用、可以取消的后台求解
+
+求解在单独的进程里进行，先用贪心最佳优先搜索很快给出一个解，再用权重逐步减小的
+加权 A*（权重降到 1 就是普通 A*）不断找推动次数更少的解。每一轮都只保留 g + h
+小于当前最好解长度的局面，某一轮搜完都没有找到更短的解，就证明当前解已经最优。
+
+进度通过管道发回主进程：
+
+    search = AnytimeSearch(layout).start()
+    search.poll()      # 不阻塞，返回新收到的 Progress 列表，适合每帧调用一次
+    search.cancel()    # 不阻塞，结束工作进程
+    reap_cancelled()   # 回收已经退出的工作进程，也适合每帧调用一次
+
+asyncio 程序可以直接用异步生成器，退出循环或取消任务时工作进程会被停止：
+
+    async for progress in solve_anytime(layout, time_limit=10):
+        print(progress.nodes, progress.pushes)
+"""
+
+import asyncio
+import heapq
+import multiprocessing
+import time
+from collections import namedtuple
+
+from solver import INF, SearchLimitReached, Solver
+
+# 依次使用的权重，None 表示只看启发值的贪心搜索
+WEIGHTS = (None, 5, 3, 2, 1.5, 1)
+
+# 每展开这么多个局面报告一次进度，同时检查是否被取消
+REPORT_INTERVAL = 1024
+
+Progress = namedtuple('Progress', 'nodes depth pushes moves optimal done')
+Progress.__doc__ = """求解进度
+
+nodes 是已展开的局面数，depth 是当前展开局面的推动次数，pushes 和 moves 是目前最好的解
+（推动次数和 LURD 字符串，还没有解时为 None），optimal 表示已经证明是最优解
+（pushes 为 None 时表示已经证明无解），done 表示这是最后一条消息。
+"""
+
+
+class AnytimeSolver(Solver):
+    """在工作进程中运行，把进度发到 connection"""
+
+    def __init__(self, layout, connection, cancel):
+        super().__init__(layout)
+        self.connection = connection
+        self.cancel = cancel
+        self.depth = 0
+        self.best = None
+        self.moves = None
+        self.optimal = False
+
+    def report(self, done=False):
+        self.connection.send(Progress(self.nodes, self.depth,
+                                      None if self.best is None else len(self.best),
+                                      self.moves, self.optimal, done))
+
+    def check_limits(self):
+        super().check_limits()
+        if not self.nodes % REPORT_INTERVAL:
+            if self.cancel.is_set():
+                raise SearchLimitReached()
+            self.report()
+
+    def weighted_astar(self, weight, bound):
+        """优先级为 g + weight * h 的 A*，只保留 g + h < bound 的局面，返回推动列表或 None"""
+        board = self.board
+        boxes = board.initial_boxes
+        region = self.reachable(boxes, board.initial_player)
+        key = (boxes, region & -region)
+        h = self.heuristic(boxes)
+        if h >= bound:
+            return None
+
+        def priority(cost, h):
+            return h if weight is None else cost + weight * h
+
+        best = {key: 0}
+        parents = {key: None}
+        counter = 0
+        heap = [(priority(0, h), 0, counter, key, region, h)]
+        while heap:
+            _, negative_cost, _, key, region, h = heapq.heappop(heap)
+            cost = -negative_cost
+            if best[key] < cost:
+                continue
+            if h == 0:
+                return self.trace_pushes(parents, key)
+            self.depth = cost
+            self.check_limits()
+
+            boxes = key[0]
+            child_cost = cost + 1
+            distances = self.distances
+            for box, dest, direction in self.pushes(boxes, region):
+                child_h = h - distances[box] + distances[dest]
+                if child_cost + child_h >= bound:
+                    continue
+                child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+                child_region = self.child_region(region, child_boxes, box, dest)
+                child_key = (child_boxes, child_region & -child_region)
+                if child_cost < best.get(child_key, INF):
+                    best[child_key] = child_cost
+                    parents[child_key] = (key, box, direction)
+                    counter += 1
+                    heapq.heappush(heap, (priority(child_cost, child_h), -child_cost, counter,
+                                          child_key, child_region, child_h))
+        return None
+
+    def run(self, time_limit=None, max_nodes=None):
+        """依次用各个权重搜索，直到证明最优、超出限制或被取消"""
+        if self.hopeless():
+            self.optimal = True
+            self.report(done=True)
+            return
+
+        self.deadline = None
+        if time_limit is not None:
+            self.deadline = time.monotonic() + time_limit
+        self.max_nodes = max_nodes
+        try:
+            for weight in WEIGHTS:
+                bound = INF if self.best is None else len(self.best)
+                pushes = self.weighted_astar(weight, bound)
+                if pushes is None:
+                    # 这一轮搜完了所有可能更短的局面
+                    self.optimal = True
+                    break
+                self.best = pushes
+                self.moves = self.to_moves(pushes)
+                self.optimal = weight == 1
+                self.report()
+        except SearchLimitReached:
+            pass
+        self.report(done=True)
+
+
+def run_worker(layout, boxes, player_pos, time_limit, max_nodes, connection, cancel):
+    """工作进程入口，boxes 和 player_pos 不为 None 时从这个局面开始求解"""
+    solver = AnytimeSolver(layout, connection, cancel)
+    board = solver.board
+    if boxes is not None:
+        board.initial_boxes = board.to_bits(boxes)
+        board.initial_player = board.index(*player_pos)
+    try:
+        solver.run(time_limit, max_nodes)
+    finally:
+        connection.close()
+
+
+# 已经取消、还没有回收的工作进程
+_cancelled = []
+
+
+def reap_cancelled():
+    """回收已经退出的工作进程，不阻塞，返回还没有退出的进程数"""
+    # is_alive() 发现进程已退出时会顺便回收它
+    _cancelled[:] = [process for process in _cancelled if process.is_alive()]
+    return len(_cancelled)
+
+
+class AnytimeSearch:
+    """主进程一侧的句柄：启动工作进程、不阻塞地读取进度、取消
+
+    子类可以换掉 worker，在同样管理的工作进程里运行别的搜索（例如 hint.HintSearch）。
+    worker 的参数是 self.args 加上管道的发送端和取消事件。
+    """
+
+    worker = staticmethod(run_worker)
+
+    def __init__(self, layout, boxes=None, player_pos=None, time_limit=10.0, max_nodes=None):
+        self.args = (list(layout), boxes and sorted(boxes), player_pos, time_limit, max_nodes)
+        self.process = None
+        self.connection = None
+        self.cancel_event = None
+        self.latest = None
+
+    def start(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        reap_cancelled()
+        self.cancel_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=self.worker, args=self.args + (sender, self.cancel_event), daemon=True)
+        self.process.start()
+        sender.close()
+        self.connection = receiver
+        return self
+
+    @property
+    def done(self):
+        return self.latest is not None and self.latest.done
+
+    def poll(self):
+        """返回新收到的进度列表，不阻塞"""
+        updates = []
+        connection = self.connection
+        if connection is None:
+            return updates
+        try:
+            while connection.poll():
+                updates.append(connection.recv())
+        except EOFError:
+            # 工作进程已经退出（正常结束时最后一条消息已经收到）
+            self.close()
+            last = updates[-1] if updates else self.latest
+            if last is None or not last.done:
+                last = last or Progress(0, 0, None, None, False, False)
+                updates.append(last._replace(done=True))
+        if updates:
+            self.latest = updates[-1]
+        return updates
+
+    def cancel(self):
+        """停止工作进程，不等待它退出，可以在界面线程里调用
+
+        进程由 reap_cancelled() 之后回收，start() 也会顺便回收。
+        """
+        self.close()
+        if self.process is None or self.cancel_event.is_set():
+            return
+        self.cancel_event.set()
+        if self.process.is_alive():
+            self.process.terminate()
+            _cancelled.append(self.process)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+async def solve_anytime(layout, boxes=None, player_pos=None, time_limit=10.0, max_nodes=None,
+                        poll_interval=0.05):
+    """异步生成器：在工作进程中求解，依次产生 Progress，最后一条的 done 为 True"""
+    search = AnytimeSearch(layout, boxes, player_pos, time_limit, max_nodes).start()
+    try:
+        while True:
+            for progress in search.poll():
+                yield progress
+                if progress.done:
+                    return
+            await asyncio.sleep(poll_interval)
+    finally:
+        search.cancel()
@@ -0,0 +1,139 @@
+"""批量推箱子环境
+
+同时保存 N 局游戏的状态，每次 step 用数组运算一次处理 N 个动作，
+规则与 engine.GameEngine.move_player 相同。所有关卡补齐到同样大小并在四周加一圈墙，
+格子用一维编号 y * stride + x 表示，移动就是给编号加上偏移量。
+
+观测、奖励和动作编号与 sokoban_env.SokobanEnv 一致。auto_reset 为 True 时，
+结束的游戏在这一步之后立即回到关卡开局，结束前的观测放在 info['final_observation']。
+"""
+
+import numpy as np
+
+from collection_analysis import PAD, level_masks, pack_levels
+from engine import DELTAS
+from levels import LEVELS
+from sokoban_env import (OBS_BOX, OBS_PLAYER, OBS_TARGET, OBS_WALL, REWARD_BOX_OFF_TARGET,
+                         REWARD_BOX_ON_TARGET, REWARD_SOLVED, REWARD_STEP)
+
+
+class BatchSokobanEnv:
+    """N 局游戏同时进行的向量化环境"""
+
+    def __init__(self, levels=None, max_steps=200, auto_reset=False):
+        grids, self.levels = pack_levels(LEVELS if levels is None else levels)
+
+        # 四周加一圈补齐格，补齐格和墙一样不可通行，移动时不需要检查越界
+        grids = np.pad(grids, ((0, 0), (1, 1), (1, 1)), constant_values=PAD)
+        masks = level_masks(grids)
+        count, self.height, self.stride = grids.shape
+        self.max_steps = max_steps
+        self.auto_reset = auto_reset
+
+        # 每个关卡的静态数据，形状都是 (关卡数, 格子数)
+        self.level_blocked = (~masks['floor']).reshape(count, -1)
+        self.level_targets = masks['targets'].reshape(count, -1)
+        self.level_boxes = masks['boxes'].reshape(count, -1)
+        self.level_player = masks['players'].reshape(count, -1).argmax(axis=1)
+
+        self.offsets = np.array([dy * self.stride + dx for dx, dy in DELTAS], dtype=np.int64)
+        self.level_ids = None
+
+    def reset(self, level_ids):
+        """开始 len(level_ids) 局新游戏，返回观测 (N, 高, 宽)"""
+        level_ids = np.asarray(level_ids, dtype=np.int64)
+        self.level_ids = level_ids
+        self.rows = np.arange(len(level_ids))
+        self.blocked = self.level_blocked[level_ids]
+        self.targets = self.level_targets[level_ids]
+        self.boxes = self.level_boxes[level_ids].copy()
+        self.player = self.level_player[level_ids].copy()
+        self.box_count = self.boxes.sum(axis=1)
+        self.boxes_on_targets = (self.boxes & self.targets).sum(axis=1)
+        self.moves = np.zeros(len(level_ids), dtype=np.int64)
+        self.pushes = np.zeros(len(level_ids), dtype=np.int64)
+        self.steps = np.zeros(len(level_ids), dtype=np.int64)
+        self.done = self.boxes_on_targets == self.box_count
+        return self.observations()
+
+    def reset_rows(self, mask):
+        """把 mask 选中的游戏恢复到各自关卡的开局"""
+        rows = self.rows[mask]
+        level_ids = self.level_ids[rows]
+        self.boxes[rows] = self.level_boxes[level_ids]
+        self.player[rows] = self.level_player[level_ids]
+        self.boxes_on_targets[rows] = (self.boxes[rows] & self.targets[rows]).sum(axis=1)
+        self.moves[rows] = 0
+        self.pushes[rows] = 0
+        self.steps[rows] = 0
+        self.done[rows] = self.boxes_on_targets[rows] == self.box_count[rows]
+
+    def observations(self):
+        """所有游戏的观测，格子的位标记与 SokobanEnv 相同"""
+        observation = (self.blocked * OBS_WALL + self.targets * OBS_TARGET
+                       + self.boxes * OBS_BOX).astype(np.uint8)
+        observation[self.rows, self.player] |= OBS_PLAYER
+        return observation.reshape(len(self.rows), self.height, self.stride)
+
+    def step(self, actions):
+        """每局执行一个动作（编号 0-3），返回 (observations, rewards, dones, info)
+
+        已经结束的游戏忽略动作，状态保持不变；auto_reset 为 True 时结束的游戏会立即重新开局，
+        返回的 dones 仍标出这一步结束的游戏，info 中的计数是重新开局之前的值。
+        """
+        if self.level_ids is None:
+            raise RuntimeError("请先调用 reset()")
+
+        rows = self.rows
+        offsets = self.offsets[np.asarray(actions, dtype=np.int64)]
+        new_pos = self.player + offsets
+        # 玩家四周一定有补齐格或墙，new_pos 不会越界；箱子目标位置需要截断后再判断
+        box_new_pos = np.clip(new_pos + offsets, 0, self.blocked.shape[1] - 1)
+
+        active = ~self.done
+        free = ~self.blocked[rows, new_pos]
+        has_box = self.boxes[rows, new_pos]
+        can_push = ~self.blocked[rows, box_new_pos] & ~self.boxes[rows, box_new_pos]
+        moved = active & free & (~has_box | can_push)
+        pushed = moved & has_box
+
+        # 推箱子
+        push_rows = rows[pushed]
+        old_box = new_pos[pushed]
+        new_box = box_new_pos[pushed]
+        self.boxes[push_rows, old_box] = False
+        self.boxes[push_rows, new_box] = True
+        change = np.zeros(len(rows), dtype=np.int64)
+        change[pushed] = (self.targets[push_rows, new_box].astype(np.int64)
+                          - self.targets[push_rows, old_box])
+        self.boxes_on_targets += change
+
+        self.player = np.where(moved, new_pos, self.player)
+        self.moves += moved
+        self.pushes += pushed
+        self.steps += active
+
+        solved = self.boxes_on_targets == self.box_count
+        rewards = np.where(active, REWARD_STEP, 0.0)
+        rewards += np.where(change > 0, REWARD_BOX_ON_TARGET, 0.0)
+        rewards += np.where(change < 0, REWARD_BOX_OFF_TARGET, 0.0)
+        rewards += np.where(active & solved, REWARD_SOLVED, 0.0)
+
+        self.done = solved.copy()
+        if self.max_steps is not None:
+            self.done = self.done | (self.steps >= self.max_steps)
+
+        done = self.done.copy()
+        info = {
+            'moved': moved,
+            'moves': self.moves,
+            'pushes': self.pushes,
+            'boxes_on_targets': self.boxes_on_targets,
+            'solved': solved,
+        }
+        if self.auto_reset and done.any():
+            info['final_observation'] = self.observations()
+            for name in ('moves', 'pushes', 'boxes_on_targets'):
+                info[name] = info[name].copy()
+            self.reset_rows(done)
+        return self.observations(), rewards, done, info
@@ -0,0 +1,196 @@
+"""推箱子位棋盘引擎
+
+与 engine.GameEngine 规则相同，但把墙、箱子和目标点压缩成整数位图，
+每个格子占一位。胜利判断、可达区域和状态复制都变成整数运算，
+适合搜索和批量回放这类需要保存大量状态的场景。
+
+格子编号为 y * stride + x，其中 stride = width + 1，
+每行末尾多出的一列始终不可通行，左右移位时不会从一行绕到另一行。
+"""
+
+from engine import DELTAS, DELTA_CODES, DIRECTIONS, PUSH_FLAG, decode_moves, parse_level
+
+
+class BitboardEngine:
+    """使用整数位图表示状态的游戏引擎"""
+
+    def __init__(self, layout):
+        self.layout = layout
+        walls, boxes, targets, player_pos, self.width, self.height = parse_level(layout)
+        self.stride = self.width + 1
+        self.size = self.stride * self.height
+
+        # 关卡范围内的所有格子
+        inside = 0
+        for y in range(self.height):
+            inside |= ((1 << self.width) - 1) << (y * self.stride)
+        self.walls = self.to_bits(walls) & inside
+        self.floor = inside & ~self.walls
+        self.targets = self.to_bits(targets) & inside
+
+        self.initial_boxes = self.to_bits(boxes) & inside
+        self.initial_player = self.index(*player_pos) if player_pos else -1
+
+        # 撤销/重做系统，编码与 GameEngine 相同，每步一个字节
+        self.history = bytearray()
+        self.cursor = 0
+
+        self.reset()
+
+    def index(self, x, y):
+        """坐标转换为格子编号"""
+        return y * self.stride + x
+
+    def position(self, index):
+        """格子编号转换为坐标"""
+        return index % self.stride, index // self.stride
+
+    def to_bits(self, positions):
+        """坐标集合转换为位图"""
+        bits = 0
+        for x, y in positions:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                bits |= 1 << self.index(x, y)
+        return bits
+
+    def to_positions(self, bits):
+        """位图转换为坐标集合"""
+        positions = set()
+        while bits:
+            low = bits & -bits
+            positions.add(self.position(low.bit_length() - 1))
+            bits ^= low
+        return positions
+
+    @property
+    def player_pos(self):
+        return self.position(self.player) if self.player >= 0 else None
+
+    @property
+    def boxes(self):
+        return self.to_positions(self.box_bits)
+
+    def reset(self):
+        """恢复到关卡初始状态，并清空移动记录"""
+        self.rewind()
+        self.history.clear()
+
+    def rewind(self):
+        """回到关卡初始状态，保留移动记录以便重做"""
+        self.box_bits = self.initial_boxes
+        self.player = self.initial_player
+        self.moves = 0
+        self.pushes = 0
+        self.cursor = 0
+
+    def undo(self):
+        """撤销上一步，返回是否成功"""
+        if not self.cursor:
+            return False
+        self.cursor -= 1
+        record = self.history[self.cursor]
+        dx, dy = DELTAS[record & 3]
+        shift = dy * self.stride + dx
+        if record & PUSH_FLAG:
+            self.box_bits ^= (1 << (self.player + shift)) | (1 << self.player)
+            self.pushes -= 1
+        self.player -= shift
+        self.moves -= 1
+        return True
+
+    def redo(self):
+        """重做被撤销的一步，返回是否成功"""
+        if self.cursor >= len(self.history):
+            return False
+        record = self.history[self.cursor]
+        dx, dy = DELTAS[record & 3]
+        shift = dy * self.stride + dx
+        self.player += shift
+        if record & PUSH_FLAG:
+            self.box_bits ^= (1 << self.player) | (1 << (self.player + shift))
+            self.pushes += 1
+        self.moves += 1
+        self.cursor += 1
+        return True
+
+    def solution(self):
+        """已执行步骤的 LURD 字符串"""
+        return decode_moves(self.history, self.cursor)
+
+    def move_player(self, dx, dy):
+        """移动玩家，规则与 GameEngine.move_player 相同，返回是否移动成功"""
+        if self.player < 0:
+            return False
+
+        # 越界或撞墙：目标格不在 floor 中
+        shift = dy * self.stride + dx
+        new_pos = self.player + shift
+        if new_pos < 0 or not (self.floor >> new_pos) & 1:
+            return False
+
+        # 推箱子
+        record = DELTA_CODES[(dx, dy)]
+        if (self.box_bits >> new_pos) & 1:
+            box_new_pos = new_pos + shift
+            if (box_new_pos < 0 or not (self.floor >> box_new_pos) & 1
+                    or (self.box_bits >> box_new_pos) & 1):
+                return False
+            self.box_bits ^= (1 << new_pos) | (1 << box_new_pos)
+            self.pushes += 1
+            record |= PUSH_FLAG
+
+        self.player = new_pos
+        self.moves += 1
+
+        # 记录这一步，新的移动会丢弃之前撤销掉的步
+        if self.cursor < len(self.history):
+            del self.history[self.cursor:]
+        self.history.append(record)
+        self.cursor += 1
+        return True
+
+    def check_win(self):
+        """检查是否所有箱子都在目标点上"""
+        return self.box_bits & ~self.targets == 0
+
+    def play(self, moves):
+        """按顺序执行一串 udlr 方向字符，返回成功执行的步数"""
+        done = 0
+        for char in moves:
+            dx, dy = DIRECTIONS[char]
+            if self.move_player(dx, dy):
+                done += 1
+        return done
+
+    def reachable(self, box_bits=None, player=None):
+        """返回玩家可以走到的格子位图（移位加掩码的泛洪填充）"""
+        if box_bits is None:
+            box_bits = self.box_bits
+        if player is None:
+            player = self.player
+        if player < 0:
+            return 0
+
+        free = self.floor & ~box_bits
+        stride = self.stride
+        region = 1 << player
+        while True:
+            grown = region | ((region << 1) | (region >> 1)
+                              | (region << stride) | (region >> stride)) & free
+            if grown == region:
+                return region
+            region = grown
+
+    def state(self):
+        """当前状态的整数表示，可直接用作字典键或保存副本"""
+        return (self.box_bits << self.size) | (self.player + 1)
+
+    def set_state(self, state):
+        """恢复 state() 返回的状态（不改变计数和移动记录）"""
+        self.box_bits = state >> self.size
+        self.player = (state & ((1 << self.size) - 1)) - 1
+
+    def normalized_state(self):
+        """把玩家位置归一化为可达区域中编号最小的格子，用于搜索去重"""
+        region = self.reachable()
+        return (self.box_bits << self.size) | (region & -region).bit_length()
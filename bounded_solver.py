@@ -0,0 +1,298 @@
+"""限定内存的推箱求解器
+
+Solver 的 A* 把所有访问过的局面都放在内存里，大关卡在时间用完之前先耗尽内存。
+BoundedSolver 按推动次数一层一层做广度优先搜索（结果仍是推动次数最少的解），
+内存只用于两样东西，都有固定上限：
+
+- 置换表：ClockTable，满了以后用时钟算法淘汰最近没有命中的局面，
+  只用来提前剪掉重复局面，被淘汰不影响正确性；
+- 下一层的缓冲区：攒够 run_size 条记录就排序后写成磁盘上的一个有序段。
+
+一层生成完后把所有有序段归并，去掉重复局面，再与已访问局面文件做一次归并连接
+去掉以前访问过的局面，得到下一层的文件。同时打开的有序段不超过 fan_in 个，
+段更多时先每 fan_in 个合并成一个，一轮一轮地减少段数。找到解以后在各层文件中二分查找父局面还原推动序列。
+
+记录是定长字节串，局面键 (箱子位图 << 16 | 区域最低位格子编号) 用大端编码，
+字节序就是数值序：
+
+    局面键(W 字节), 父局面键(W 字节), 箱子格 uint16, 方向 uint8
+"""
+
+import heapq
+import os
+import struct
+import tempfile
+import time
+
+from solver import SearchLimitReached, Solver
+
+DEFAULT_MEMORY_LIMIT = 256 * 2 ** 20
+
+# 估计的每个置换表条目和每条缓冲记录占用的内存（含 Python 对象开销）
+ENTRY_BYTES = 200
+RECORD_BYTES = 120
+
+MOVE = struct.Struct('>HB')
+ROOT_MOVE = MOVE.pack(0xFFFF, 0xFF)
+
+# 读文件时每次读入的记录数
+CHUNK_RECORDS = 4096
+
+# 归并时同时打开的有序段数上限
+MERGE_FAN_IN = 64
+
+
+class ClockTable:
+    """容量固定的局面集合，满了以后用时钟（second chance）算法淘汰
+
+    每个条目有一个引用位，命中时置位；指针扫过时引用位为 1 的条目清零后保留一轮，
+    为 0 的条目被淘汰。经常被重复生成的局面会一直留在表里。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = []
+        self.referenced = bytearray(capacity)
+        self.slots = {}
+        self.hand = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            return False
+        self.referenced[slot] = 1
+        return True
+
+    def add(self, key):
+        if key in self.slots:
+            return
+        if len(self.keys) < self.capacity:
+            self.slots[key] = len(self.keys)
+            self.keys.append(key)
+            return
+        referenced = self.referenced
+        while referenced[self.hand]:
+            referenced[self.hand] = 0
+            self.hand = (self.hand + 1) % self.capacity
+        del self.slots[self.keys[self.hand]]
+        self.evictions += 1
+        self.keys[self.hand] = key
+        self.slots[key] = self.hand
+        self.hand = (self.hand + 1) % self.capacity
+
+
+def read_records(path, size):
+    """按顺序读出文件中长度为 size 的记录"""
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(size * CHUNK_RECORDS)
+            if not data:
+                return
+            for offset in range(0, len(data), size):
+                yield data[offset:offset + size]
+
+
+def write_records(path, records):
+    with open(path, 'wb') as f:
+        f.write(b''.join(records))
+
+
+class BoundedSolver(Solver):
+    """内存占用不超过 memory_limit 字节（估计值）的推动最优求解器"""
+
+    def __init__(self, layout, memory_limit=DEFAULT_MEMORY_LIMIT, spill_dir=None,
+                 fan_in=MERGE_FAN_IN):
+        super().__init__(layout)
+        # 一半给置换表，一半给下一层的缓冲区
+        self.table_size = max(16, memory_limit // 2 // ENTRY_BYTES)
+        self.run_size = max(16, memory_limit // 2 // RECORD_BYTES)
+        self.spill_dir = spill_dir
+        self.fan_in = max(2, fan_in)
+        self.key_bytes = (self.board.size + 16 + 7) // 8
+        self.record_bytes = 2 * self.key_bytes + MOVE.size
+        self.runs_written = 0
+        self.merge_passes = 0
+
+    def encode(self, boxes, region):
+        low = region & -region
+        return ((boxes << 16) | (low.bit_length() - 1)).to_bytes(self.key_bytes, 'big')
+
+    def decode(self, key):
+        value = int.from_bytes(key, 'big')
+        return value >> 16, value & 0xFFFF
+
+    def is_solved(self, boxes):
+        return not boxes & ~self.targets
+
+    def spill(self, directory, buffer, runs):
+        """把缓冲区排序后写成一个有序段"""
+        buffer.sort()
+        path = os.path.join(directory, f'run{len(runs)}')
+        write_records(path, buffer)
+        runs.append(path)
+        self.runs_written += 1
+        buffer.clear()
+
+    def reduce_runs(self, directory, runs):
+        """有序段多于 fan_in 个时每 fan_in 个归并成一个（同时去重），返回不超过 fan_in 个的段"""
+        key_bytes, record_bytes = self.key_bytes, self.record_bytes
+        while len(runs) > self.fan_in:
+            merged = []
+            for start in range(0, len(runs), self.fan_in):
+                group = runs[start:start + self.fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                path = os.path.join(directory, f'pass{self.merge_passes}-{len(merged)}')
+                with open(path, 'wb') as out:
+                    previous = None
+                    for record in heapq.merge(*(read_records(run, record_bytes) for run in group)):
+                        key = record[:key_bytes]
+                        if key != previous:
+                            out.write(record)
+                            previous = key
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            runs = merged
+            self.merge_passes += 1
+        return runs
+
+    def merge_layer(self, directory, runs, visited_path, depth):
+        """归并有序段，去重并去掉已访问局面，写出下一层文件，返回 (层文件, 新的已访问文件, 局面数)"""
+        key_bytes, record_bytes = self.key_bytes, self.record_bytes
+        runs = self.reduce_runs(directory, runs)
+        layer_path = os.path.join(directory, f'layer{depth}')
+        merged_visited = os.path.join(directory, f'visited{depth}')
+        visited = read_records(visited_path, key_bytes)
+        seen = next(visited, None)
+        count = 0
+        with open(layer_path, 'wb') as layer, open(merged_visited, 'wb') as out:
+            previous = None
+            for record in heapq.merge(*(read_records(run, record_bytes) for run in runs)):
+                key = record[:key_bytes]
+                if key == previous:
+                    continue
+                previous = key
+                while seen is not None and seen < key:
+                    out.write(seen)
+                    seen = next(visited, None)
+                if seen == key:
+                    continue
+                layer.write(record)
+                out.write(key)
+                count += 1
+            while seen is not None:
+                out.write(seen)
+                seen = next(visited, None)
+        for run in runs:
+            os.remove(run)
+        os.remove(visited_path)
+        return layer_path, merged_visited, count
+
+    def find(self, path, key):
+        """在有序的层文件中二分查找局面键，返回记录"""
+        record_bytes = self.record_bytes
+        with open(path, 'rb') as f:
+            low, high = 0, os.path.getsize(path) // record_bytes
+            while low < high:
+                middle = (low + high) // 2
+                f.seek(middle * record_bytes)
+                record = f.read(record_bytes)
+                if record[:self.key_bytes] < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            f.seek(low * record_bytes)
+            return f.read(record_bytes)
+
+    def trace(self, layers, key):
+        """从第 len(layers) - 1 层的局面沿父局面回溯到根，返回推动列表"""
+        pushes = []
+        for path in reversed(layers[1:]):
+            record = self.find(path, key)
+            key = record[self.key_bytes:2 * self.key_bytes]
+            pushes.append(MOVE.unpack_from(record, 2 * self.key_bytes))
+        pushes.reverse()
+        return pushes
+
+    def external_bfs(self, directory):
+        """分层广度优先搜索，返回推动列表 [(箱子格, 方向编号), ...]，无解时返回 None"""
+        board = self.board
+        boxes = board.initial_boxes
+        if self.is_solved(boxes):
+            return []
+        root = self.encode(boxes, self.reachable(boxes, board.initial_player))
+
+        table = ClockTable(self.table_size)
+        table.add(root)
+        layers = [os.path.join(directory, 'layer0')]
+        write_records(layers[0], [root + root + ROOT_MOVE])
+        visited_path = os.path.join(directory, 'visited0')
+        write_records(visited_path, [root])
+
+        while True:
+            buffer = []
+            runs = []
+            for record in read_records(layers[-1], self.record_bytes):
+                key = record[:self.key_bytes]
+                boxes, player = self.decode(key)
+                region = self.reachable(boxes, player)
+                self.check_limits()
+                for box, dest, direction in self.pushes(boxes, region):
+                    child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+                    if self.is_solved(child_boxes):
+                        return self.trace(layers, key) + [(box, direction)]
+                    child_region = self.child_region(region, child_boxes, box, dest)
+                    child = self.encode(child_boxes, child_region)
+                    if child in table:
+                        continue
+                    table.add(child)
+                    buffer.append(child + key + MOVE.pack(box, direction))
+                    if len(buffer) >= self.run_size:
+                        self.spill(directory, buffer, runs)
+            if buffer:
+                self.spill(directory, buffer, runs)
+            if not runs:
+                return None
+            layer_path, visited_path, count = self.merge_layer(
+                directory, runs, visited_path, len(layers))
+            if not count:
+                return None
+            layers.append(layer_path)
+
+    def solve(self, max_nodes=None, time_limit=None):
+        """求推箱次数最少的解，返回 LURD 字符串；无解或超出限制时返回 None
+
+        参数与 Solver.solve 相同，但 max_nodes 和 time_limit 默认都不限：超过 max_nodes 个局面
+        直接放弃，不会像 Solver.solve 那样换一种搜索。
+        """
+        if self.hopeless():
+            return None
+
+        self.nodes = 0
+        self.runs_written = 0
+        self.merge_passes = 0
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        try:
+            with tempfile.TemporaryDirectory(prefix='sokoban-', dir=self.spill_dir) as directory:
+                pushes = self.external_bfs(directory)
+        except SearchLimitReached:
+            return None
+        finally:
+            self.max_nodes = None
+            self.deadline = None
+
+        if pushes is None:
+            return None
+        return self.to_moves(pushes)
+
+
+def solve_bounded(layout, memory_limit=DEFAULT_MEMORY_LIMIT, time_limit=None, spill_dir=None):
+    """在限定内存内求关卡的推箱最优解，返回 LURD 字符串或 None"""
+    return BoundedSolver(layout, memory_limit, spill_dir).solve(time_limit=time_limit)
@@ -0,0 +1,139 @@
+"""关卡合集批量静态分析
+
+把整个关卡合集装进一个补齐的 uint8 三维数组 (关卡数, 高, 宽)，
+墙/地面/目标点掩码、封闭性检查和统计数据都用 NumPy 向量运算一次算完，
+返回结构化数组，可以直接筛选和排序，例如：
+
+    results = analyze_levels(LEVELS)
+    results[~results['enclosed']]
+    np.sort(results, order='boxes')
+"""
+
+import numpy as np
+
+from levels import LEVELS, Level
+from structure import level_structure
+
+# 补齐区域的编码，与任何关卡字符都不同
+PAD = 0
+
+WALL, BOX, TARGET, PLAYER, BOX_ON_TARGET, PLAYER_ON_TARGET = b'#$.@*+'
+
+RESULT_DTYPE = np.dtype([
+    ('index', np.int32),
+    ('name', 'U32'),
+    ('width', np.int16),
+    ('height', np.int16),
+    ('walls', np.int32),
+    ('floor', np.int32),
+    ('interior', np.int32),
+    ('boxes', np.int32),
+    ('targets', np.int32),
+    ('boxes_on_targets', np.int32),
+    ('players', np.int32),
+    ('tunnels', np.int32),
+    ('articulations', np.int32),
+    ('goal_rooms', np.int32),
+    ('enclosed', np.bool_),
+    ('balanced', np.bool_),
+    ('valid', np.bool_),
+])
+
+
+def pack_levels(levels=None):
+    """把关卡列表装进 (N, H, W) 的 uint8 数组，超出关卡范围的格子为 PAD"""
+    if levels is None:
+        levels = LEVELS
+    levels = [level if isinstance(level, Level) else Level(level) for level in levels]
+
+    height = max((level.height for level in levels), default=0)
+    width = max((level.width for level in levels), default=0)
+    grids = np.full((len(levels), height, width), PAD, dtype=np.uint8)
+    for i, level in enumerate(levels):
+        if level.width:
+            grid = np.frombuffer(level.grid, dtype=np.uint8)
+            grids[i, :level.height, :level.width] = grid.reshape(level.height, level.width)
+    return grids, levels
+
+
+def level_masks(grids):
+    """返回各类格子的布尔掩码字典"""
+    boxes = (grids == BOX) | (grids == BOX_ON_TARGET)
+    targets = (grids == TARGET) | (grids == BOX_ON_TARGET) | (grids == PLAYER_ON_TARGET)
+    players = (grids == PLAYER) | (grids == PLAYER_ON_TARGET)
+    walls = grids == WALL
+    floor = (grids != PAD) & ~walls
+    return {
+        'walls': walls,
+        'floor': floor,
+        'boxes': boxes,
+        'targets': targets,
+        'players': players,
+    }
+
+
+def _neighbors(mask):
+    """每个格子上下左右是否有 mask 中的格子"""
+    grown = np.zeros_like(mask)
+    grown[:, 1:, :] |= mask[:, :-1, :]
+    grown[:, :-1, :] |= mask[:, 1:, :]
+    grown[:, :, 1:] |= mask[:, :, :-1]
+    grown[:, :, :-1] |= mask[:, :, 1:]
+    return grown
+
+
+def reachable_interior(floor, players):
+    """从玩家出发、只穿过地面格子（忽略箱子）能到达的区域，所有关卡同时扩展"""
+    region = players & floor
+    while True:
+        grown = region | (_neighbors(region) & floor)
+        if np.array_equal(grown, region):
+            return region
+        region = grown
+
+
+def border_cells(grids):
+    """关卡边缘的地面格子：在数组边上，或者与补齐区域相邻"""
+    outside = np.pad(grids == PAD, ((0, 0), (1, 1), (1, 1)), constant_values=True)
+    touches = (outside[:, :-2, 1:-1] | outside[:, 2:, 1:-1]
+               | outside[:, 1:-1, :-2] | outside[:, 1:-1, 2:])
+    return touches & (grids != PAD)
+
+
+def analyze_levels(levels=None):
+    """批量分析关卡合集，返回 RESULT_DTYPE 结构化数组"""
+    grids, levels = pack_levels(levels)
+    masks = level_masks(grids)
+    interior = reachable_interior(masks['floor'], masks['players'])
+
+    def count(mask):
+        return mask.sum(axis=(1, 2))
+
+    results = np.zeros(len(levels), dtype=RESULT_DTYPE)
+    results['index'] = np.arange(len(levels))
+    results['name'] = [level.name for level in levels]
+    results['width'] = [level.width for level in levels]
+    results['height'] = [level.height for level in levels]
+    results['walls'] = count(masks['walls'])
+    results['floor'] = count(masks['floor'])
+    results['interior'] = count(interior)
+    results['boxes'] = count(masks['boxes'])
+    results['targets'] = count(masks['targets'])
+    results['boxes_on_targets'] = count(masks['boxes'] & masks['targets'])
+    results['players'] = count(masks['players'])
+
+    # 结构特征逐个关卡计算，结果按布局缓存
+    structures = [level_structure(level) for level in levels]
+    results['tunnels'] = [len(structure.tunnels) for structure in structures]
+    results['articulations'] = [len(structure.articulations) for structure in structures]
+    results['goal_rooms'] = [len(structure.goal_rooms) for structure in structures]
+
+    # 玩家可达区域不接触边缘，说明关卡被墙完全包围
+    results['enclosed'] = ~(interior & border_cells(grids)).any(axis=(1, 2))
+    results['balanced'] = (results['boxes'] == results['targets']) & (results['boxes'] > 0)
+
+    # 所有箱子和目标点都在可达区域内
+    stray = ((masks['boxes'] | masks['targets']) & ~interior).any(axis=(1, 2))
+    results['valid'] = (results['enclosed'] & results['balanced']
+                        & (results['players'] == 1) & ~stray)
+    return results
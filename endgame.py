@@ -0,0 +1,203 @@
+"""残局库：离过关不超过 k 次推动的所有局面
+
+从 parse_level 给出的目标点出发（所有箱子都在目标点上的局面，目标点比箱子多时
+取所有摆法），用 pattern_db.pull_search 反向拉箱子做有界广度优先搜索，把 k 层以内
+的每个 (箱子位置, 玩家所在区域) 连同它到过关的精确推动次数记进哈希表。
+游戏中或分析时查到的局面直接得到精确的剩余推动次数。
+
+构建一个布局的表要搜索几十万个局面，所以在命令行离线进行，写到 ENDGAME_DIR 下
+以布局哈希命名的文件里。目录默认是仓库里的 endgame/，可以用环境变量
+SOKOBAN_ENDGAME_DIR 或在运行时修改 endgame.ENDGAME_DIR 换到别处：
+
+    python endgame.py                        # 为 levels 目录下的所有关卡构建
+    python endgame.py levels/level_5.json --depth 10
+
+游戏中只在后台线程读取已有的文件，不会构建：
+
+    db = endgame_database(layout)      # 立即返回，后台读取文件
+    db.lookup(boxes, player_pos)       # 未就绪、没有文件或不在表里时返回 None
+
+文件格式：
+
+    文件头  MAGIC, 版本, 布局哈希(16 字节), 要求层数, 完整层数, 箱子位图字节数, 记录数
+    记录    箱子位图（小端）, 区域最低位格子编号 uint16, 推动次数 uint8
+"""
+
+import argparse
+import os
+import struct
+import threading
+from itertools import combinations
+
+from bitboard import BitboardEngine
+from engine import parse_level
+from layout_cache import cached_by_layout
+from pattern_db import layout_hash, pull_search
+from reachability import Reachability
+
+MAGIC = b'SKEG'
+VERSION = 1
+HEADER = struct.Struct('<4sH16sHHHI')
+TAIL = struct.Struct('<HB')
+
+ENDGAME_DIR = (os.environ.get('SOKOBAN_ENDGAME_DIR')
+               or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame'))
+
+DEFAULT_DEPTH = 12
+# 局面数上限，超过时丢掉没有搜完的最后一层
+DEFAULT_MAX_STATES = 200000
+
+
+def build(layout, depth=DEFAULT_DEPTH, max_states=DEFAULT_MAX_STATES):
+    """反向搜索，返回 (完整层数, {(箱子位图, 区域最低位格子编号): 推动次数})"""
+    board = BitboardEngine(layout)
+    box_count = len(parse_level(layout)[1])
+    targets = [bit for bit in range(board.height * board.stride) if (board.targets >> bit) & 1]
+    placements = [sum(1 << bit for bit in placement)
+                  for placement in combinations(targets, box_count)]
+
+    table = {}
+    complete = depth
+    for boxes, region, level in pull_search(layout, placements, depth):
+        if len(table) >= max_states:
+            # 第 level 层没有搜完，只保留前面完整的层，表里的距离仍然都是精确的
+            complete = level - 1
+            table = {key: value for key, value in table.items() if value < level}
+            break
+        table[(boxes, (region & -region).bit_length() - 1)] = level
+    return max(complete, 0), table
+
+
+def endgame_path(layout, directory=None):
+    """残局库文件路径，directory 为 None 时使用当前的 ENDGAME_DIR"""
+    if directory is None:
+        directory = ENDGAME_DIR
+    return os.path.join(directory, f"{layout_hash(layout).hex()}.egdb")
+
+
+def write(layout, requested, depth, table, path):
+    """写入残局库文件，先写临时文件再替换"""
+    board = BitboardEngine(layout)
+    width = (board.height * board.stride + 7) // 8
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, layout_hash(layout), requested, depth, width,
+                            len(table)))
+        for (boxes, low), distance in table.items():
+            f.write(boxes.to_bytes(width, 'little'))
+            f.write(TAIL.pack(low, distance))
+    os.replace(temporary, path)
+
+
+def read(layout, path):
+    """读取残局库文件，返回 (要求层数, 完整层数, 表)；文件不对时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, digest, requested, depth, width, count = HEADER.unpack_from(data)
+    record = width + TAIL.size
+    if (magic != MAGIC or version != VERSION or digest != layout_hash(layout)
+            or len(data) != HEADER.size + count * record):
+        return None
+    table = {}
+    for offset in range(HEADER.size, len(data), record):
+        boxes = int.from_bytes(data[offset:offset + width], 'little')
+        low, distance = TAIL.unpack_from(data, offset + width)
+        table[(boxes, low)] = distance
+    return requested, depth, table
+
+
+class EndgameDatabase:
+    """单个布局的残局库，start() 之后在后台线程中加载
+
+    build 为 False 时只读取已有的文件（层数比 depth 少也照用），没有文件时表为 None。
+    """
+
+    def __init__(self, layout, depth=DEFAULT_DEPTH, directory=None,
+                 max_states=DEFAULT_MAX_STATES, build=True):
+        self.layout = list(layout)
+        self.requested_depth = depth
+        self.max_states = max_states
+        self.build = build
+        self.path = endgame_path(layout, directory)
+        self.reach = Reachability(layout)
+        self.depth = 0
+        self.table = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.load, daemon=True)
+            self.thread.start()
+        return self
+
+    def load(self):
+        """读文件，没有或当初要求的层数不够时重新构建并保存（build 为 False 时不构建）"""
+        try:
+            result = read(self.layout, self.path)
+            if result is None and not self.build:
+                return
+            if self.build and (result is None or result[0] < self.requested_depth):
+                depth, table = build(self.layout, self.requested_depth, self.max_states)
+                try:
+                    write(self.layout, self.requested_depth, depth, table, self.path)
+                except OSError as e:
+                    print(f"保存残局库失败：{e}")
+            else:
+                _, depth, table = result
+            self.depth, self.table = depth, table
+        finally:
+            self.ready.set()
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def distance(self, boxes, player):
+        """位图形式的查询：boxes 是箱子位图，player 是格子编号"""
+        table = self.table
+        if table is None or player < 0:
+            return None
+        region = self.reach.region(boxes, player)
+        return table.get((boxes, (region & -region).bit_length() - 1))
+
+    def lookup(self, boxes, player_pos):
+        """箱子 (x, y) 集合和玩家位置 -> 精确的剩余推动次数，未命中时返回 None"""
+        if self.table is None or player_pos is None:
+            return None
+        board = self.reach.board
+        return self.distance(board.to_bits(boxes), board.index(*player_pos))
+
+
+# 一个残局库最多有 DEFAULT_MAX_STATES 个局面，只保留最近用过的几个
+@cached_by_layout(capacity=4)
+def endgame_database(layout, depth=DEFAULT_DEPTH):
+    """返回布局的残局库并开始在后台读取已有的文件，不构建，按布局缓存"""
+    return EndgameDatabase(layout, depth, build=False).start()
+
+
+def main():
+    from levels import LEVELS, load_level_file
+
+    parser = argparse.ArgumentParser(description="离线构建残局库文件")
+    parser.add_argument('levels', nargs='*', help="关卡 JSON 文件，不指定时使用 levels 目录下的所有关卡")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="离过关最多几次推动")
+    parser.add_argument('--max-states', type=int, default=DEFAULT_MAX_STATES, help="局面数上限")
+    parser.add_argument('--directory', help="输出目录，默认是 ENDGAME_DIR")
+    args = parser.parse_args()
+
+    levels = [load_level_file(path, path) for path in args.levels] if args.levels else LEVELS
+    for level in levels:
+        database = EndgameDatabase(level, args.depth, args.directory, args.max_states)
+        database.load()
+        print(f"{level.name}：{len(database.table)} 个局面，完整 {database.depth} 层 -> {database.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
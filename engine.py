@@ -0,0 +1,436 @@
+"""推箱子无界面游戏引擎
+
+这里只包含游戏规则和状态，不依赖 pygame，也不读写任何全局关卡列表，
+可以在工作进程中大量创建并快速步进，用于批量回放、求解和数据分析。
+sokoban.Sokoban 只是在它之上加了一层界面。
+"""
+
+import random
+
+from layout_cache import cached_by_layout
+
+# 方向字符 -> (dx, dy)，大写字母表示推动箱子的移动（LURD 格式）
+DIRECTIONS = {
+    'u': (0, -1),
+    'd': (0, 1),
+    'l': (-1, 0),
+    'r': (1, 0),
+    'U': (0, -1),
+    'D': (0, 1),
+    'L': (-1, 0),
+    'R': (1, 0),
+}
+
+# (dx, dy) -> 方向字符
+DIRECTION_CHARS = {
+    (0, -1): 'u',
+    (0, 1): 'd',
+    (-1, 0): 'l',
+    (1, 0): 'r',
+}
+
+# 移动记录的编码：低两位是 DELTAS 中的方向编号，PUSH_FLAG 表示这一步推动了箱子
+DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+DELTA_CODES = {delta: code for code, delta in enumerate(DELTAS)}
+PUSH_FLAG = 4
+
+
+# Zobrist 随机数种子固定，同一关卡在不同进程中的哈希值相同，可以跨进程缓存
+ZOBRIST_SEED = 20240120
+_zobrist_tables = {}
+
+
+def zobrist_tables(width, height):
+    """返回 (箱子键表, 玩家键表)，按 (width, height) 缓存"""
+    tables = _zobrist_tables.get((width, height))
+    if tables is None:
+        rng = random.Random(ZOBRIST_SEED)
+        cells = [(x, y) for y in range(height) for x in range(width)]
+        box_keys = {cell: rng.getrandbits(64) for cell in cells}
+        player_keys = {cell: rng.getrandbits(64) for cell in cells}
+        tables = _zobrist_tables[(width, height)] = (box_keys, player_keys)
+    return tables
+
+
+@cached_by_layout()
+def dead_squares(layout):
+    """箱子推进去就再也到不了任何目标点的格子集合，按布局缓存
+
+    就是 push_distances 距离表里到最近目标点不可达的非墙格子。目标点本身永远不是死格。
+    """
+    # push_distances 依赖本模块的 parse_level，在这里导入避免循环导入
+    from push_distances import UNREACHABLE, push_distances
+    table = push_distances(layout)
+    walls = parse_level(layout)[0]
+    return frozenset(
+        (x, y) for y in range(table.height) for x in range(table.width)
+        if (x, y) not in walls and table.nearest[y * table.width + x] == UNREACHABLE)
+
+
+def freeze_deadlock_bits(boxes, box, floor, dead, targets, stride):
+    """推到格子 box 的箱子是否造成冻结死锁，boxes、floor、dead、targets 都是位图
+
+    箱子在水平和竖直方向上都推不动就是冻结的。某个方向推不动的条件：
+    一侧是墙，或两侧都是死格，或一侧是冻结的箱子。检查相邻箱子时，
+    正在检查的箱子当作墙。只要有冻结的箱子不在目标点上，关卡就无法完成。
+
+    格子编号为 y * stride + x，与 bitboard.BitboardEngine 相同。
+    GameEngine.freeze_deadlock 和提示搜索共用这一个实现。
+    """
+    frozen = []
+    if _frozen_bits(boxes, box, floor, dead, stride, set(), frozen):
+        return any(not (targets >> cell) & 1 for cell in frozen)
+    return False
+
+
+def _frozen_bits(boxes, box, floor, dead, stride, path, frozen):
+    path.add(box)
+    result = True
+    for shift in (1, stride):
+        before, after = box - shift, box + shift
+        if (before < 0 or before in path or after in path
+                or not (floor >> before) & 1 or not (floor >> after) & 1
+                or ((dead >> before) & 1 and (dead >> after) & 1)
+                or ((boxes >> before) & 1
+                    and _frozen_bits(boxes, before, floor, dead, stride, path, frozen))
+                or ((boxes >> after) & 1
+                    and _frozen_bits(boxes, after, floor, dead, stride, path, frozen))):
+            continue
+        result = False
+        break
+    path.discard(box)
+    if result:
+        frozen.append(box)
+    return result
+
+
+def decode_moves(log, end=None):
+    """把移动记录转换为 LURD 字符串，推箱子的步用大写字母"""
+    chars = []
+    for record in log[:end]:
+        char = DIRECTION_CHARS[DELTAS[record & 3]]
+        chars.append(char.upper() if record & PUSH_FLAG else char)
+    return ''.join(chars)
+
+
+def parse_level(layout):
+    """解析关卡布局
+
+    layout: 字符串列表，支持 # $ . @ * + 和空格
+    返回 (walls, boxes, targets, player_pos, width, height)
+    """
+    walls = set()
+    boxes = set()
+    targets = set()
+    player_pos = None
+
+    width = len(layout[0]) if layout else 0
+    height = len(layout)
+
+    for y, row in enumerate(layout):
+        for x, cell in enumerate(row):
+            if cell == '#':
+                walls.add((x, y))
+            elif cell == '$':
+                boxes.add((x, y))
+            elif cell == '.':
+                targets.add((x, y))
+            elif cell == '@':
+                player_pos = (x, y)
+            elif cell == '*':  # 箱子在目标点上
+                boxes.add((x, y))
+                targets.add((x, y))
+            elif cell == '+':  # 玩家在目标点上
+                player_pos = (x, y)
+                targets.add((x, y))
+
+    return walls, boxes, targets, player_pos, width, height
+
+
+class GameEngine:
+    """单个关卡的规则与状态
+
+    collapse_loops 为 True 时，玩家回到之前出现过的局面（箱子和玩家位置都相同），
+    移动记录会直接截断到那个局面，中间绕的圈不再占用撤销历史。
+    """
+
+    def __init__(self, layout, collapse_loops=False):
+        self.layout = layout
+        self.collapse_loops = collapse_loops
+        (self.walls, boxes, self.targets, player_pos,
+         self.width, self.height) = parse_level(layout)
+        self.initial_boxes = frozenset(boxes)
+        self.initial_player_pos = player_pos
+        self.box_count = len(boxes)
+        self.initial_boxes_on_targets = len(self.initial_boxes & self.targets)
+        self.dead_squares = dead_squares(layout)
+        self.initial_boxes_on_dead = len(self.initial_boxes & self.dead_squares)
+
+        # 冻结判定在位图上进行，格子编号与 bitboard.BitboardEngine 相同
+        self.stride = self.width + 1
+        self.floor_bits = self.to_bits(
+            (x, y) for y in range(self.height) for x in range(self.width)
+            if (x, y) not in self.walls)
+        self.dead_bits = self.to_bits(self.dead_squares)
+        self.target_bits = self.to_bits(self.targets)
+
+        # Zobrist 哈希：箱子部分随推动增量维护，玩家部分按需叠加
+        grid_width = max((len(row) for row in layout), default=0)
+        self.box_keys, self.player_keys = zobrist_tables(grid_width, self.height)
+        self.initial_box_hash = 0
+        for box in self.initial_boxes:
+            self.initial_box_hash ^= self.box_keys[box]
+
+        # 局面哈希 -> 移动记录下标，用于发现绕圈
+        self.seen = {}
+        self.hashes = []
+
+        # 撤销/重做系统：每一步只记录一个字节，history[:cursor] 是已执行的步
+        self.history = bytearray()
+        self.cursor = 0
+
+        self.initial_frozen = False
+        self.reset()
+        # 开局就有冻结在目标点外的箱子，关卡同样无法完成
+        self.initial_frozen = any(self.freeze_deadlock(box)
+                                  for box in self.initial_boxes - self.targets)
+        if self.initial_frozen:
+            self.frozen_at = 0
+
+    def reset(self):
+        """恢复到关卡初始状态，并清空移动记录"""
+        self.rewind()
+        self.history.clear()
+        self.seen.clear()
+        self.hashes.clear()
+        if self.collapse_loops:
+            self.hashes.append(self.hash)
+            self.seen[self.hash] = 0
+
+    def rewind(self):
+        """回到关卡初始状态，保留移动记录以便重做"""
+        self.boxes = set(self.initial_boxes)
+        self.player_pos = self.initial_player_pos
+        self.moves = 0
+        self.pushes = 0
+        # 已经在目标点上的箱子数，随移动增量更新
+        self.boxes_on_targets = self.initial_boxes_on_targets
+        # 在死格上的箱子数，大于 0 说明关卡已经无法完成
+        self.boxes_on_dead = self.initial_boxes_on_dead
+        # 出现冻结死锁的那一步执行后的 cursor，撤销到它之前时清除
+        self.frozen_at = 0 if self.initial_frozen else None
+        self.box_hash = self.initial_box_hash
+        self.region_key = None
+        self.cursor = 0
+
+    def undo(self):
+        """撤销上一步，返回是否成功"""
+        if not self.cursor:
+            return False
+        self.cursor -= 1
+        record = self.history[self.cursor]
+        dx, dy = DELTAS[record & 3]
+        x, y = self.player_pos
+        previous_pos = (x - dx, y - dy)
+
+        # 把箱子拉回玩家当前的位置
+        if record & PUSH_FLAG:
+            box_pos = (x + dx, y + dy)
+            self.boxes.remove(box_pos)
+            self.boxes.add(self.player_pos)
+            self.pushes -= 1
+            targets = self.targets
+            self.boxes_on_targets += (self.player_pos in targets) - (box_pos in targets)
+            dead = self.dead_squares
+            self.boxes_on_dead += (self.player_pos in dead) - (box_pos in dead)
+            self.box_hash ^= self.box_keys[box_pos] ^ self.box_keys[self.player_pos]
+            self.region_key = None
+
+        self.player_pos = previous_pos
+        self.moves -= 1
+        if self.frozen_at is not None and self.cursor < self.frozen_at:
+            self.frozen_at = None
+        return True
+
+    def redo(self):
+        """重做被撤销的一步，返回是否成功"""
+        if self.cursor >= len(self.history):
+            return False
+        record = self.history[self.cursor]
+        dx, dy = DELTAS[record & 3]
+        x, y = self.player_pos
+        new_pos = (x + dx, y + dy)
+
+        # 记录中的步一定合法，直接重放
+        if record & PUSH_FLAG:
+            box_new_pos = (x + 2 * dx, y + 2 * dy)
+            self.boxes.remove(new_pos)
+            self.boxes.add(box_new_pos)
+            self.pushes += 1
+            targets = self.targets
+            self.boxes_on_targets += (box_new_pos in targets) - (new_pos in targets)
+            dead = self.dead_squares
+            self.boxes_on_dead += (box_new_pos in dead) - (new_pos in dead)
+            self.box_hash ^= self.box_keys[new_pos] ^ self.box_keys[box_new_pos]
+            self.region_key = None
+
+        self.player_pos = new_pos
+        self.moves += 1
+        self.cursor += 1
+        if record & PUSH_FLAG and self.frozen_at is None and self.freeze_deadlock(box_new_pos):
+            self.frozen_at = self.cursor
+        return True
+
+    def solution(self):
+        """已执行步骤的 LURD 字符串"""
+        return decode_moves(self.history, self.cursor)
+
+    def move_player(self, dx, dy):
+        """移动玩家
+        dx, dy: 移动方向 (-1,0)左, (1,0)右, (0,-1)上, (0,1)下
+        返回是否移动成功
+        """
+        if self.player_pos is None:
+            return False
+
+        new_x = self.player_pos[0] + dx
+        new_y = self.player_pos[1] + dy
+
+        # 检查是否越界
+        if not (0 <= new_x < self.width and 0 <= new_y < self.height):
+            return False
+
+        # 检查是否撞墙
+        new_pos = (new_x, new_y)
+        if new_pos in self.walls:
+            return False
+
+        # 检查是否推箱子
+        boxes = self.boxes
+        record = DELTA_CODES[(dx, dy)]
+        if new_pos in boxes:
+            box_new_x = new_x + dx
+            box_new_y = new_y + dy
+            if not (0 <= box_new_x < self.width and 0 <= box_new_y < self.height):
+                return False
+
+            box_new_pos = (box_new_x, box_new_y)
+            if box_new_pos in self.walls or box_new_pos in boxes:
+                return False
+
+            boxes.remove(new_pos)
+            boxes.add(box_new_pos)
+            self.pushes += 1
+            targets = self.targets
+            self.boxes_on_targets += (box_new_pos in targets) - (new_pos in targets)
+            dead = self.dead_squares
+            self.boxes_on_dead += (box_new_pos in dead) - (new_pos in dead)
+            self.box_hash ^= self.box_keys[new_pos] ^ self.box_keys[box_new_pos]
+            self.region_key = None
+            record |= PUSH_FLAG
+
+        self.player_pos = new_pos
+        self.moves += 1
+
+        # 记录这一步，新的移动会丢弃之前撤销掉的步
+        if self.cursor < len(self.history):
+            self.truncate_history(self.cursor)
+        self.history.append(record)
+        self.cursor += 1
+
+        # 只检查刚推动的箱子附近，每次推动只需几次集合查询
+        if record & PUSH_FLAG and self.frozen_at is None and self.freeze_deadlock(box_new_pos):
+            self.frozen_at = self.cursor
+
+        if self.collapse_loops:
+            position_hash = self.hash
+            index = self.seen.get(position_hash)
+            if index is None:
+                self.hashes.append(position_hash)
+                self.seen[position_hash] = self.cursor
+            else:
+                # 回到了之前的局面，去掉中间绕的圈
+                self.truncate_history(index)
+                self.cursor = index
+                if self.frozen_at is not None and index < self.frozen_at:
+                    self.frozen_at = None
+        return True
+
+    def truncate_history(self, end):
+        """丢弃 end 之后的移动记录"""
+        del self.history[end:]
+        if self.collapse_loops:
+            seen = self.seen
+            for position_hash in self.hashes[end + 1:]:
+                del seen[position_hash]
+            del self.hashes[end + 1:]
+
+    @property
+    def hash(self):
+        """箱子位置和玩家位置的 Zobrist 哈希，O(1)"""
+        return self.box_hash ^ self.player_keys.get(self.player_pos, 0)
+
+    def player_region(self):
+        """玩家不推箱子能走到的所有格子"""
+        if self.player_pos is None:
+            return set()
+        blocked = self.walls | self.boxes
+        region = {self.player_pos}
+        stack = [self.player_pos]
+        while stack:
+            x, y = stack.pop()
+            for dx, dy in DELTAS:
+                cell = (x + dx, y + dy)
+                if (cell not in region and cell not in blocked
+                        and 0 <= cell[0] < self.width and 0 <= cell[1] < self.height):
+                    region.add(cell)
+                    stack.append(cell)
+        return region
+
+    def normalized_hash(self):
+        """箱子位置加玩家所在区域的哈希，区域内任意位置结果相同
+
+        只有推动箱子后才需要重新计算区域，其余移动直接使用缓存。
+        """
+        if self.region_key is None:
+            region = self.player_region()
+            if region:
+                # 取区域中按行优先最靠前的格子作为代表
+                top_left = min((y, x) for x, y in region)
+                self.region_key = self.player_keys[(top_left[1], top_left[0])]
+            else:
+                self.region_key = 0
+        return self.box_hash ^ self.region_key
+
+    def check_win(self):
+        """检查是否所有箱子都在目标点上（O(1)，依赖增量维护的计数）"""
+        return self.boxes_on_targets == self.box_count
+
+    @property
+    def deadlocked(self):
+        """是否有箱子在死格上或冻结在目标点外，此时关卡已经无法完成"""
+        return self.boxes_on_dead > 0 or self.frozen_at is not None
+
+    def to_bits(self, cells):
+        """坐标集合转换为冻结判定用的位图"""
+        bits = 0
+        for x, y in cells:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                bits |= 1 << (y * self.stride + x)
+        return bits
+
+    def freeze_deadlock(self, box):
+        """推到 box 的箱子是否造成冻结死锁，规则见 freeze_deadlock_bits"""
+        x, y = box
+        return freeze_deadlock_bits(self.to_bits(self.boxes), y * self.stride + x,
+                                    self.floor_bits, self.dead_bits, self.target_bits,
+                                    self.stride)
+
+    def play(self, moves):
+        """按顺序执行一串 udlr 方向字符，返回成功执行的步数"""
+        done = 0
+        for char in moves:
+            dx, dy = DIRECTIONS[char]
+            if self.move_player(dx, dy):
+                done += 1
+        return done
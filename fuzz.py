@@ -0,0 +1,309 @@
+"""推箱子移动规则差分模糊测试
+
+用大量随机和针对性的操作序列同时驱动参考实现和优化后的引擎，逐步比较结果
+（是否移动成功、玩家位置、箱子位置、移动/推箱计数、胜利判断）。
+发现不一致时把序列缩减成最短的复现用例。
+
+参考实现 ReferenceGame 原样保留了重构前 Sokoban.move_player 的规则，
+任何更快的引擎都必须和它行为一致。
+
+GameEngine(collapse_loops=True) 回到走过的局面时会截断移动记录，撤销沿去掉绕圈以后的
+路径后退，与参考实现的撤销本来就不同。这类引擎只用去掉撤销的序列与参考实现逐步比较，
+另外检查从开局回放 solution() 能回到同一个局面。
+
+用法：
+    python fuzz.py --sequences 100000 --length 200 --workers 4
+"""
+
+import argparse
+import random
+import time
+from multiprocessing import Pool
+
+from bitboard import BitboardEngine
+from engine import DIRECTIONS, GameEngine
+from levels import LEVELS
+from levels.builtin import BUILTIN_LEVELS
+
+# 序列中的操作：udlr 为移动，z 为撤销
+UNDO = 'z'
+
+
+def collapsing_engine(layout):
+    return GameEngine(layout, collapse_loops=True)
+
+
+CANDIDATES = {
+    'engine': GameEngine,
+    'bitboard': BitboardEngine,
+    'collapse': collapsing_engine,
+}
+
+# 撤销语义与参考实现不同的引擎，只用不含撤销的序列测试
+LOOP_FREE = {'collapse'}
+
+
+class ReferenceGame:
+    """重构前 Sokoban.move_player 的规则，撤销使用完整快照"""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.walls = set()
+        self.boxes = set()
+        self.targets = set()
+        self.player_pos = None
+        self.level_width = len(layout[0]) if layout else 0
+        self.level_height = len(layout)
+        self.moves = 0
+        self.pushes = 0
+        self.history = []
+
+        for y, row in enumerate(layout):
+            for x, cell in enumerate(row):
+                if cell == '#':
+                    self.walls.add((x, y))
+                elif cell == '$':
+                    self.boxes.add((x, y))
+                elif cell == '.':
+                    self.targets.add((x, y))
+                elif cell == '@':
+                    self.player_pos = (x, y)
+                elif cell == '*':
+                    self.boxes.add((x, y))
+                    self.targets.add((x, y))
+                elif cell == '+':
+                    self.player_pos = (x, y)
+                    self.targets.add((x, y))
+
+    def move_player(self, dx, dy):
+        if not self.player_pos:
+            return False
+
+        current_x, current_y = self.player_pos
+        new_x = current_x + dx
+        new_y = current_y + dy
+
+        if not (0 <= new_x < self.level_width and 0 <= new_y < self.level_height):
+            return False
+        if (new_x, new_y) in self.walls:
+            return False
+
+        snapshot = (self.player_pos, set(self.boxes), self.moves, self.pushes)
+        if (new_x, new_y) in self.boxes:
+            box_new_x = new_x + dx
+            box_new_y = new_y + dy
+            if not (0 <= box_new_x < self.level_width and 0 <= box_new_y < self.level_height):
+                return False
+            if (box_new_x, box_new_y) in self.walls or (box_new_x, box_new_y) in self.boxes:
+                return False
+            self.boxes.remove((new_x, new_y))
+            self.boxes.add((box_new_x, box_new_y))
+            self.pushes += 1
+
+        self.history.append(snapshot)
+        self.player_pos = (new_x, new_y)
+        self.moves += 1
+        return True
+
+    def undo(self):
+        if self.history:
+            self.player_pos, self.boxes, self.moves, self.pushes = self.history.pop()
+            return True
+        return False
+
+    def check_win(self):
+        return all(box in self.targets for box in self.boxes)
+
+
+def fuzz_levels():
+    """参与测试的所有关卡：levels 目录中的关卡加上内置关卡"""
+    return list(LEVELS) + list(BUILTIN_LEVELS)
+
+
+def random_sequence(rng, length):
+    """均匀随机的移动，夹杂少量撤销"""
+    return ''.join(UNDO if rng.random() < 0.05 else rng.choice('udlr') for _ in range(length))
+
+
+def adversarial_sequence(rng, length):
+    """容易触发边界情况的序列：连续同向推到墙角、来回抖动、连续撤销后再走"""
+    parts = []
+    while sum(len(part) for part in parts) < length:
+        kind = rng.randrange(4)
+        direction = rng.choice('udlr')
+        if kind == 0:
+            parts.append(direction * rng.randint(3, 15))
+        elif kind == 1:
+            opposite = {'u': 'd', 'd': 'u', 'l': 'r', 'r': 'l'}[direction]
+            parts.append((direction + opposite) * rng.randint(1, 6))
+        elif kind == 2:
+            parts.append(UNDO * rng.randint(1, 10))
+        else:
+            parts.append(random_sequence(rng, rng.randint(1, 10)))
+    return ''.join(parts)[:length]
+
+
+def apply(game, op):
+    """对 game 执行一个操作，返回操作结果"""
+    if op == UNDO:
+        return game.undo()
+    dx, dy = DIRECTIONS[op]
+    return game.move_player(dx, dy)
+
+
+def snapshot(game):
+    return (game.player_pos, frozenset(game.boxes), game.moves, game.pushes, game.check_win())
+
+
+def reference_trace(layout, sequence):
+    """用参考实现执行序列，记录每一步的结果，多个引擎可以共用同一份记录
+
+    每一步记录 (结果, 玩家位置, 移动数, 推箱数, 快照)，快照只在推箱子或撤销后保存。
+    """
+    reference = ReferenceGame(layout)
+    trace = [snapshot(reference)]
+    for op in sequence:
+        pushes = reference.pushes
+        result = apply(reference, op)
+        changed = op == UNDO or reference.pushes != pushes
+        trace.append((result, reference.player_pos, reference.moves, reference.pushes,
+                      snapshot(reference) if changed else None))
+    trace.append(snapshot(reference))
+    return trace
+
+
+def replays(layout, game):
+    """从开局用参考实现回放 game.solution()：每一步都要走得通、大小写与是否推箱一致，
+    最后回到 game 当前的局面"""
+    reference = ReferenceGame(layout)
+    for char in game.solution():
+        pushes = reference.pushes
+        if not apply(reference, char.lower()):
+            return False
+        if (reference.pushes != pushes) != char.isupper():
+            return False
+    return reference.player_pos == game.player_pos and reference.boxes == set(game.boxes)
+
+
+def find_divergence(layout, sequence, candidate, trace=None):
+    """返回第一个结果不一致的操作下标，完全一致时返回 None（-1 表示初始状态就不同）"""
+    if trace is None:
+        trace = reference_trace(layout, sequence)
+    game = candidate(layout)
+    if snapshot(game) != trace[0]:
+        return -1
+    for i, op in enumerate(sequence):
+        result, player_pos, moves, pushes, state = trace[i + 1]
+        if apply(game, op) != result:
+            return i
+        if game.player_pos != player_pos or game.moves != moves or game.pushes != pushes:
+            return i
+        # 箱子集合只在推箱子或撤销后才可能变化，其余步只比较计数，节省时间
+        if state is not None and snapshot(game) != state:
+            return i
+    if snapshot(game) != trace[-1]:
+        return len(sequence) - 1
+    if getattr(game, 'collapse_loops', False) and not replays(layout, game):
+        return len(sequence) - 1
+    return None
+
+
+def shrink(layout, sequence, candidate):
+    """把导致不一致的序列缩减为最短的复现用例"""
+    index = find_divergence(layout, sequence, candidate)
+    if index is None:
+        return sequence
+    sequence = sequence[:index + 1]
+
+    # 逐步减小块大小，尝试删除每一块，删掉后仍然不一致就保留删除
+    chunk = max(len(sequence) // 2, 1)
+    while chunk >= 1:
+        i = 0
+        while i < len(sequence):
+            trial = sequence[:i] + sequence[i + chunk:]
+            index = find_divergence(layout, trial, candidate)
+            if trial and index is not None:
+                sequence = trial[:index + 1]
+            else:
+                i += chunk
+        chunk //= 2
+    return sequence
+
+
+def run_batch(args):
+    """在一个进程中运行一批序列，返回 (序列数, 不一致列表)"""
+    seed, count, length, candidate_names = args
+    rng = random.Random(seed)
+    levels = fuzz_levels()
+    failures = []
+    for n in range(count):
+        level_index = rng.randrange(len(levels))
+        layout = levels[level_index]
+        if n % 2:
+            sequence = adversarial_sequence(rng, length)
+        else:
+            sequence = random_sequence(rng, length)
+        traces = {}
+        for name in candidate_names:
+            candidate = CANDIDATES[name]
+            candidate_sequence = sequence.replace(UNDO, '') if name in LOOP_FREE else sequence
+            trace = traces.get(candidate_sequence)
+            if trace is None:
+                trace = traces[candidate_sequence] = reference_trace(layout, candidate_sequence)
+            if find_divergence(layout, candidate_sequence, candidate, trace) is not None:
+                failures.append({
+                    'candidate': name,
+                    'level': level_index,
+                    'sequence': shrink(layout, candidate_sequence, candidate),
+                })
+    return count, failures
+
+
+def fuzz(sequences=10000, length=200, seed=0, workers=1, candidates=None):
+    """运行模糊测试，返回包含速度和不一致用例的报告"""
+    candidate_names = list(candidates or CANDIDATES)
+    batches = max(workers * 4, 1)
+    # 前 sequences % batches 批各多一个序列，总数恰好是 sequences
+    per_batch, extra = divmod(sequences, batches)
+    jobs = [(seed * 100003 + i, per_batch + (i < extra), length, candidate_names)
+            for i in range(batches) if per_batch + (i < extra)]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(run_batch, jobs)
+    else:
+        results = [run_batch(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    total = sum(count for count, _ in results)
+    failures = [failure for _, batch_failures in results for failure in batch_failures]
+    return {
+        'sequences': total,
+        'seconds': elapsed,
+        'sequences_per_second': total / elapsed if elapsed else float('inf'),
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推箱子移动规则差分模糊测试")
+    parser.add_argument('--sequences', type=int, default=10000, help="序列总数")
+    parser.add_argument('--length', type=int, default=200, help="每个序列的操作数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--workers', type=int, default=1, help="进程数")
+    parser.add_argument('--candidate', action='append', choices=sorted(CANDIDATES),
+                        help="要测试的引擎，可重复，默认全部")
+    args = parser.parse_args()
+
+    report = fuzz(args.sequences, args.length, args.seed, args.workers, args.candidate)
+    print(f"序列数: {report['sequences']}  用时: {report['seconds']:.2f}s  "
+          f"速度: {report['sequences_per_second']:.0f} 序列/秒")
+    for failure in report['failures']:
+        print(f"不一致: 引擎 {failure['candidate']} 关卡 {failure['level']} "
+              f"最短序列 {failure['sequence']!r}")
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
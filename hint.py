@@ -0,0 +1,247 @@
+"""大关卡的提示：基于随机模拟的蒙特卡洛树搜索
+
+精确搜索解不了的大关卡，用蒙特卡洛树搜索（UCT）在固定的时间内给出最有希望的下一次推动。
+树的每一步是一次推动（玩家先走到箱子后面），规则与 GameEngine.move_player 相同，
+在位图上执行；推进死格或造成冻结死锁的推动直接剪掉。
+
+模拟（rollout）从叶子局面开始按启发式随机推箱子：多数时候选让箱子离目标点最近的推动，
+偶尔随机选一个，最多推 ROLLOUT_DEPTH 次。全部推上目标点得 1 分，
+否则按剩余推动距离给 0 到 1 之间的分，走投无路得 0 分。
+
+    hint = next_push(layout, boxes, player_pos, budget=0.2)
+    # ((x, y), (dx, dy))：把 (x, y) 上的箱子沿 (dx, dy) 推一格，没有可走的推动时为 None
+
+界面里用 HintSearch 在工作进程中搜索，不占用界面线程：
+
+    search = HintSearch(layout, boxes, player_pos).start()
+    if search.poll():      # 不阻塞，适合每帧调用一次
+        search.hint
+"""
+
+import math
+import random
+import time
+
+from anytime_solver import AnytimeSearch
+from engine import DELTAS, DIRECTION_CHARS, freeze_deadlock_bits
+from layout_cache import cached_by_layout
+from solver import INF, Solver
+
+DEFAULT_BUDGET = 0.2
+ROLLOUT_DEPTH = 40
+# 模拟时随机选推动的概率
+EXPLORATION = 0.2
+# UCT 公式中的探索系数
+UCT_CONSTANT = 1.4
+
+
+class Node:
+    """搜索树节点，value 是所有模拟得分之和"""
+
+    __slots__ = ('boxes', 'region', 'h', 'parent', 'push', 'children', 'untried',
+                 'visits', 'value')
+
+    def __init__(self, boxes, region, h, parent=None, push=None):
+        self.boxes = boxes
+        self.region = region
+        self.h = h
+        self.parent = parent
+        self.push = push
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.value = 0.0
+
+    def best_child(self, constant):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.value / child.visits
+                   + constant * math.sqrt(log_visits / child.visits))
+
+
+class HintEngine(Solver):
+    """单个关卡的提示搜索，局面表示与 Solver 相同"""
+
+    def __init__(self, layout, seed=None):
+        super().__init__(layout)
+        self.random = random.Random(seed)
+
+    def frozen(self, boxes, box):
+        """推到 box 的箱子是否造成冻结死锁，与 GameEngine.freeze_deadlock 共用一个实现"""
+        return freeze_deadlock_bits(boxes, box, self.floor, self.dead, self.targets, self.stride)
+
+    def moves(self, boxes, region, h):
+        """不会立刻造成死局的推动 [(箱子格, 目标格, 方向编号, 推动后的启发值), ...]"""
+        result = []
+        distances = self.distances
+        for box, dest, direction in self.pushes(boxes, region):
+            child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+            if self.frozen(child_boxes, dest):
+                continue
+            result.append((box, dest, direction, h - distances[box] + distances[dest]))
+        return result
+
+    def child(self, boxes, region, box, dest):
+        child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+        return child_boxes, self.child_region(region, child_boxes, box, dest)
+
+    def score(self, h, root_h):
+        if h == 0:
+            return 1.0
+        return 0.9 * max(0.0, 1.0 - h / (root_h + ROLLOUT_DEPTH))
+
+    def rollout(self, boxes, region, h, root_h):
+        """返回 (得分, 推动列表)，推动列表只在全部推上目标点时才有，否则为 None"""
+        rng = self.random
+        pushes = []
+        for _ in range(ROLLOUT_DEPTH):
+            if h == 0:
+                return 1.0, pushes
+            moves = self.moves(boxes, region, h)
+            if not moves:
+                return 0.0, None
+            if rng.random() < EXPLORATION:
+                box, dest, direction, h = rng.choice(moves)
+            else:
+                best = min(move[3] for move in moves)
+                box, dest, direction, h = rng.choice([move for move in moves if move[3] == best])
+            pushes.append((box, direction))
+            boxes, region = self.child(boxes, region, box, dest)
+        if h == 0:
+            return 1.0, pushes
+        return self.score(h, root_h), None
+
+    def search(self, boxes, player, budget=DEFAULT_BUDGET, iterations=None):
+        """在 budget 秒内搜索，返回最有希望的推动 (箱子格, 方向编号)，没有可走的推动时返回 None
+
+        模拟中找到过完整的解时，提示最短那个解的第一步，否则提示访问次数最多的推动。
+        iterations 不为 None 时最多做这么多次模拟，结果只取决于随机数种子。
+        """
+        deadline = time.monotonic() + budget
+        region = self.reachable(boxes, player)
+        root_h = self.heuristic(boxes)
+        root = Node(boxes, region, root_h)
+        if root_h == INF or root_h == 0:
+            return None
+        root.untried = self.moves(boxes, region, root_h)
+        if not root.untried:
+            return None
+
+        solution = None
+        count = 0
+        while True:
+            node = root
+            # 选择
+            while not node.untried and node.children:
+                node = node.best_child(UCT_CONSTANT)
+            # 扩展
+            if node.untried:
+                box, dest, direction, h = node.untried.pop(
+                    self.random.randrange(len(node.untried)))
+                child_boxes, child_region = self.child(node.boxes, node.region, box, dest)
+                child = Node(child_boxes, child_region, h, node, (box, direction))
+                child.untried = [] if h == 0 else self.moves(child_boxes, child_region, h)
+                node.children.append(child)
+                node = child
+            # 模拟
+            if node.h == 0:
+                value, tail = 1.0, []
+            elif not node.untried and not node.children:
+                value, tail = 0.0, None
+            else:
+                value, tail = self.rollout(node.boxes, node.region, node.h, root_h)
+            if tail is not None:
+                line = []
+                ancestor = node
+                while ancestor.parent is not None:
+                    line.append(ancestor.push)
+                    ancestor = ancestor.parent
+                line.reverse()
+                line += tail
+                if solution is None or len(line) < len(solution):
+                    solution = line
+            # 回传
+            while node is not None:
+                node.visits += 1
+                node.value += value
+                node = node.parent
+            count += 1
+            if time.monotonic() > deadline or count == iterations:
+                break
+
+        if solution is not None:
+            return solution[0]
+        best = max(root.children, key=lambda child: (child.visits, child.value))
+        return best.push
+
+    def hint(self, boxes, player_pos, budget=DEFAULT_BUDGET, iterations=None):
+        """坐标形式：返回 ((x, y), (dx, dy))，表示把 (x, y) 上的箱子沿 (dx, dy) 推一格"""
+        board = self.board
+        push = self.search(board.to_bits(boxes), board.index(*player_pos), budget, iterations)
+        if push is None:
+            return None
+        box, direction = push
+        return board.position(box), DELTAS[direction]
+
+    def hint_moves(self, boxes, player_pos, budget=DEFAULT_BUDGET, iterations=None):
+        """提示的推动连同走过去的路，返回 LURD 字符串，没有提示时返回 None"""
+        board = self.board
+        box_bits = board.to_bits(boxes)
+        player = board.index(*player_pos)
+        push = self.search(box_bits, player, budget, iterations)
+        if push is None:
+            return None
+        box, direction = push
+        path = self.walk(player, box - self.shifts[direction], box_bits)
+        return (''.join(DIRECTION_CHARS[DELTAS[step]] for step in path)
+                + DIRECTION_CHARS[DELTAS[direction]].upper())
+
+
+@cached_by_layout(capacity=8)
+def hint_engine(layout):
+    """返回关卡的 HintEngine，按布局缓存"""
+    return HintEngine(layout)
+
+
+def next_push(layout, boxes, player_pos, budget=DEFAULT_BUDGET):
+    """当前局面下最有希望的推动 ((x, y), (dx, dy))，没有时返回 None"""
+    return hint_engine(layout).hint(boxes, player_pos, budget)
+
+
+def run_hint_worker(layout, boxes, player_pos, budget, connection, cancel):
+    """工作进程入口：搜索一次提示，把结果发回去"""
+    try:
+        connection.send(next_push(layout, boxes, player_pos, budget))
+    finally:
+        connection.close()
+
+
+class HintSearch(AnytimeSearch):
+    """在工作进程中搜索提示，启动、取消和回收与 AnytimeSearch 相同"""
+
+    worker = staticmethod(run_hint_worker)
+
+    def __init__(self, layout, boxes, player_pos, budget=DEFAULT_BUDGET):
+        super().__init__(layout)
+        self.args = (list(layout), sorted(boxes), player_pos, budget)
+        self.hint = None
+        self.finished = False
+
+    @property
+    def done(self):
+        return self.finished
+
+    def poll(self):
+        """收到结果时返回 True，结果在 hint 里（没有可走的推动时为 None），不阻塞"""
+        connection = self.connection
+        if connection is None:
+            return False
+        try:
+            if not connection.poll():
+                return False
+            self.hint = connection.recv()
+        except EOFError:
+            # 工作进程没有发回结果就退出了
+            self.hint = None
+        self.finished = True
+        self.close()
+        return True
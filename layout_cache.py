@@ -0,0 +1,68 @@
+"""按关卡布局缓存的计算结果
+
+死格表这类结果只取决于关卡布局，同一个布局只需计算一次。缓存有容量上限，
+满了以后淘汰最久没有用过的布局（LRU），加载或分析大量关卡时内存不会一直增长：
+
+    @cached_by_layout(capacity=128)
+    def dead_squares(layout):
+        ...
+
+    dead_squares(level)           # 第一次计算，之后直接返回缓存的结果
+    dead_squares.cache_clear()
+"""
+
+import functools
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 128
+
+
+class LayoutCache:
+    """以布局（行的元组）为键、容量有限的 LRU 缓存，可以像被包装的函数一样调用
+
+    布局之后的参数不参与缓存键，只在第一次计算这个布局时使用。
+    后台线程也会查询缓存。这里不用锁（持锁时 fork 出的工作进程会永远等这把锁），
+    只用 OrderedDict 的单个操作，另一个线程同时淘汰了条目也不会出错。
+    """
+
+    def __init__(self, function, capacity=DEFAULT_CAPACITY):
+        self.function = function
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        functools.update_wrapper(self, function)
+
+    def __call__(self, layout, *args, **kwargs):
+        key = tuple(layout)
+        entries = self.entries
+        try:
+            value = entries[key]
+        except KeyError:
+            value = self.function(layout, *args, **kwargs)
+            # 别的线程可能已经算好了同一个布局，沿用先放进去的结果
+            value = entries.setdefault(key, value)
+        try:
+            entries.move_to_end(key)
+        except KeyError:
+            pass
+        while len(entries) > self.capacity:
+            try:
+                entries.popitem(last=False)
+            except KeyError:
+                break
+        return value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, layout):
+        return tuple(layout) in self.entries
+
+    def cache_clear(self):
+        self.entries.clear()
+
+
+def cached_by_layout(capacity=DEFAULT_CAPACITY):
+    """装饰器：按布局缓存函数的结果，最多保留 capacity 个布局"""
+    def decorator(function):
+        return LayoutCache(function, capacity)
+    return decorator
@@ -2,9 +2,13 @@ import pygame
 import sys
 import json
 import os
+import threading
 from tkinter import filedialog
 import tkinter as tk
 from sprites import SpriteSheet
+from levels import load_level_file
+from solver import solve_moves
+from engine import dead_squares
 
 # Constants
 TILE_SIZE = 64
@@ -19,6 +23,9 @@ RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 LIGHT_GRAY = (200, 200, 200)
 
+# 保存关卡后在后台求最少步数的时间上限（秒）
+PAR_TIME_LIMIT = 30.0
+
 class MenuItem:
     def __init__(self, text, x, y, width, height):
         self.text = text
@@ -133,6 +140,9 @@ class LevelEditor:
         self.message = ""
         self.message_time = 0
 
+        # 后台求目标步数的任务，见 start_par_solve
+        self.par_job = None
+
     def handle_menu_click(self, pos):
         """处理菜单点击"""
         # 检查主菜单按钮点击
@@ -269,6 +279,7 @@ class LevelEditor:
             self.draw_grid()
             self.draw_tool_palette()
             self.draw_controls()
+            self.update_par_solve()
             
             # 显示消息
             if self.message and current_time - self.message_time < 3000:
@@ -306,14 +317,10 @@ class LevelEditor:
             # 记住当前文件路径
             self.current_file_path = file_path
             
-            # 读取关卡文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                level_data = json.load(f)
-            
-            # 支持 layout 和 map 两种字段
-            level_layout = level_data.get('layout') or level_data.get('map')
-            
-            if not level_layout or not isinstance(level_layout, list):
+            # 读取关卡文件，支持 layout 和 map 两种字段
+            try:
+                level_layout = load_level_file(file_path)
+            except ValueError:
                 self.message = "无效的关卡文件格式"
                 self.message_time = pygame.time.get_ticks()
                 return
@@ -358,6 +365,13 @@ class LevelEditor:
             self.message = "箱子数量必须与目标点数量相同"
             self.message_time = pygame.time.get_ticks()
             return
+
+        dead = dead_squares(self.grid_to_level())
+        if any(cell == '$' and (x, y) in dead
+               for y, row in enumerate(self.grid) for x, cell in enumerate(row)):
+            self.message = "有箱子在死角，无法推到任何目标点"
+            self.message_time = pygame.time.get_ticks()
+            return
         
         try:
             # 如果是已经打开的文件，直接保存
@@ -381,25 +395,68 @@ class LevelEditor:
             # 记住当前文件路径
             self.current_file_path = save_path
             
-            # 保存关卡
+            # 保存关卡，目标步数等后台求出解以后再写入，不写估计值
+            layout = self.grid_to_level()
             level_data = {
                 "name": os.path.splitext(os.path.basename(save_path))[0],
-                "layout": self.grid_to_level(),
-                "difficulty": "自定义",
-                "par_moves": sum(row.count('$') for row in self.grid) * 10,
-                "par_pushes": sum(row.count('$') for row in self.grid) * 4
+                "layout": layout,
+                "difficulty": "自定义"
             }
             
             with open(save_path, 'w', encoding='utf-8') as f:
                 json.dump(level_data, f, ensure_ascii=False, indent=4)
             
-            self.message = f"关卡已保存到：{save_path}"
+            self.start_par_solve(save_path, layout)
+            self.message = f"关卡已保存到：{save_path}，正在计算目标步数"
             self.message_time = pygame.time.get_ticks()
         
         except Exception as e:
             self.message = f"保存关卡时出错：{e}"
             self.message_time = pygame.time.get_ticks()
 
+    def start_par_solve(self, path, layout):
+        """在后台线程里求步数最少的解，界面不会卡住；结果由 update_par_solve 写回关卡文件"""
+        job = {'path': path, 'layout': layout, 'solution': None, 'done': False}
+
+        def solve():
+            try:
+                job['solution'] = solve_moves(layout, time_limit=PAR_TIME_LIMIT)
+            finally:
+                job['done'] = True
+
+        # 之前没有完成的任务结果不再使用
+        self.par_job = job
+        threading.Thread(target=solve, daemon=True).start()
+
+    def update_par_solve(self):
+        """每帧检查一次后台求解，求出解时把它的步数和推箱次数写进关卡文件"""
+        job = self.par_job
+        if job is None or not job['done']:
+            return
+        self.par_job = None
+        solution = job['solution']
+        if solution is None:
+            self.message = "没能在时限内求出最少步数，关卡文件中没有写入目标步数"
+            self.message_time = pygame.time.get_ticks()
+            return
+
+        try:
+            with open(job['path'], 'r', encoding='utf-8') as f:
+                level_data = json.load(f)
+            # 文件在求解期间被改成了别的关卡
+            if level_data.get('layout') != job['layout']:
+                return
+            # 两个数字来自同一个解
+            level_data['par_moves'] = len(solution)
+            level_data['par_pushes'] = sum(char.isupper() for char in solution)
+            with open(job['path'], 'w', encoding='utf-8') as f:
+                json.dump(level_data, f, ensure_ascii=False, indent=4)
+        except (OSError, ValueError) as e:
+            self.message = f"写入目标步数时出错：{e}"
+        else:
+            self.message = f"目标步数：{len(solution)} 步，{level_data['par_pushes']} 次推箱"
+        self.message_time = pygame.time.get_ticks()
+
     def grid_to_level(self):
         """将网格转换为关卡布局"""
         level = []
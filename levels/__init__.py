@@ -1,38 +1,173 @@
-# 这是一个空的 __init__.py 文件，用于将 levels 目录标记为 Python 包
+# levels 包：关卡对象和关卡文件加载
 
 import os
+import sys
 import json
 
 # 关卡文件目录
 LEVELS_DIR = os.path.join(os.path.dirname(__file__))
 
-def load_levels():
-    """从levels目录加载所有关卡"""
+# 关卡中允许出现的字符
+LEVEL_CHARS = frozenset('#$.@*+ ')
+
+WALL, BOX, TARGET, PLAYER, BOX_ON_TARGET, PLAYER_ON_TARGET, FLOOR = b'#$.@*+ '
+
+
+def _find_all(grid, chars):
+    """返回 grid 中所有属于 chars 的格子编号"""
+    cells = []
+    for char in chars:
+        index = grid.find(char)
+        while index >= 0:
+            cells.append(index)
+            index = grid.find(char, index + 1)
+    cells.sort()
+    return tuple(cells)
+
+
+class Level:
+    """不可变的关卡对象
+
+    布局保存为一个定宽的 bytes 网格，格子编号为 y * width + x。各行长度必须相同，
+    不等长的行会抛出 ValueError，而不是悄悄补齐。
+    对象可以像原来的字符串列表一样按行下标访问和遍历，现有的解析代码无需修改。
+    """
+
+    __slots__ = ('grid', 'width', 'height', 'walls', 'boxes', 'targets', 'player',
+                 'name', 'difficulty', 'par_moves', 'par_pushes', 'description')
+
+    def __init__(self, layout, name='', difficulty='未知', par_moves=0, par_pushes=0,
+                 description=''):
+        rows = list(layout)
+        for row in rows:
+            if not isinstance(row, str) or not LEVEL_CHARS.issuperset(row):
+                raise ValueError(f"关卡布局包含无效的行：{row!r}")
+
+        width = len(rows[0]) if rows else 0
+        for y, row in enumerate(rows):
+            if len(row) != width:
+                raise ValueError(f"关卡布局第 {y + 1} 行长度为 {len(row)}，与第 1 行的 {width} 不同")
+        grid = ''.join(rows).encode('ascii')
+        players = _find_all(grid, (PLAYER, PLAYER_ON_TARGET))
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'grid', grid)
+        setattr_(self, 'width', width)
+        setattr_(self, 'height', len(rows))
+        setattr_(self, 'walls', _find_all(grid, (WALL,)))
+        setattr_(self, 'boxes', _find_all(grid, (BOX, BOX_ON_TARGET)))
+        setattr_(self, 'targets', _find_all(grid, (TARGET, BOX_ON_TARGET, PLAYER_ON_TARGET)))
+        setattr_(self, 'player', players[0] if players else -1)
+        # 元数据大量重复（难度、默认描述等），驻留后所有关卡共用同一个字符串
+        setattr_(self, 'name', sys.intern(str(name)))
+        setattr_(self, 'difficulty', sys.intern(str(difficulty)))
+        setattr_(self, 'par_moves', par_moves)
+        setattr_(self, 'par_pushes', par_pushes)
+        setattr_(self, 'description', sys.intern(str(description)))
+
+    @classmethod
+    def from_dict(cls, data, default_name=''):
+        """从关卡 JSON 数据创建，支持 layout 和 map 两种字段"""
+        layout = data.get('layout') or data.get('map')
+        if not layout or not isinstance(layout, list):
+            raise ValueError("关卡数据缺少 layout 字段")
+        return cls(
+            layout,
+            name=data.get('name', default_name),
+            difficulty=data.get('difficulty', '未知'),
+            par_moves=data.get('par_moves', 0),
+            par_pushes=data.get('par_pushes', 0),
+            description=data.get('description', '')
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Level 对象不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("Level 对象不可修改")
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self[i] for i in range(*y.indices(self.height))]
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("关卡行号越界")
+        start = y * self.width
+        return self.grid[start:start + self.width].decode('ascii')
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+    def __eq__(self, other):
+        if not isinstance(other, Level):
+            return NotImplemented
+        return self.width == other.width and self.grid == other.grid
+
+    def __hash__(self):
+        return hash((self.width, self.grid))
+
+    def __repr__(self):
+        return f"Level({self.name!r}, {self.width}x{self.height})"
+
+    @property
+    def rows(self):
+        """布局的字符串列表"""
+        return list(self)
+
+    def index(self, x, y):
+        """坐标转换为格子编号"""
+        return y * self.width + x
+
+    def position(self, index):
+        """格子编号转换为坐标"""
+        return index % self.width, index // self.width
+
+    def metadata(self):
+        """与旧版 LEVEL_DATA 条目格式相同的元数据字典"""
+        return {
+            'name': self.name,
+            'difficulty': self.difficulty,
+            'par_moves': self.par_moves,
+            'par_pushes': self.par_pushes,
+            'description': self.description
+        }
+
+
+def load_level_file(path, default_name=''):
+    """读取单个关卡 JSON 文件"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return Level.from_dict(json.load(f), default_name)
+
+
+def load_levels(directory=LEVELS_DIR):
+    """从levels目录加载所有关卡，返回 (关卡列表, 元数据列表)"""
     levels = []
     level_data = []
-    level_files = sorted([f for f in os.listdir(LEVELS_DIR) if f.endswith('.json') and f != '__init__.py'])
-    
+    level_files = sorted([f for f in os.listdir(directory) if f.endswith('.json')])
+
     for level_file in level_files:
         try:
-            with open(os.path.join(LEVELS_DIR, level_file), 'r', encoding='utf-8') as f:
-                level_json = json.load(f)
-                
-                # 检查关卡文件是否包含必要的字段
-                if 'layout' in level_json and isinstance(level_json['layout'], list):
-                    levels.append(level_json['layout'])
-                    level_data.append({
-                        'name': level_json.get('name', f'关卡 {len(levels)}'),
-                        'difficulty': level_json.get('difficulty', '未知'),
-                        'par_moves': level_json.get('par_moves', 0),
-                        'par_pushes': level_json.get('par_pushes', 0),
-                        'description': level_json.get('description', '')
-                    })
-                else:
-                    print(f"跳过无效的关卡文件：{level_file}")
-        except (json.JSONDecodeError, IOError) as e:
+            level = load_level_file(os.path.join(directory, level_file),
+                                    f'关卡 {len(levels) + 1}')
+        except (ValueError, json.JSONDecodeError, IOError) as e:
             print(f"加载关卡文件 {level_file} 时出错：{e}")
-    
+            continue
+
+        # 确保每个关卡至少有一个玩家
+        if level.player < 0:
+            print(f"警告：关卡文件 {level_file} 没有玩家('@')，已跳过")
+            continue
+
+        levels.append(level)
+        level_data.append(level.metadata())
+
     return levels, level_data
 
+
 # 加载关卡
 LEVELS, LEVEL_DATA = load_levels()
@@ -1,6 +1,8 @@
-# 推箱子游戏关卡定义
+# 推箱子内置关卡定义，通过 from levels.builtin import BUILTIN_LEVELS 获取 Level 对象
 
-LEVELS = [
+from levels import Level
+
+LAYOUTS = [
     # Level 1 - Tutorial (1箱子，1目标)
     [
         "##########",
@@ -152,3 +154,5 @@ LEVEL_DATA = [
         'par_pushes': 22
     }
 ]
+
+BUILTIN_LEVELS = [Level(layout, **data) for layout, data in zip(LAYOUTS, LEVEL_DATA)]
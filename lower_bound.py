@@ -0,0 +1,134 @@
+"""剩余推动次数的下界
+
+每个箱子必须推到不同的目标点上，所以“箱子到目标点推动距离的最小代价完美匹配”
+是剩余推动次数的下界（忽略了箱子之间的阻挡和玩家走位）。
+
+匹配用匈牙利算法（最短增广路版本）求解，并保存对偶势。一个箱子移动时只有代价矩阵的
+一行发生变化：释放这个箱子原来的目标点，重新计算这一行，再做一次增广就得到新的最优匹配，
+代价是 O(n²) 而不是重新求解的 O(n³)，几十个箱子的关卡也可以每一步都更新。
+"""
+
+from engine import parse_level
+from push_distances import UNREACHABLE, push_distances
+
+INF = float('inf')
+
+
+class PushLowerBound:
+    """随箱子移动增量更新的剩余推动次数下界
+
+    用 sync(boxes) 告诉它当前箱子位置，value 是当前下界；
+    有箱子再也推不到任何空闲目标点时 value 为 INF。
+    """
+
+    def __init__(self, layout):
+        boxes = parse_level(layout)[1]
+        self.table = push_distances(layout)
+        self.targets = self.table.targets
+
+        # 行是箱子，列是目标点；箱子比目标点少时补上代价为 0 的虚拟箱子，矩阵是方阵
+        self.size = len(self.targets)
+        self.rows = {}
+        self.costs = [[0] * self.size for _ in range(self.size)]
+        self.reset(boxes)
+
+    def row_costs(self, box):
+        return self.table.distances(box)
+
+    def reset(self, boxes):
+        """按给定的箱子位置从头求解"""
+        boxes = sorted(boxes)
+        n = self.size
+        if len(boxes) > n:
+            # 箱子比目标点多，永远无法完成
+            self.rows = dict.fromkeys(boxes, -1)
+            self.value = INF
+            return
+
+        self.rows = {box: i for i, box in enumerate(boxes)}
+        self.costs = [self.row_costs(box) for box in boxes]
+        self.costs += [[0] * n for _ in range(n - len(boxes))]
+
+        # 对偶势和匹配，下标从 1 开始，列 0 是增广时的虚拟起点
+        self.u = [0] * (n + 1)
+        self.v = [0] * (n + 1)
+        self.match = [0] * (n + 1)  # 列 -> 行
+        self.column = [0] * (n + 1)  # 行 -> 列
+        for i in range(1, n + 1):
+            self.augment(i)
+        self.update_value()
+
+    def augment(self, row):
+        """为未匹配的行 row（从 1 开始）找最短增广路并更新对偶势"""
+        n = self.size
+        costs = self.costs
+        u, v, match = self.u, self.v, self.match
+        match[0] = row
+        current = 0
+        minimum = [INF] * (n + 1)
+        previous = [0] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[current] = True
+            i = match[current]
+            cost_row = costs[i - 1]
+            delta = INF
+            best = 0
+            ui = u[i]
+            for j in range(1, n + 1):
+                if not used[j]:
+                    reduced = cost_row[j - 1] - ui - v[j]
+                    if reduced < minimum[j]:
+                        minimum[j] = reduced
+                        previous[j] = current
+                    if minimum[j] < delta:
+                        delta = minimum[j]
+                        best = j
+            for j in range(n + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minimum[j] -= delta
+            current = best
+            if not match[current]:
+                break
+
+        # 沿增广路翻转匹配
+        while current:
+            prior = previous[current]
+            match[current] = match[prior]
+            self.column[match[current]] = current
+            current = prior
+
+    def update_value(self):
+        total = 0
+        for i in self.rows.values():
+            total += self.costs[i][self.column[i + 1] - 1]
+        self.value = INF if total >= UNREACHABLE else total
+
+    def move_box(self, old, new):
+        """箱子从 old 移动到 new，用一次增广修复匹配"""
+        i = self.rows.pop(old)
+        self.rows[new] = i
+        if i < 0:
+            return
+        column = self.column[i + 1]
+        self.match[column] = 0
+        self.column[i + 1] = 0
+        self.costs[i] = self.row_costs(new)
+        self.augment(i + 1)
+        self.update_value()
+
+    def sync(self, boxes):
+        """把内部记录的箱子位置更新为 boxes，返回新的下界"""
+        rows = self.rows
+        if len(boxes) != len(rows):
+            self.reset(boxes)
+            return self.value
+        removed = [box for box in rows if box not in boxes]
+        if removed:
+            added = [box for box in boxes if box not in rows]
+            for old, new in zip(removed, added):
+                self.move_box(old, new)
+        return self.value
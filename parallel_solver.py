@@ -0,0 +1,201 @@
+"""多进程推箱求解器
+
+按推动次数一层一层做广度优先搜索（结果是推动次数最少的解）。每一层的局面分成若干块，
+交给 multiprocessing 进程池里的工作进程展开，所有进程共用一张放在
+multiprocessing.shared_memory 里的置换表：
+
+- 表是 uint64 数组，每个槽位存一个局面指纹（局面键的 BLAKE2b 哈希，0 表示空）；
+- 数组分成 stripes 段，每段一把锁，指纹决定段号和段内起始槽位，段内线性探测，
+  不同段的插入可以同时进行；
+- 工作进程生成子局面时先在表里登记，已经登记过的局面（不管是哪个进程找到的）直接丢掉。
+
+段满了以后新局面不再登记，只会少剪一些重复局面，主进程还会按父局面字典再去一次重。
+指纹是 64 位，两个不同局面指纹相同的概率可以忽略。
+"""
+
+import hashlib
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+from solver import Solver
+
+DEFAULT_TABLE_SIZE = 1 << 22
+DEFAULT_STRIPES = 64
+
+# 每个工作进程每层大约分到的块数，块越多负载越均衡，进程间通信也越多
+CHUNKS_PER_WORKER = 4
+
+
+def fingerprint(state):
+    """局面键 (箱子位图 << 16 | 区域最低位格子编号) 的 64 位指纹，不会是 0"""
+    digest = hashlib.blake2b(state.to_bytes((state.bit_length() + 7) // 8, 'little'),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SharedTranspositionTable:
+    """放在共享内存里、分段加锁的局面指纹集合"""
+
+    def __init__(self, size=DEFAULT_TABLE_SIZE, stripes=DEFAULT_STRIPES, name=None, locks=None):
+        self.stripes = stripes
+        self.stripe_size = size // stripes
+        self.size = self.stripe_size * stripes
+        if name is None:
+            # 新建的共享内存内容全是 0，即所有槽位为空
+            self.memory = shared_memory.SharedMemory(create=True, size=self.size * 8)
+            self.locks = [multiprocessing.Lock() for _ in range(stripes)]
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.locks = locks
+        self.slots = self.memory.buf.cast('Q')
+
+    def handle(self):
+        """在工作进程中重新打开这张表需要的参数"""
+        return self.size, self.stripes, self.memory.name, self.locks
+
+    def add(self, value):
+        """登记指纹，以前没有登记过时返回 True"""
+        stripe = value % self.stripes
+        base = stripe * self.stripe_size
+        start = (value // self.stripes) % self.stripe_size
+        slots = self.slots
+        with self.locks[stripe]:
+            for offset in range(self.stripe_size):
+                index = base + (start + offset) % self.stripe_size
+                current = slots[index]
+                if current == value:
+                    return False
+                if current == 0:
+                    slots[index] = value
+                    return True
+        # 这一段已满，当作新局面
+        return True
+
+    def __len__(self):
+        return self.size - self.slots.tolist().count(0)
+
+    def close(self):
+        self.slots.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+# 工作进程内的求解器和置换表，由 init_worker 设置
+_solver = None
+_table = None
+
+
+def init_worker(layout, handle):
+    global _solver, _table
+    size, stripes, name, locks = handle
+    _solver = Solver(layout)
+    _table = SharedTranspositionTable(size, stripes, name, locks)
+
+
+def expand(solver, table, states):
+    """展开一块局面，返回 (新局面列表 [(局面, 父局面, 箱子格, 方向编号), ...], 解所在的子局面或 None)"""
+    children = []
+    for state in states:
+        boxes = state >> 16
+        region = solver.reachable(boxes, state & 0xFFFF)
+        for box, dest, direction in solver.pushes(boxes, region):
+            child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+            child_region = solver.child_region(region, child_boxes, box, dest)
+            low = child_region & -child_region
+            child = (child_boxes << 16) | (low.bit_length() - 1)
+            if not table.add(fingerprint(child)):
+                continue
+            children.append((child, state, box, direction))
+            if not child_boxes & ~solver.targets:
+                return children, child
+    return children, None
+
+
+def expand_chunk(states):
+    return expand(_solver, _table, states)
+
+
+class ParallelSolver(Solver):
+    """用进程池按层展开的推动最优求解器"""
+
+    def __init__(self, layout, processes=None, table_size=DEFAULT_TABLE_SIZE,
+                 stripes=DEFAULT_STRIPES):
+        super().__init__(layout)
+        self.processes = processes or os.cpu_count() or 1
+        self.table_size = table_size
+        self.stripes = stripes
+
+    def layered_search(self, table, pool):
+        """返回推动列表 [(箱子格, 方向编号), ...]，无解时返回 None"""
+        board = self.board
+        boxes = board.initial_boxes
+        region = self.reachable(boxes, board.initial_player)
+        low = region & -region
+        root = (boxes << 16) | (low.bit_length() - 1)
+        if not boxes & ~self.targets:
+            return []
+
+        table.add(fingerprint(root))
+        parents = {root: None}
+        layer = [root]
+        while layer:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                return None
+            if self.max_nodes is not None and self.nodes > self.max_nodes:
+                return None
+            size = max(1, -(-len(layer) // (self.processes * CHUNKS_PER_WORKER)))
+            chunks = [layer[i:i + size] for i in range(0, len(layer), size)]
+            if pool is None:
+                results = (expand(self, table, chunk) for chunk in chunks)
+            else:
+                results = pool.imap_unordered(expand_chunk, chunks)
+
+            layer = []
+            for children, solved in results:
+                for child, parent, box, direction in children:
+                    if child not in parents:
+                        parents[child] = (parent, box, direction)
+                        layer.append(child)
+                self.nodes += len(children)
+                if solved is not None:
+                    return self.trace_pushes(parents, solved)
+        return None
+
+    def solve(self, max_nodes=None, time_limit=None):
+        """求推箱次数最少的解，返回 LURD 字符串；无解或超出限制时返回 None
+
+        参数与 Solver.solve 相同，但 max_nodes 和 time_limit 默认都不限。max_nodes 按层检查：
+        某一层结束时生成的局面数超过 max_nodes 就放弃。
+        """
+        if self.hopeless():
+            return None
+
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        table = SharedTranspositionTable(self.table_size, self.stripes)
+        try:
+            if self.processes == 1:
+                pushes = self.layered_search(table, None)
+            else:
+                with multiprocessing.Pool(self.processes, init_worker,
+                                          (self.board.layout, table.handle())) as pool:
+                    pushes = self.layered_search(table, pool)
+        finally:
+            self.max_nodes = None
+            self.deadline = None
+            table.close()
+            table.unlink()
+
+        if pushes is None:
+            return None
+        return self.to_moves(pushes)
+
+
+def solve_parallel(layout, processes=None, time_limit=None):
+    """用多个进程求关卡的推箱最优解，返回 LURD 字符串或 None"""
+    return ParallelSolver(layout, processes).solve(time_limit=time_limit)
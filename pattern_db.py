@@ -0,0 +1,254 @@
+"""模式数据库：少量箱子的精确推动代价
+
+对关卡中所有 size 个箱子（2 到 4 个）的摆放位置，预先算出只有这几个箱子时
+把它们全部推上目标点最少要推几次（玩家站在最有利的区域）。做法是从所有
+“size 个箱子都在目标点上”的局面出发反向拉箱子做广度优先搜索，
+每种摆放第一次被访问到时的层数就是它的精确代价。
+
+结果写成紧凑的二进制文件，放在关卡 JSON 旁边（level_7.json -> level_7.pdb3）：
+
+    文件头  MAGIC, 版本, size, 布局哈希(16 字节), 宽, 活格数
+    活格表  活格数个 uint16，格子编号 y * 宽 + x
+    代价表  C(活格数, size) 个 uint8，按摆放的组合编号排列，NO_SOLUTION 表示推不上去
+
+使用时用 mmap 映射文件而不是整个读入，打开时核对布局哈希，布局改过就自动重建：
+
+    db = open_pattern_database(level, 'levels/level_7.json', size=3)
+    db.lower_bound(boxes)
+
+构建（耗时较长，适合离线执行）：
+
+    python pattern_db.py levels/level_7.json --size 3
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections import deque
+from itertools import combinations
+from math import comb
+
+from bitboard import BitboardEngine
+from engine import parse_level
+from push_distances import UNREACHABLE, push_distances
+from reachability import Reachability
+
+MAGIC = b'SKPD'
+VERSION = 1
+HEADER = struct.Struct('<4sHH16sHH')
+
+# 代价表中表示这组摆放推不上目标点
+NO_SOLUTION = 0xFF
+
+
+class PatternDatabaseError(ValueError):
+    """文件损坏、版本不对或与布局不匹配"""
+
+
+def layout_hash(layout):
+    """布局内容的稳定哈希（不同进程、不同运行之间结果相同），忽略行尾空格"""
+    return hashlib.sha256('\n'.join(row.rstrip() for row in layout).encode('utf-8')).digest()[:16]
+
+
+def pattern_path(level_path, size):
+    """关卡 JSON 旁边的模式数据库文件名"""
+    return f"{os.path.splitext(level_path)[0]}.pdb{size}"
+
+
+def live_cells(layout):
+    """箱子可能出现的格子：玩家能到的区域中不是死格的格子，返回格子编号 y * 宽 + x 的列表"""
+    board = BitboardEngine(layout)
+    table = push_distances(layout)
+    interior = board.reachable(0, board.initial_player) if board.initial_player >= 0 else board.floor
+    cells = []
+    for y in range(board.height):
+        for x in range(board.width):
+            if (interior >> board.index(x, y)) & 1 and table.nearest[y * board.width + x] != UNREACHABLE:
+                cells.append(y * board.width + x)
+    return cells
+
+
+def rank(ordinals):
+    """升序的活格序号组合 -> 组合编号（组合数系统）"""
+    return sum(comb(ordinal, i + 1) for i, ordinal in enumerate(ordinals))
+
+
+def pull_search(layout, placements, max_depth=None):
+    """从给定的箱子摆放（位图）出发反向拉箱子做广度优先搜索
+
+    玩家可以在每种摆放的任意一个连通区域里开始。按层数从小到大依次产生
+    (箱子位图, 玩家区域位图, 层数)，每个 (箱子, 区域) 只出现一次，层数就是
+    从这个局面正向推到某个起始摆放最少要推几次。超过 max_depth 层的局面不再扩展。
+    """
+    reach = Reachability(layout)
+    interior, fill = reach.interior, reach.fill
+
+    seen = set()
+    queue = deque()
+    for boxes in placements:
+        free = interior & ~boxes
+        remaining = free
+        while remaining:
+            region = fill(remaining & -remaining, free)
+            remaining ^= region
+            seen.add((boxes, region & -region))
+            queue.append((boxes, region, 0))
+
+    # 反向拉箱子：玩家在 c - s，箱子在 c，玩家退到 c - 2s，箱子跟到 c - s
+    while queue:
+        boxes, region, depth = queue.popleft()
+        yield boxes, region, depth
+        if max_depth is not None and depth >= max_depth:
+            continue
+        free_all = interior & ~boxes
+        for shift in reach.shifts:
+            if shift > 0:
+                pulls = boxes & (region << shift) & (region << 2 * shift)
+            else:
+                pulls = boxes & (region >> -shift) & (region >> -2 * shift)
+            while pulls:
+                low = pulls & -pulls
+                pulls ^= low
+                dest = low.bit_length() - 1 - shift
+                child = boxes ^ low ^ (1 << dest)
+                child_region = fill(1 << (dest - shift), (free_all & ~(1 << dest)) | low)
+                key = (child, child_region & -child_region)
+                if key not in seen:
+                    seen.add(key)
+                    queue.append((child, child_region, depth + 1))
+
+
+def build(layout, size):
+    """计算代价表，返回 (活格列表, bytearray 代价表)"""
+    if not 1 <= size <= 4:
+        raise ValueError("size 必须在 1 到 4 之间")
+    board = BitboardEngine(layout)
+    cells = live_cells(layout)
+    width, stride = board.width, board.stride
+
+    # 位图格子编号 -> 活格序号；被拉动的箱子一定能推回目标点，只会出现在活格上
+    ordinal_of = {cell // width * stride + cell % width: i for i, cell in enumerate(cells)}
+    targets = [bit for bit in ordinal_of if (board.targets >> bit) & 1]
+    placements = [sum(1 << bit for bit in placement) for placement in combinations(targets, size)]
+
+    costs = bytearray([NO_SOLUTION]) * comb(len(cells), size)
+    for boxes, _, depth in pull_search(layout, placements):
+        ordinals = []
+        while boxes:
+            low = boxes & -boxes
+            boxes ^= low
+            ordinals.append(ordinal_of[low.bit_length() - 1])
+        index = rank(ordinals)
+        # 广度优先，第一次出现的层数最小
+        if costs[index] == NO_SOLUTION:
+            costs[index] = min(depth, NO_SOLUTION - 1)
+    return cells, costs
+
+
+def write(layout, size, path):
+    """构建并写入模式数据库文件，先写临时文件再替换，读者不会看到写了一半的文件"""
+    cells, costs = build(layout, size)
+    width = parse_level(layout)[4]
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, layout_hash(layout), width, len(cells)))
+        f.write(struct.pack(f'<{len(cells)}H', *cells))
+        f.write(costs)
+    os.replace(temporary, path)
+
+
+class PatternDatabase:
+    """用 mmap 映射的模式数据库文件，代价表不整体读入内存"""
+
+    def __init__(self, path, layout=None):
+        self.path = path
+        with open(path, 'rb') as f:
+            # 空文件不能映射，文件头不完整时 unpack 也会出错，都当作损坏的文件
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise PatternDatabaseError(f"模式数据库文件不完整：{path}")
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise PatternDatabaseError(f"无法映射模式数据库文件：{path}") from e
+        data = self.data
+        try:
+            magic, version, self.size, self.hash, self.width, count = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                raise PatternDatabaseError(f"不是本版本的模式数据库文件：{path}")
+            if layout is not None and self.hash != layout_hash(layout):
+                raise PatternDatabaseError(f"模式数据库与关卡布局不匹配：{path}")
+            self.cells = struct.unpack_from(f'<{count}H', data, HEADER.size)
+            self.offset = HEADER.size + 2 * count
+            if len(data) != self.offset + comb(count, self.size):
+                raise PatternDatabaseError(f"模式数据库文件长度不对：{path}")
+        except struct.error as e:
+            data.close()
+            raise PatternDatabaseError(f"模式数据库文件不完整：{path}") from e
+        except PatternDatabaseError:
+            data.close()
+            raise
+        self.ordinal_of = {cell: i for i, cell in enumerate(self.cells)}
+
+    def close(self):
+        self.data.close()
+
+    def cost(self, boxes):
+        """恰好 size 个箱子 (x, y) 的精确推动代价；有箱子在死格或推不上去时返回 None"""
+        if len(boxes) != self.size:
+            raise ValueError(f"需要恰好 {self.size} 个箱子")
+        ordinals = []
+        for x, y in boxes:
+            ordinal = self.ordinal_of.get(y * self.width + x)
+            if ordinal is None:
+                return None
+            ordinals.append(ordinal)
+        ordinals.sort()
+        value = self.data[self.offset + rank(ordinals)]
+        return None if value == NO_SOLUTION else value
+
+    def lower_bound(self, boxes):
+        """整个局面剩余推动次数的下界：所有 size 个箱子的子集中代价最大的一个
+
+        任何子集都推不上去时返回 None，说明局面已经无解。
+        """
+        best = 0
+        for subset in combinations(boxes, self.size):
+            value = self.cost(subset)
+            if value is None:
+                return None
+            best = max(best, value)
+        return best
+
+
+def open_pattern_database(layout, level_path, size=2):
+    """打开关卡旁边的模式数据库，文件不存在、损坏或布局已修改时重新构建"""
+    path = pattern_path(level_path, size)
+    try:
+        return PatternDatabase(path, layout)
+    except (OSError, PatternDatabaseError):
+        write(layout, size, path)
+        return PatternDatabase(path, layout)
+
+
+def main():
+    from levels import load_level_file
+
+    parser = argparse.ArgumentParser(description="为关卡构建模式数据库文件")
+    parser.add_argument('levels', nargs='+', help="关卡 JSON 文件")
+    parser.add_argument('--size', type=int, default=2, choices=(2, 3, 4), help="每组箱子数")
+    args = parser.parse_args()
+
+    for level_path in args.levels:
+        level = load_level_file(level_path)
+        start = time.perf_counter()
+        write(level, args.size, pattern_path(level_path, args.size))
+        print(f"{level_path}: {pattern_path(level_path, args.size)} "
+              f"用时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
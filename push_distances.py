@@ -0,0 +1,93 @@
+"""每个关卡的箱子推动距离表
+
+对关卡中的每个格子和每个目标点，记录箱子从这个格子推到这个目标点最少要推几次
+（忽略其他箱子，但要求玩家能站在箱子后面）。每个目标点做一次反向 BFS，
+结果存放在紧凑的 array('H') 缓冲区里，按布局缓存，关卡存在期间一直复用。
+求解器、推动下界等需要“箱子离目标点多远”的功能都直接查表，不再各自做 BFS。
+
+表按格子优先排列：格子 y * width + x 到第 t 个目标点的距离在下标
+(y * width + x) * 目标点数 + t，取出一个格子到所有目标点的距离就是一次切片。
+"""
+
+from array import array
+from collections import deque
+
+from engine import DELTAS, parse_level
+from layout_cache import cached_by_layout
+
+# 推不到目标点时的距离
+UNREACHABLE = 0xFFFF
+
+
+class PushDistances:
+    """推动距离表"""
+
+    def __init__(self, layout):
+        walls, _, targets, _, self.width, self.height = parse_level(layout)
+        self.targets = sorted(targets)
+        width, height = self.width, self.height
+        count = len(self.targets)
+        cells = width * height
+
+        floor = bytearray(cells)
+        for y in range(height):
+            for x in range(width):
+                if (x, y) not in walls:
+                    floor[y * width + x] = 1
+
+        self.table = array('H', [UNREACHABLE]) * (cells * count)
+        table = self.table
+        for t, (x, y) in enumerate(self.targets):
+            start = y * width + x
+            table[start * count + t] = 0
+            queue = deque([(x, y)])
+            while queue:
+                x, y = queue.popleft()
+                distance = table[(y * width + x) * count + t] + 1
+                for dx, dy in DELTAS:
+                    # 箱子从 prev 推到 (x, y)，玩家站在 behind
+                    px, py = x - dx, y - dy
+                    bx, by = px - dx, py - dy
+                    if not (0 <= bx < width and 0 <= by < height
+                            and 0 <= px < width and 0 <= py < height):
+                        continue
+                    prev = py * width + px
+                    if (floor[prev] and floor[by * width + bx]
+                            and table[prev * count + t] == UNREACHABLE):
+                        table[prev * count + t] = distance
+                        queue.append((px, py))
+
+        # 到最近目标点的距离
+        self.nearest = array('H', [UNREACHABLE]) * cells
+        if count:
+            for cell in range(cells):
+                self.nearest[cell] = min(table[cell * count:(cell + 1) * count])
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def distances(self, cell):
+        """(x, y) 格子到每个目标点的距离，顺序与 self.targets 相同"""
+        count = len(self.targets)
+        start = (cell[1] * self.width + cell[0]) * count
+        return self.table[start:start + count]
+
+    def distance(self, cell, target):
+        """(x, y) 格子到目标点 target 的距离"""
+        return self.table[self.index(*cell) * len(self.targets) + self.targets.index(target)]
+
+    def to_nearest(self, cell):
+        """(x, y) 格子到最近目标点的距离"""
+        return self.nearest[self.index(*cell)]
+
+    def as_numpy(self):
+        """共享同一块内存的 NumPy 视图，形状为 (高, 宽, 目标点数)"""
+        import numpy as np
+        return np.frombuffer(self.table, dtype=np.uint16).reshape(
+            self.height, self.width, len(self.targets))
+
+
+@cached_by_layout()
+def push_distances(layout):
+    """返回关卡的 PushDistances，按布局缓存"""
+    return PushDistances(layout)
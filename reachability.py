@@ -0,0 +1,132 @@
+"""玩家可达区域、围栏和合法推动分析
+
+对一个关卡和一组箱子位置，返回：
+
+- 玩家能走到的区域；
+- 被箱子围起来、玩家进不去的区域（围栏，corral）；
+- 从可达区域出发所有合法的推动。
+
+全部用 bitboard.BitboardEngine 的整数位图计算。同一组箱子把关卡内部分成的所有连通块
+只做一次泛洪填充，结果按箱子位图缓存：玩家只走路不推箱子时，之后的查询都是一次字典查找。
+点击移动、提示和自动游玩都在同一组箱子上反复查询，这是它们的内循环。
+"""
+
+from bitboard import BitboardEngine
+from engine import DELTAS
+from layout_cache import cached_by_layout
+
+
+class Reachability:
+    """单个关卡的可达性分析，格子编号和位图与 BitboardEngine 相同"""
+
+    def __init__(self, layout, cache_size=65536):
+        self.board = BitboardEngine(layout)
+        board = self.board
+        self.stride = board.stride
+        self.floor = board.floor
+        # 与 engine.DELTAS 顺序相同的格子编号偏移：上、下、左、右
+        self.shifts = tuple(dy * self.stride + dx for dx, dy in DELTAS)
+
+        # 忽略箱子时玩家能到的格子，关卡外面的空地不算围栏
+        if board.initial_player >= 0:
+            self.interior = board.reachable(0, board.initial_player)
+        else:
+            self.interior = self.floor
+
+        self.cache_size = cache_size
+        self.components = {}
+        self.push_cache = {}
+
+    def fill(self, seed, free):
+        """从 seed 出发在 free 内泛洪填充，返回连通块位图
+
+        向右用加法一次填满整段：free + region 的进位会从区域里的格子一直传到这一段
+        free 的末尾（每行末尾的补齐列不属于 free，进位不会跨行），
+        进位经过的格子就是 (free + region) ^ free ^ region。其余三个方向每轮扩展一格。
+        """
+        stride = self.stride
+        region = seed
+        while True:
+            grown = region | (((free + region) ^ free ^ region) & free)
+            grown |= ((grown >> 1) | (grown << stride) | (grown >> stride)) & free
+            if grown == region:
+                return region
+            region = grown
+
+    def split(self, boxes):
+        """箱子把关卡内部分成的所有连通块，按最低位格子编号排序，结果会缓存"""
+        components = self.components.get(boxes)
+        if components is None:
+            if len(self.components) >= self.cache_size:
+                self.components.clear()
+                self.push_cache.clear()
+            components = []
+            free = self.interior & ~boxes
+            remaining = free
+            while remaining:
+                component = self.fill(remaining & -remaining, free)
+                components.append(component)
+                remaining ^= component
+            components = self.components[boxes] = tuple(components)
+        return components
+
+    def region(self, boxes, player):
+        """玩家不推箱子能走到的格子位图"""
+        if player < 0:
+            return 0
+        bit = 1 << player
+        for component in self.split(boxes):
+            if component & bit:
+                return component
+        # 玩家在关卡内部之外，单独填充
+        return self.fill(bit, self.floor & ~boxes)
+
+    def corrals(self, boxes, region):
+        """玩家可达区域 region 以外的连通块列表（位图）"""
+        return [component for component in self.split(boxes) if component != region]
+
+    def pushes(self, boxes, region):
+        """从 region 出发所有合法推动的列表 [(箱子格, 目标格, 方向编号), ...]，结果会缓存"""
+        key = (boxes, region)
+        pushes = self.push_cache.get(key)
+        if pushes is None:
+            pushes = []
+            free = self.floor & ~boxes
+            for direction, shift in enumerate(self.shifts):
+                if shift > 0:
+                    dests = (((region << shift) & boxes) << shift) & free
+                else:
+                    dests = (((region >> -shift) & boxes) >> -shift) & free
+                while dests:
+                    low = dests & -dests
+                    dests ^= low
+                    dest = low.bit_length() - 1
+                    pushes.append((dest - shift, dest, direction))
+            pushes = self.push_cache[key] = tuple(pushes)
+        return pushes
+
+    def analyze(self, boxes, player):
+        """返回 (可达区域, 围栏列表, 合法推动)，boxes 是位图，player 是格子编号"""
+        region = self.region(boxes, player)
+        return region, self.corrals(boxes, region), self.pushes(boxes, region)
+
+
+# 每个分析对象自带最多 cache_size 组箱子的缓存，只保留少数几个关卡
+@cached_by_layout(capacity=8)
+def analyzer(layout):
+    """返回关卡的 Reachability 对象，按布局缓存"""
+    return Reachability(layout)
+
+
+def analyze_state(layout, boxes, player_pos):
+    """用坐标表示的版本：返回 (可达格子集合, 围栏列表, 推动列表)
+
+    boxes 是 (x, y) 集合，推动是 ((箱子 x, y), (dx, dy)) 的列表。
+    """
+    reach = analyzer(layout)
+    board = reach.board
+    player = board.index(*player_pos) if player_pos is not None else -1
+    region, corrals, pushes = reach.analyze(board.to_bits(boxes), player)
+    return (board.to_positions(region),
+            [board.to_positions(corral) for corral in corrals],
+            [(board.position(box), DELTAS[direction]) for box, _, direction in pushes])
@@ -6,14 +6,41 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 导入测试用例
-from tests.test_levels import TestSokobanLevels
+from tests.test_levels import TestSokobanLevels, TestLevelObject, TestLevelStructure, TestCollectionAnalysis
+from tests.test_engine import TestGameEngine, TestBitboardEngine, TestReachability, TestLayoutCache, \
+    TestDifferentialFuzz
+from tests.test_solver import TestSolver, TestPushLowerBound, TestPushDistances, TestPatternDatabase, \
+    TestEndgameDatabase, TestBoundedSolver, TestParallelSolver, TestAnytimeSolver, \
+    TestSolutionOptimizer, TestHintEngine
+from tests.test_env import TestSokobanEnv, TestBatchSokobanEnv
 
 def run_tests():
     # 创建测试加载器
     loader = unittest.TestLoader()
     
     # 创建测试套件
-    suite = loader.loadTestsFromTestCase(TestSokobanLevels)
+    suite = unittest.TestSuite()
+    suite.addTests(loader.loadTestsFromTestCase(TestSokobanLevels))
+    suite.addTests(loader.loadTestsFromTestCase(TestLevelObject))
+    suite.addTests(loader.loadTestsFromTestCase(TestLevelStructure))
+    suite.addTests(loader.loadTestsFromTestCase(TestCollectionAnalysis))
+    suite.addTests(loader.loadTestsFromTestCase(TestGameEngine))
+    suite.addTests(loader.loadTestsFromTestCase(TestBitboardEngine))
+    suite.addTests(loader.loadTestsFromTestCase(TestReachability))
+    suite.addTests(loader.loadTestsFromTestCase(TestLayoutCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestDifferentialFuzz))
+    suite.addTests(loader.loadTestsFromTestCase(TestSolver))
+    suite.addTests(loader.loadTestsFromTestCase(TestPushLowerBound))
+    suite.addTests(loader.loadTestsFromTestCase(TestPushDistances))
+    suite.addTests(loader.loadTestsFromTestCase(TestPatternDatabase))
+    suite.addTests(loader.loadTestsFromTestCase(TestEndgameDatabase))
+    suite.addTests(loader.loadTestsFromTestCase(TestBoundedSolver))
+    suite.addTests(loader.loadTestsFromTestCase(TestParallelSolver))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnytimeSolver))
+    suite.addTests(loader.loadTestsFromTestCase(TestSolutionOptimizer))
+    suite.addTests(loader.loadTestsFromTestCase(TestHintEngine))
+    suite.addTests(loader.loadTestsFromTestCase(TestSokobanEnv))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchSokobanEnv))
     
     # 创建测试运行器
     runner = unittest.TextTestRunner(verbosity=2)
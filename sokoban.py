@@ -3,13 +3,17 @@ import sys
 import os
 import json  # 添加json导入
 from highscores import HighScores
-from collections import deque
 import math
 from sprites import SpriteSheet
 from achievements import AchievementManager
 from sound_manager import SoundManager
 from settings import Settings
-from levels import LEVELS, LEVEL_DATA
+from levels import LEVELS, LEVEL_DATA, Level
+from engine import GameEngine
+from lower_bound import INF, PushLowerBound
+from endgame import endgame_database
+from anytime_solver import AnytimeSearch, reap_cancelled
+from hint import HintSearch
 
 # Game constants
 TILE_SIZE = 64
@@ -28,12 +32,16 @@ DARK_GREEN = (0, 100, 0)
 MOVE_ANIMATION_SPEED = 8
 ANIMATION_FRAMES = TILE_SIZE // MOVE_ANIMATION_SPEED
 
-class GameState:
-    def __init__(self, player_pos, boxes, moves, pushes):
-        self.player_pos = player_pos.copy()
-        self.boxes = [box.copy() for box in boxes]
-        self.moves = moves
-        self.pushes = pushes
+# 按 S 后台求解的时间上限（秒）
+SEARCH_TIME_LIMIT = 30.0
+# 按 H 计算提示的时间（秒）
+HINT_BUDGET = 0.2
+DIRECTION_NAMES = {(0, -1): '上', (0, 1): '下', (-1, 0): '左', (1, 0): '右'}
+
+def _engine_attr(name):
+    """把属性读写转发给当前关卡的无界面引擎"""
+    return property(lambda self: getattr(self.engine, name),
+                    lambda self, value: setattr(self.engine, name, value))
 
 class Animation:
     def __init__(self, start_pos, end_pos, frames, is_box=False):
@@ -80,6 +88,16 @@ class Button:
         return False
 
 class Sokoban:
+    # 游戏规则和状态都在 GameEngine 中，这里只是界面层
+    walls = _engine_attr('walls')
+    boxes = _engine_attr('boxes')
+    targets = _engine_attr('targets')
+    player_pos = _engine_attr('player_pos')
+    moves = _engine_attr('moves')
+    pushes = _engine_attr('pushes')
+    level_width = _engine_attr('width')
+    level_height = _engine_attr('height')
+
     def __init__(self):
         pygame.init()
         pygame.mixer.init()
@@ -145,20 +163,23 @@ class Sokoban:
         
         # 游戏状态
         self.current_level = 0
-        self.moves = 0
-        self.pushes = 0
+        self.engine = None
         self.level_complete = False
         self.show_menu = True
         self.high_scores = HighScores()
         self.show_achievements = False
         self.used_undo = False
+        # 按 S 在后台求解当前局面
+        self.search = None
+        self.search_progress = None
+        # 按 H 得到的下一次推动提示 ((x, y), (dx, dy))，在工作进程中搜索
+        self.hint = None
+        self.hint_text = None
+        self.hint_search = None
         
         # 添加 level 属性
         self.level = None
         
-        # 撤销系统
-        self.history = deque(maxlen=50)  # 最多保存50步历史
-        
         # 动画系统
         self.current_animation = None
         self.animated_box = None
@@ -207,23 +228,20 @@ class Sokoban:
             )
             self.buttons.append(custom_levels_button)
     
-    def save_state(self):
-        state = GameState(
-            player_pos=self.player_pos,
-            boxes=self.boxes,
-            moves=self.moves,
-            pushes=self.pushes
-        )
-        self.history.append(state)
-    
     def undo(self):
-        if self.history:
-            state = self.history.pop()
-            self.player_pos = state.player_pos
-            self.boxes = state.boxes
-            self.moves = state.moves
-            self.pushes = state.pushes
+        if self.engine.undo():
             self.used_undo = True
+            self.push_bound.sync(self.boxes)
+            self.stop_search()
+            self.clear_hint()
+            return True
+        return False
+    
+    def redo(self):
+        if self.engine.redo():
+            self.push_bound.sync(self.boxes)
+            self.stop_search()
+            self.clear_hint()
             return True
         return False
     
@@ -237,51 +255,84 @@ class Sokoban:
         
         # 获取关卡布局
         self.layout = LEVELS[self.current_level]
+        self.stop_search()
+        self.clear_hint()
         
-        # 重置游戏状态
-        self.moves = 0
-        self.pushes = 0
+        # 创建新的引擎，同时重置移动和推箱计数
+        self.engine = GameEngine(self.layout, collapse_loops=True)
+        # 开局就有箱子在死格上的关卡无法完成；死格表在开始玩这一关时才计算
+        if self.engine.initial_boxes_on_dead:
+            print(f"警告：关卡 {self.level_name} 有箱子位于死角，关卡无法完成")
+        # 剩余推动次数的下界，箱子移动后增量更新
+        self.push_bound = PushLowerBound(self.layout)
+        # 离过关不远的局面查残局库得到精确值；这里只在后台读取离线构建好的文件，
+        # 没有文件时只显示下界
+        self.endgame = endgame_database(self.layout)
         self.level_complete = False
         
-        # 初始化游戏地图
-        self.walls = set()
-        self.boxes = set()
-        self.targets = set()
-        self.player_pos = None
-        
-        # 计算关卡尺寸
-        self.level_width = len(self.layout[0]) if self.layout else 0
-        self.level_height = len(self.layout)
-        
-        # 解析布局
-        for y, row in enumerate(self.layout):
-            for x, cell in enumerate(row):
-                if cell == '#':
-                    self.walls.add((x, y))
-                elif cell == '$':
-                    self.boxes.add((x, y))
-                elif cell == '.':
-                    self.targets.add((x, y))
-                elif cell == '@':
-                    self.player_pos = (x, y)
-                elif cell == '*':  # 箱子在目标点上
-                    self.boxes.add((x, y))
-                    self.targets.add((x, y))
-                elif cell == '+':  # 玩家在目标点上
-                    self.player_pos = (x, y)
-                    self.targets.add((x, y))
-        
         self.log_debug(f"关卡尺寸：{self.level_width}x{self.level_height}")
         self.log_debug(f"玩家初始位置：{self.player_pos}")
         self.log_debug(f"墙壁位置：{self.walls}")
         self.log_debug(f"箱子位置：{self.boxes}")
         self.log_debug(f"目标位置：{self.targets}")
     
+    def toggle_search(self):
+        """开始或取消对当前局面的后台求解"""
+        if self.search is not None:
+            self.stop_search()
+            return
+        self.search = AnytimeSearch(self.layout, self.boxes, self.player_pos,
+                                    time_limit=SEARCH_TIME_LIMIT).start()
+        self.search_progress = None
+
+    def stop_search(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+        self.search_progress = None
+
+    def update_search(self):
+        """每帧读取一次后台求解的进度，不会阻塞"""
+        reap_cancelled()
+        if self.search is None:
+            return
+        updates = self.search.poll()
+        if updates:
+            self.search_progress = updates[-1]
+        if self.search.done:
+            self.search.cancel()
+            self.search = None
+
+    def show_hint(self):
+        """在工作进程中用固定时间搜索最有希望的下一次推动，结果由 update_hint 读取"""
+        self.clear_hint()
+        self.hint_search = HintSearch(self.layout, self.boxes, self.player_pos,
+                                      HINT_BUDGET).start()
+        self.hint_text = "提示：正在搜索……"
+
+    def update_hint(self):
+        """每帧检查一次提示是否已经算好，不会阻塞"""
+        if self.hint_search is None or not self.hint_search.poll():
+            return
+        self.hint = self.hint_search.hint
+        self.hint_search.cancel()
+        self.hint_search = None
+        if self.hint is None:
+            self.hint_text = "提示：没有可走的推动，按 Z 撤销或 R 重来"
+        else:
+            (x, y), delta = self.hint
+            self.hint_text = f"提示：把 ({x}, {y}) 的箱子向{DIRECTION_NAMES[delta]}推"
+
+    def clear_hint(self):
+        if self.hint_search is not None:
+            self.hint_search.cancel()
+            self.hint_search = None
+        self.hint = None
+        self.hint_text = None
+
     def reset_level(self):
         """重置当前关卡"""
         # 重置游戏状态
-        self.moves = 0
-        self.pushes = 0
         self.used_undo = False
         self.level_complete = False
         
@@ -581,6 +632,8 @@ class Sokoban:
             self.screen.blit(self.sprites.box, box_rect)
             if box in self.targets:
                 pygame.draw.rect(self.screen, (0, 255, 0), box_rect, 2)
+            if self.hint is not None and box == self.hint[0]:
+                pygame.draw.rect(self.screen, YELLOW, box_rect, 4)
 
         # 绘制玩家
         player_rect = pygame.Rect(
@@ -598,8 +651,15 @@ class Sokoban:
             True, 
             (0, 0, 0)
         )
+        exact = self.endgame.lookup(self.boxes, self.player_pos)
+        if exact is not None:
+            remaining = exact
+        elif self.push_bound.value == INF:
+            remaining = '无解'
+        else:
+            remaining = f'≥{self.push_bound.value}'
         moves_text = self.font.render(
-            f"移动：{self.moves} 推动：{self.pushes}", 
+            f"移动：{self.moves} 推动：{self.pushes} 剩余推动：{remaining}", 
             True, 
             (0, 0, 0)
         )
@@ -612,6 +672,29 @@ class Sokoban:
         self.screen.blit(level_text, (10, 10))
         self.screen.blit(moves_text, (10, 50))
         self.screen.blit(par_text, (10, 90))
+
+        # 箱子进了死角或被冻结，提示玩家撤销
+        if self.engine.deadlocked:
+            deadlock_text = self.font.render("死局：有箱子无法再推到目标点，按 Z 撤销或 R 重来", True, (200, 0, 0))
+            self.screen.blit(deadlock_text, (10, 130))
+
+        progress = self.search_progress
+        if self.search is not None or progress is not None:
+            if progress is None:
+                status = "求解中..."
+            elif progress.pushes is None:
+                status = "无解" if progress.optimal else f"求解中：已搜索 {progress.nodes} 个局面"
+            else:
+                status = (f"{'最优解' if progress.optimal else '当前最好解'}："
+                          f"{progress.pushes} 次推动，{len(progress.moves)} 步")
+                if not progress.done:
+                    status += f"（已搜索 {progress.nodes} 个局面）"
+            search_text = self.font.render(status, True, (0, 0, 128))
+            self.screen.blit(search_text, (10, 170))
+
+        if self.hint_text is not None:
+            hint_text = self.font.render(self.hint_text, True, (128, 64, 0))
+            self.screen.blit(hint_text, (10, 210))
     
     def draw_game(self):
         """绘制游戏画面"""
@@ -735,56 +818,30 @@ class Sokoban:
         if not self.player_pos:
             self.log_debug("错误：未找到玩家位置")
             return False
-            
-        current_x, current_y = self.player_pos
-        new_x = current_x + dx
-        new_y = current_y + dy
         
         self.log_debug("\n尝试移动")
         self.log_debug(f"当前玩家位置：{self.player_pos}")
-        self.log_debug(f"尝试移动到：({new_x}, {new_y})")
-        self.log_debug(f"关卡范围：x(0-{self.level_width-1}), y(0-{self.level_height-1})")
+        self.log_debug(f"尝试移动方向：({dx}, {dy})")
         
-        # 检查是否越界
-        if not (0 <= new_x < self.level_width and 0 <= new_y < self.level_height):
-            self.log_debug(f"移动位置越界：new_x={new_x}, new_y={new_y}")
-            return False
-            
-        # 检查是否撞墙
-        if (new_x, new_y) in self.walls:
-            self.log_debug(f"新位置是墙壁：({new_x}, {new_y})")
+        pushes = self.pushes
+        deadlocked = self.engine.deadlocked
+        if not self.engine.move_player(dx, dy):
+            self.log_debug("无法移动：被墙壁、箱子或边界阻挡")
             return False
-            
-        # 检查是否推箱子
-        if (new_x, new_y) in self.boxes:
-            box_new_x = new_x + dx
-            box_new_y = new_y + dy
-            
-            # 检查箱子新位置是否有效
-            if not (0 <= box_new_x < self.level_width and 0 <= box_new_y < self.level_height):
-                self.log_debug(f"箱子新位置越界：({box_new_x}, {box_new_y})")
-                return False
-                
-            # 检查箱子新位置是否有墙或其他箱子
-            if (box_new_x, box_new_y) in self.walls or (box_new_x, box_new_y) in self.boxes:
-                self.log_debug(f"箱子无法移动到：({box_new_x}, {box_new_y})")
-                return False
-                
-            # 移动箱子
-            self.boxes.remove((new_x, new_y))
-            self.boxes.add((box_new_x, box_new_y))
-            self.pushes += 1
-            self.log_debug(f"推动箱子到：({box_new_x}, {box_new_y})")
-            
-        # 移动玩家
-        self.player_pos = (new_x, new_y)
-        self.moves += 1
+        self.clear_hint()
+        
+        if self.pushes != pushes:
+            # 箱子动了，后台求解的结果不再对应当前局面
+            self.stop_search()
+            self.log_debug(f"推动箱子到：({self.player_pos[0] + dx}, {self.player_pos[1] + dy})")
+            self.push_bound.sync(self.boxes)
+            if self.engine.deadlocked and not deadlocked:
+                self.log_debug("这次推动造成了死局")
         self.log_debug(f"玩家移动到：{self.player_pos}")
         
-        # 检查是否完成关卡
-        if self.check_win():
-            self.log_debug("恭喜！关卡完成！")
-            self.level_complete = True
+        # 检查是否完成关卡，计数由引擎增量维护，这里是 O(1) 判断
+        if not self.level_complete and self.check_win():
+            self.complete_level()
             
         return True
     
@@ -797,12 +854,17 @@ class Sokoban:
         return None
 
     def check_win(self):
-        """检查是否完成关卡"""
-        if all(box in self.targets for box in self.boxes):
-            self.log_debug(f"关卡{self.current_level + 1}完成！移动{self.moves}步，推箱{self.pushes}次")
-            self.update_score()
-            return True
-        return False
+        """检查是否完成关卡（不读写成绩文件）"""
+        return self.engine.check_win()
+    
+    def complete_level(self):
+        """关卡完成事件，每次通关只触发一次并保存一次成绩"""
+        if self.level_complete:
+            return
+        self.level_complete = True
+        self.log_debug("恭喜！关卡完成！")
+        self.log_debug(f"关卡{self.current_level + 1}完成！移动{self.moves}步，推箱{self.pushes}次")
+        self.update_score()
     
     def next_level(self):
         """切换到下一个关卡"""
@@ -833,9 +895,6 @@ class Sokoban:
                 # 动画结束
                 self.current_animation = None
                 self.animated_box = None
-                
-                # 检查是否完成关卡
-                self.check_win()
     
     def handle_level_complete_events(self, event):
         """处理关卡完成后的事件"""
@@ -999,16 +1058,15 @@ class Sokoban:
         # 将自定义关卡添加到现有关卡中
         custom_levels = self.load_custom_levels()
         if custom_levels:
-            # 在原有关卡后追加自定义关卡
-            LEVELS.extend(custom_levels)
-            
-            # 为每个自定义关卡添加默认元数据
-            for _ in range(len(custom_levels)):
-                LEVEL_DATA.append({
-                    "name": "自定义关卡", 
-                    "par_moves": 50, 
-                    "par_pushes": 25
-                })
+            # 在原有关卡后追加自定义关卡，使用默认元数据
+            for layout in custom_levels:
+                try:
+                    level = Level(layout, name="自定义关卡", par_moves=50, par_pushes=25)
+                except ValueError as e:
+                    print(f"跳过无效的自定义关卡: {e}")
+                    continue
+                LEVELS.append(level)
+                LEVEL_DATA.append(level.metadata())
             
             print(f"成功加载 {len(custom_levels)} 个自定义关卡")
 
@@ -1048,20 +1106,28 @@ class Sokoban:
                         self.move_player(0, -1)
                     elif event.key == pygame.K_DOWN:
                         self.move_player(0, 1)
+                    elif event.key == pygame.K_z:
+                        self.undo()
+                    elif event.key == pygame.K_y:
+                        self.redo()
                     elif event.key == pygame.K_r:
                         self.reset_level()
                     elif event.key == pygame.K_ESCAPE:
                         self.show_menu = True
                     elif event.key == pygame.K_TAB:
                         self.show_achievements = not self.show_achievements
+                    elif event.key == pygame.K_s:
+                        self.toggle_search()
+                    elif event.key == pygame.K_h:
+                        self.show_hint()
+            
+            # 后台求解的进度和提示
+            self.update_search()
+            self.update_hint()
             
             # 更新动画
             self.update_animation()
             
-            # 检查是否完成关卡
-            if not self.level_complete and not self.show_menu:
-                self.level_complete = self.check_win()
-            
             # 绘制游戏画面
             if self.show_menu:
                 self.screen.fill((200, 200, 200))  # 浅灰色背景
@@ -1074,50 +1140,6 @@ class Sokoban:
         
         pygame.quit()
 
-import os
-import json
-
-# 关卡文件目录
-LEVELS_DIR = os.path.join(os.path.dirname(__file__), 'levels')
-
-def load_levels():
-    """从levels目录加载所有关卡"""
-    levels = []
-    level_data = []
-    level_files = sorted([f for f in os.listdir(LEVELS_DIR) if f.endswith('.json') and f != '__init__.py'])
-    
-    for level_file in level_files:
-        try:
-            with open(os.path.join(LEVELS_DIR, level_file), 'r', encoding='utf-8') as f:
-                level_json = json.load(f)
-                
-                # 支持 layout 和 map 两种字段
-                level_layout = level_json.get('layout') or level_json.get('map')
-                
-                # 检查关卡文件是否包含必要的字段
-                if level_layout and isinstance(level_layout, list):
-                    # 确保每个关卡至少有一个玩家
-                    if not any('@' in row for row in level_layout):
-                        print(f"警告：关卡文件 {level_file} 没有玩家('@')，已跳过")
-                        continue
-                    
-                    levels.append(level_layout)
-                    level_data.append({
-                        'name': level_json.get('name', f'关卡 {len(levels)}'),
-                        'difficulty': level_json.get('difficulty', '未知'),
-                        'par_moves': level_json.get('par_moves', 50),
-                        'par_pushes': level_json.get('par_pushes', 25)
-                    })
-                else:
-                    print(f"警告：关卡文件 {level_file} 格式不正确，已跳过")
-        except Exception as e:
-            print(f"加载关卡文件 {level_file} 时出错: {e}")
-    
-    return levels, level_data
-
-# 替换原有的LEVELS和LEVEL_DATA定义
-LEVELS, LEVEL_DATA = load_levels()
-
 if __name__ == "__main__":
     game = Sokoban()
     game.run()
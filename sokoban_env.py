@@ -0,0 +1,143 @@
+"""推箱子强化学习环境
+
+提供 Gym 风格的 reset/step 接口，规则来自无界面的 engine.GameEngine，
+不需要窗口和音频设备。观测是一个 (高, 宽) 的 uint8 数组，每个格子按位组合：
+
+    OBS_WALL | OBS_TARGET | OBS_BOX | OBS_PLAYER
+
+render() 只在调用时才导入 pygame，画到离屏 Surface 上。
+"""
+
+import numpy as np
+
+from engine import DELTAS, DIRECTIONS, GameEngine
+from levels import LEVELS
+
+# 观测中每个格子的位标记
+OBS_WALL = 1
+OBS_TARGET = 2
+OBS_BOX = 4
+OBS_PLAYER = 8
+
+# 动作编号与 engine.DELTAS 一致：0 上，1 下，2 左，3 右
+ACTIONS = DELTAS
+
+# 奖励设置
+REWARD_STEP = -0.1
+REWARD_BOX_ON_TARGET = 1.0
+REWARD_BOX_OFF_TARGET = -1.0
+REWARD_SOLVED = 10.0
+
+
+class SokobanEnv:
+    """单局推箱子环境"""
+
+    def __init__(self, levels=None, max_steps=200):
+        self.levels = LEVELS if levels is None else levels
+        self.max_steps = max_steps
+        self.level_id = None
+        self.engine = None
+        self.steps = 0
+        self.observation = None
+        self.sprites = None
+
+    def reset(self, level_id=0):
+        """开始新的一局，返回初始观测，关卡没有玩家时抛出 ValueError"""
+        engine = GameEngine(self.levels[level_id])
+        if engine.player_pos is None:
+            raise ValueError(f"关卡 {level_id} 没有玩家")
+        self.level_id = level_id
+        self.engine = engine
+        self.steps = 0
+
+        # 墙和目标点不会变化，只在这里写一次；之后每步只改动变化的格子
+        observation = np.zeros((engine.height, engine.width), dtype=np.uint8)
+        for x, y in engine.walls:
+            if x < engine.width:
+                observation[y, x] = OBS_WALL
+        for x, y in engine.targets:
+            if x < engine.width:
+                observation[y, x] |= OBS_TARGET
+        for x, y in engine.boxes:
+            if x < engine.width:
+                observation[y, x] |= OBS_BOX
+        x, y = engine.player_pos
+        observation[y, x] |= OBS_PLAYER
+        self.observation = observation
+        return observation.copy()
+
+    def step(self, action):
+        """执行一个动作，返回 (observation, reward, done, info)
+
+        action 可以是动作编号 0-3，也可以是 udlr 方向字符。
+        """
+        if self.engine is None:
+            raise RuntimeError("请先调用 reset()")
+
+        engine = self.engine
+        dx, dy = DIRECTIONS[action] if isinstance(action, str) else ACTIONS[action]
+        old_x, old_y = engine.player_pos
+        pushes = engine.pushes
+        on_targets = engine.boxes_on_targets
+
+        moved = engine.move_player(dx, dy)
+        self.steps += 1
+        reward = REWARD_STEP
+
+        if moved:
+            observation = self.observation
+            new_x, new_y = engine.player_pos
+            observation[old_y, old_x] ^= OBS_PLAYER
+            observation[new_y, new_x] |= OBS_PLAYER
+            if engine.pushes != pushes:
+                observation[new_y, new_x] ^= OBS_BOX
+                observation[new_y + dy, new_x + dx] |= OBS_BOX
+                change = engine.boxes_on_targets - on_targets
+                if change > 0:
+                    reward += REWARD_BOX_ON_TARGET
+                elif change < 0:
+                    reward += REWARD_BOX_OFF_TARGET
+
+        solved = engine.check_win()
+        if solved:
+            reward += REWARD_SOLVED
+        done = solved or (self.max_steps is not None and self.steps >= self.max_steps)
+
+        info = {
+            'moved': moved,
+            'moves': engine.moves,
+            'pushes': engine.pushes,
+            'boxes_on_targets': engine.boxes_on_targets,
+            'solved': solved,
+        }
+        return self.observation.copy(), reward, done, info
+
+    def render(self, tile_size=32):
+        """把当前局面画到离屏 pygame.Surface 上并返回"""
+        import pygame
+        from sprites import SpriteSheet
+
+        if self.sprites is None or self.sprites.size != tile_size:
+            self.sprites = SpriteSheet(tile_size)
+        sprites = self.sprites
+
+        height, width = self.observation.shape
+        surface = pygame.Surface((width * tile_size, height * tile_size))
+        surface.fill((255, 255, 255))
+        for y in range(height):
+            for x in range(width):
+                cell = self.observation[y, x]
+                rect = pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size)
+                if cell & OBS_WALL:
+                    surface.blit(sprites.wall, rect)
+                    continue
+                surface.blit(sprites.floor, rect)
+                if cell & OBS_TARGET:
+                    surface.blit(sprites.target, rect)
+                if cell & OBS_BOX:
+                    surface.blit(sprites.box, rect)
+                    if cell & OBS_TARGET:
+                        pygame.draw.rect(surface, (0, 255, 0), rect, 2)
+                if cell & OBS_PLAYER:
+                    surface.blit(sprites.player, rect)
+        return surface
@@ -0,0 +1,273 @@
+"""缩短玩家的通关记录
+
+输入一个关卡和任意一个能通关的 LURD 移动序列，用局部搜索把它变短：
+
+1. 去掉绕回原局面的推动：推动后的 (箱子, 玩家所在区域) 与之前某一步相同，
+   中间的推动全部删掉；
+2. 重新求解长度为 window 的推动窗口：只允许移动窗口里被推过的箱子，在窗口起点和终点
+   之间搜推动次数更少的路线；
+3. 推动之间的走路全部换成最短路（Solver.to_moves）。
+
+前两步只在能保证总步数不增加时才替换：新片段的步数加上新终点走到旧终点的距离
+不超过旧片段的步数（三角不等式，后面的走路不会变长）。
+
+发布的目标步数可以来自已知最好的解，而不是手填的数字（par_moves 和 par_pushes
+都取自同一个经过回放验证的解，原来的值被覆盖）：
+
+    python solution_optimizer.py levels/level_5.json solution.txt --write-par
+"""
+
+import argparse
+import json
+import time
+from collections import deque
+
+from engine import DELTA_CODES, DIRECTIONS
+from solver import Solver
+
+DEFAULT_WINDOW = 4
+
+# 默认的优化时间（秒），包括回放和最后生成走路
+DEFAULT_TIME_LIMIT = 0.8
+
+# 每个窗口最多展开的局面数，避免个别窗口耗时过长
+WINDOW_NODES = 2000
+
+
+class SolutionOptimizer(Solver):
+    """单个关卡的通关记录优化器"""
+
+    def __init__(self, layout, window=DEFAULT_WINDOW):
+        super().__init__(layout)
+        self.window = window
+
+    def parse(self, moves):
+        """回放 LURD 字符串（大小写、空白都可以），返回推动列表 [(箱子格, 方向编号), ...]
+
+        撞墙、推不动或最后没有过关时抛出 ValueError。
+        """
+        board = self.board
+        boxes = board.initial_boxes
+        player = board.initial_player
+        if player < 0:
+            raise ValueError("关卡没有玩家")
+        pushes = []
+        for step, char in enumerate(''.join(moves.split()), 1):
+            if char not in DIRECTIONS:
+                raise ValueError(f"第 {step} 步不是方向字符：{char!r}")
+            direction = DELTA_CODES[DIRECTIONS[char]]
+            shift = self.shifts[direction]
+            target = player + shift
+            if not (self.floor >> target) & 1:
+                raise ValueError(f"第 {step} 步撞墙")
+            if (boxes >> target) & 1:
+                dest = target + shift
+                if not (self.floor >> dest) & 1 or (boxes >> dest) & 1:
+                    raise ValueError(f"第 {step} 步推不动箱子")
+                pushes.append((target, direction))
+                boxes ^= (1 << target) | (1 << dest)
+            player = target
+        if boxes & ~self.targets:
+            raise ValueError("移动结束时还有箱子不在目标点上")
+        return pushes
+
+    def states(self, pushes, boxes, player):
+        """从 (boxes, player) 开始每次推动之前的 (箱子位图, 玩家格子)，最后一项是推完以后的局面"""
+        result = [(boxes, player)]
+        for box, direction in pushes:
+            boxes ^= (1 << box) | (1 << (box + self.shifts[direction]))
+            player = box
+            result.append((boxes, player))
+        return result
+
+    def distance(self, start, goal, boxes):
+        return len(self.walk(start, goal, boxes))
+
+    def cost(self, pushes, boxes, player):
+        """从 (boxes, player) 开始执行推动列表的步数，返回 (步数, 结束时玩家格子)"""
+        total = 0
+        for box, direction in pushes:
+            shift = self.shifts[direction]
+            total += self.distance(player, box - shift, boxes) + 1
+            boxes ^= (1 << box) | (1 << (box + shift))
+            player = box
+        return total, player
+
+    def remove_cycles(self, pushes):
+        """删掉回到之前局面的推动片段"""
+        board = self.board
+        boxes, player = board.initial_boxes, board.initial_player
+        region = self.reachable(boxes, player)
+        key = (boxes, region & -region)
+        kept = []
+        states = [(boxes, player)]
+        keys = [key]
+        # 步数的前缀和，用来算被删掉片段的步数
+        costs = [0]
+        seen = {key: 0}
+        for box, direction in pushes:
+            shift = self.shifts[direction]
+            step = self.distance(player, box - shift, boxes) + 1
+            boxes ^= (1 << box) | (1 << (box + shift))
+            player = box
+            region = self.reachable(boxes, player)
+            key = (boxes, region & -region)
+            kept.append((box, direction))
+            states.append((boxes, player))
+            keys.append(key)
+            costs.append(costs[-1] + step)
+
+            start = seen.get(key)
+            if (start is not None
+                    and self.distance(states[start][1], player, boxes) <= costs[-1] - costs[start]):
+                for removed in keys[start + 1:-1]:
+                    if seen.get(removed, -1) > start:
+                        del seen[removed]
+                del kept[start:]
+                del states[start + 1:]
+                del keys[start + 1:]
+                del costs[start + 1:]
+                boxes, player = states[start]
+                continue
+            seen[key] = len(kept)
+        return kept
+
+    def solve_window(self, boxes, player, goal_boxes, goal_player, movable, limit):
+        """只推 movable 中的箱子，从 (boxes, player) 到 goal_boxes 且玩家能走到 goal_player，
+
+        返回少于 limit 次的最短推动列表，没有时返回 None。movable 是窗口开始时这些箱子的位置，
+        箱子移动后仍然按身份跟踪。
+        """
+        region = self.reachable(boxes, player)
+        if boxes == goal_boxes and (region >> goal_player) & 1:
+            return []
+        key = (boxes, region & -region)
+        fixed = boxes & ~movable
+        parents = {key: None}
+        queue = deque([(boxes, region, 0)])
+        nodes = 0
+        while queue:
+            boxes, region, depth = queue.popleft()
+            if depth + 1 >= limit:
+                continue
+            nodes += 1
+            if nodes > WINDOW_NODES:
+                return None
+            parent = (boxes, region & -region)
+            for box, dest, direction in self.pushes(boxes, region):
+                if (fixed >> box) & 1:
+                    continue
+                child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+                child_region = self.child_region(region, child_boxes, box, dest)
+                child_key = (child_boxes, child_region & -child_region)
+                if child_key in parents:
+                    continue
+                parents[child_key] = (parent, box, direction)
+                if child_boxes == goal_boxes and (child_region >> goal_player) & 1:
+                    return self.trace_pushes(parents, child_key)
+                queue.append((child_boxes, child_region, depth + 1))
+        return None
+
+    def resolve_windows(self, pushes, window, deadline=None):
+        """逐个长度为 window 的窗口寻找推动次数更少、步数不增加的替代路线"""
+        pushes = list(pushes)
+        states = self.states(pushes, self.board.initial_boxes, self.board.initial_player)
+        i = 0
+        while i < len(pushes):
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            end = min(i + window, len(pushes))
+            boxes, player = states[i]
+            goal_boxes, goal_player = states[end]
+
+            # 窗口里被推过的箱子在窗口开始时的位置
+            movable = 0
+            origin = {}
+            for box, direction in pushes[i:end]:
+                start = origin.pop(box, box)
+                if start == box:
+                    movable |= 1 << box
+                origin[box + self.shifts[direction]] = start
+
+            replacement = self.solve_window(boxes, player, goal_boxes, goal_player,
+                                            movable, end - i)
+            if replacement is not None:
+                old_cost = self.cost(pushes[i:end], boxes, player)[0]
+                new_cost, new_player = self.cost(replacement, boxes, player)
+                if new_cost + self.distance(new_player, goal_player, goal_boxes) <= old_cost:
+                    pushes[i:end] = replacement
+                    states[i:end + 1] = self.states(replacement, boxes, player)
+                    continue
+            i += 1
+        return pushes
+
+    def optimize(self, moves, time_limit=DEFAULT_TIME_LIMIT):
+        """返回不长于 moves 的 LURD 解
+
+        窗口重解一轮没有改进时把窗口加倍再来，直到窗口覆盖整个解或 time_limit 秒用完。
+        """
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        pushes = self.remove_cycles(self.parse(moves))
+        window = self.window
+        while window <= len(pushes):
+            shorter = self.resolve_windows(pushes, window, deadline)
+            if deadline is not None and time.monotonic() > deadline:
+                pushes = shorter
+                break
+            if len(shorter) == len(pushes):
+                window *= 2
+            pushes = shorter
+        result = self.to_moves(pushes)
+        original = ''.join(moves.split())
+        return result if len(result) <= len(original) else original
+
+
+def optimize_solution(layout, moves, window=DEFAULT_WINDOW, time_limit=DEFAULT_TIME_LIMIT):
+    """缩短关卡 layout 的通关记录 moves，返回新的 LURD 字符串"""
+    return SolutionOptimizer(layout, window).optimize(moves, time_limit)
+
+
+def main():
+    from levels import load_level_file
+
+    parser = argparse.ArgumentParser(description="缩短通关记录，可选地据此更新关卡的目标步数")
+    parser.add_argument('level', help="关卡 JSON 文件")
+    parser.add_argument('solution', help="保存 LURD 通关记录的文本文件")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help="重解窗口的推动次数")
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, help="优化的时间上限（秒）")
+    parser.add_argument('--write-par', action='store_true',
+                        help="用优化后的解写回 par_moves 和 par_pushes")
+    args = parser.parse_args()
+
+    level = load_level_file(args.level)
+    with open(args.solution, 'r', encoding='utf-8') as f:
+        moves = f.read()
+    try:
+        result = optimize_solution(level, moves, args.window, args.time_limit)
+    except ValueError as e:
+        print(f"通关记录无效：{e}")
+        return 1
+    pushes = sum(char.isupper() for char in result)
+    print(result)
+    print(f"步数 {len(''.join(moves.split()))} -> {len(result)}，推动 {pushes} 次")
+
+    if args.write_par:
+        # 写回之前再回放一遍，两个数字都来自这个解
+        try:
+            SolutionOptimizer(level).parse(result)
+        except ValueError as e:
+            print(f"优化后的解无效，没有写回目标步数：{e}")
+            return 1
+        with open(args.level, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        old = (data.get('par_moves'), data.get('par_pushes'))
+        data['par_moves'] = len(result)
+        data['par_pushes'] = pushes
+        with open(args.level, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        print(f"已更新 {args.level} 的目标步数：{old[0]}/{old[1]} -> {len(result)}/{pushes}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
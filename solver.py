@@ -0,0 +1,386 @@
+"""推箱子求解器
+
+读取与 parse_level 相同的关卡布局（支持 * 和 +），用 A* 搜索推箱次数最少的解，
+节点数超过上限时改用 IDA*；solve_moves 则求总步数（走路加推箱）最少的解。局面用 bitboard.BitboardEngine 的整数位图表示：
+
+- 置换表的键是 (箱子位图, 玩家可达区域中编号最小的格子)，
+  玩家在同一区域内的不同位置视为同一个局面；
+- 每个方向上所有可推的箱子用一次移位和掩码求出；
+- 启发函数是每个箱子到最近目标点的推动距离之和，推动一次只需增量更新。
+
+解以 LURD 字符串返回，小写字母是走路，大写字母是推箱子。
+"""
+
+import heapq
+import time
+from collections import deque
+
+from bitboard import BitboardEngine
+from engine import DELTAS, DIRECTION_CHARS
+from push_distances import UNREACHABLE, push_distances
+
+INF = float('inf')
+
+# IDA* 找到解时的返回值
+FOUND = -1
+
+# A* 默认最多展开的节点数
+DEFAULT_MAX_NODES = 200000
+# IDA* 几乎不占内存，超出 A* 的上限后可以展开更多节点
+IDA_MAX_NODES = 2000000
+# solve 和 solve_moves 默认的时间上限（秒）
+DEFAULT_TIME_LIMIT = 10.0
+
+
+class SearchLimitReached(Exception):
+    """超出节点数或时间限制"""
+
+
+class Solver:
+    """单个关卡的推箱最优求解器"""
+
+    def __init__(self, layout):
+        self.board = BitboardEngine(layout)
+        board = self.board
+        self.stride = board.stride
+        self.floor = board.floor
+        self.targets = board.targets
+        # 与 engine.DELTAS 顺序相同的格子编号偏移：上、下、左、右
+        self.shifts = tuple(dy * self.stride + dx for dx, dy in DELTAS)
+
+        self.distances = self.push_distances()
+        # 无法推到任何目标点的格子，箱子一旦推进去就无解
+        self.dead = 0
+        for cell, distance in enumerate(self.distances):
+            if distance == INF and (self.floor >> cell) & 1:
+                self.dead |= 1 << cell
+        self.live = self.floor & ~self.dead
+
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+
+    def push_distances(self):
+        """每个格子上的箱子最少推几次能到达某个目标点（忽略其他箱子），按位图格子编号排列
+
+        数据来自 push_distances 模块按关卡缓存的距离表。
+        """
+        table = push_distances(self.board.layout)
+        distances = [INF] * self.board.size
+        for y in range(table.height):
+            for x in range(table.width):
+                distance = table.nearest[y * table.width + x]
+                if distance != UNREACHABLE:
+                    distances[y * self.stride + x] = distance
+        return distances
+
+    def heuristic(self, boxes):
+        """所有箱子到最近目标点的推动距离之和"""
+        total = 0
+        distances = self.distances
+        while boxes:
+            low = boxes & -boxes
+            boxes ^= low
+            total += distances[low.bit_length() - 1]
+        return total
+
+    def reachable(self, boxes, player):
+        return self.board.reachable(boxes, player)
+
+    def walk_layers(self, boxes, player):
+        """从 player 出发按步数分层的可达格子，第 d 个位图是恰好走 d 步能到的格子"""
+        free = self.floor & ~boxes
+        stride = self.stride
+        seen = frontier = 1 << player
+        while frontier:
+            yield frontier
+            frontier = ((frontier << 1) | (frontier >> 1) | (frontier << stride)
+                        | (frontier >> stride)) & free & ~seen
+            seen |= frontier
+
+    def child_region(self, region, child_boxes, box, dest):
+        """推动后玩家的可达区域
+
+        箱子推进了原来走不到的格子时，原区域不受影响，只需从原区域加上箱子原位置继续扩展；
+        否则区域可能被箱子截断，需要从玩家的新位置重新填充。
+        """
+        if (region >> dest) & 1:
+            return self.board.reachable(child_boxes, box)
+
+        free = self.floor & ~child_boxes
+        stride = self.stride
+        region |= 1 << box
+        while True:
+            grown = region | ((region << 1) | (region >> 1)
+                              | (region << stride) | (region >> stride)) & free
+            if grown == region:
+                return region
+            region = grown
+
+    def pushes(self, boxes, region):
+        """生成所有合法推动 (箱子格, 目标格, 方向编号)
+
+        玩家必须能走到箱子后面，箱子前方必须是没有箱子的非死格。
+        """
+        free = self.live & ~boxes
+        for direction, shift in enumerate(self.shifts):
+            if shift > 0:
+                dests = (((region << shift) & boxes) << shift) & free
+            else:
+                dests = (((region >> -shift) & boxes) >> -shift) & free
+            while dests:
+                low = dests & -dests
+                dests ^= low
+                dest = low.bit_length() - 1
+                yield dest - shift, dest, direction
+
+    def check_limits(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchLimitReached()
+        if self.deadline is not None and not self.nodes & 1023 and time.monotonic() > self.deadline:
+            raise SearchLimitReached()
+
+    def astar(self):
+        """A* 搜索，返回推动列表 [(箱子格, 方向编号), ...]，无解时返回 None"""
+        board = self.board
+        boxes = board.initial_boxes
+        region = self.reachable(boxes, board.initial_player)
+        key = (boxes, region & -region)
+        h = self.heuristic(boxes)
+
+        best = {key: 0}
+        parents = {key: None}
+        counter = 0
+        heap = [(h, 0, counter, key, region, h)]
+        while heap:
+            _, negative_cost, _, key, region, h = heapq.heappop(heap)
+            cost = -negative_cost
+            if best[key] < cost:
+                continue
+            if h == 0:
+                return self.trace_pushes(parents, key)
+            self.check_limits()
+
+            boxes = key[0]
+            child_cost = cost + 1
+            distances = self.distances
+            for box, dest, direction in self.pushes(boxes, region):
+                child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+                child_region = self.child_region(region, child_boxes, box, dest)
+                child_key = (child_boxes, child_region & -child_region)
+                if child_cost < best.get(child_key, INF):
+                    best[child_key] = child_cost
+                    parents[child_key] = (key, box, direction)
+                    child_h = h - distances[box] + distances[dest]
+                    counter += 1
+                    heapq.heappush(heap, (child_cost + child_h, -child_cost, counter,
+                                          child_key, child_region, child_h))
+        return None
+
+    @staticmethod
+    def trace_pushes(parents, key):
+        pushes = []
+        while parents[key] is not None:
+            key, box, direction = parents[key]
+            pushes.append((box, direction))
+        pushes.reverse()
+        return pushes
+
+    def ida_star(self, table_size=1000000):
+        """IDA* 搜索，置换表最多保存 table_size 个局面，返回推动列表或 None"""
+        board = self.board
+        boxes = board.initial_boxes
+        region = self.reachable(boxes, board.initial_player)
+        h = self.heuristic(boxes)
+        bound = h
+        path = []
+
+        while bound < INF:
+            table = {}
+
+            def search(boxes, region, cost, h):
+                f = cost + h
+                if f > bound:
+                    return f
+                if h == 0:
+                    return FOUND
+                key = (boxes, region & -region)
+                if table.get(key, INF) <= cost:
+                    return INF
+                if len(table) < table_size or key in table:
+                    table[key] = cost
+                self.check_limits()
+
+                # 先尝试启发值小的推动
+                children = []
+                for box, dest, direction in self.pushes(boxes, region):
+                    child_h = h - self.distances[box] + self.distances[dest]
+                    children.append((child_h, box, dest, direction))
+                children.sort()
+
+                minimum = INF
+                for child_h, box, dest, direction in children:
+                    child_boxes = boxes ^ (1 << box) ^ (1 << dest)
+                    path.append((box, direction))
+                    child_region = self.child_region(region, child_boxes, box, dest)
+                    result = search(child_boxes, child_region, cost + 1, child_h)
+                    if result == FOUND:
+                        return FOUND
+                    path.pop()
+                    minimum = min(minimum, result)
+                return minimum
+
+            result = search(boxes, region, 0, h)
+            if result == FOUND:
+                return list(path)
+            bound = result
+        return None
+
+    def move_astar(self):
+        """以总步数为代价的 A*，返回推动列表 [(箱子格, 方向编号), ...]，无解时返回 None
+
+        局面是 (箱子位图, 玩家位置)，玩家位置就是刚推过的箱子原来所在的格子。
+        每次扩展按步数分层遍历玩家可达区域，同一层里的所有推动代价相同：走路步数加 1。
+        推动距离之和仍然是可采纳的启发值，因为每次推动至少走一步。
+        """
+        board = self.board
+        key = (board.initial_boxes, board.initial_player)
+        h = self.heuristic(board.initial_boxes)
+
+        best = {key: 0}
+        parents = {key: None}
+        counter = 0
+        heap = [(h, 0, counter, key, h)]
+        distances = self.distances
+        while heap:
+            _, cost, _, key, h = heapq.heappop(heap)
+            if best[key] < cost:
+                continue
+            if h == 0:
+                return self.trace_pushes(parents, key)
+            self.check_limits()
+
+            boxes, player = key
+            for steps, layer in enumerate(self.walk_layers(boxes, player)):
+                child_cost = cost + steps + 1
+                for box, dest, direction in self.pushes(boxes, layer):
+                    child_key = (boxes ^ (1 << box) ^ (1 << dest), box)
+                    if child_cost < best.get(child_key, INF):
+                        best[child_key] = child_cost
+                        parents[child_key] = (key, box, direction)
+                        child_h = h - distances[box] + distances[dest]
+                        counter += 1
+                        heapq.heappush(heap, (child_cost + child_h, child_cost, counter,
+                                              child_key, child_h))
+        return None
+
+    def walk(self, start, goal, boxes):
+        """玩家从 start 走到 goal 的最短路径（方向编号列表），不推箱子"""
+        if start == goal:
+            return []
+        free = self.floor & ~boxes
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for direction, shift in enumerate(self.shifts):
+                neighbor = cell + shift
+                if neighbor >= 0 and neighbor not in parents and (free >> neighbor) & 1:
+                    parents[neighbor] = (cell, direction)
+                    if neighbor == goal:
+                        path = []
+                        while parents[neighbor] is not None:
+                            neighbor, step = parents[neighbor]
+                            path.append(step)
+                        path.reverse()
+                        return path
+                    queue.append(neighbor)
+        return None
+
+    def to_moves(self, pushes):
+        """把推动列表转换为完整的 LURD 移动字符串"""
+        boxes = self.board.initial_boxes
+        player = self.board.initial_player
+        chars = []
+        for box, direction in pushes:
+            shift = self.shifts[direction]
+            for step in self.walk(player, box - shift, boxes):
+                chars.append(DIRECTION_CHARS[DELTAS[step]])
+            chars.append(DIRECTION_CHARS[DELTAS[direction]].upper())
+            boxes ^= (1 << box) | (1 << (box + shift))
+            player = box
+        return ''.join(chars)
+
+    def hopeless(self):
+        """不用搜索就能确定无解：没有玩家、箱子比目标点多或者箱子在死格上"""
+        board = self.board
+        if board.initial_player < 0:
+            return True
+        if bin(board.initial_boxes).count('1') > bin(self.targets).count('1'):
+            return True
+        return bool(board.initial_boxes & self.dead)
+
+    def solve(self, max_nodes=DEFAULT_MAX_NODES, time_limit=DEFAULT_TIME_LIMIT,
+              ida_max_nodes=IDA_MAX_NODES):
+        """求推箱次数最少的解，返回 LURD 字符串；无解或超出限制时返回 None
+
+        先用 A* 搜索最多 max_nodes 个节点，超出后改用占内存少的 IDA*，最多展开
+        ida_max_nodes 个节点（各轮迭代加在一起）。两次搜索加起来不超过 time_limit 秒。
+        各个限制为 None 时不限。
+        """
+        if self.hopeless():
+            return None
+
+        self.nodes = 0
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        try:
+            self.max_nodes = max_nodes
+            try:
+                pushes = self.astar()
+            except SearchLimitReached:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    return None
+                self.nodes = 0
+                self.max_nodes = ida_max_nodes
+                pushes = self.ida_star()
+        except SearchLimitReached:
+            return None
+        finally:
+            self.max_nodes = None
+            self.deadline = None
+
+        if pushes is None:
+            return None
+        return self.to_moves(pushes)
+
+    def solve_moves(self, time_limit=DEFAULT_TIME_LIMIT):
+        """求总步数最少的解，返回 LURD 字符串，字符串长度就是最少步数
+
+        无解或 time_limit 秒内没有找到时返回 None，time_limit 为 None 表示不限时。
+        """
+        if self.hopeless():
+            return None
+
+        self.nodes = 0
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        try:
+            pushes = self.move_astar()
+        except SearchLimitReached:
+            return None
+        finally:
+            self.deadline = None
+
+        if pushes is None:
+            return None
+        return self.to_moves(pushes)
+
+
+def solve(layout, max_nodes=DEFAULT_MAX_NODES, time_limit=DEFAULT_TIME_LIMIT):
+    """求关卡的推箱最优解，返回 LURD 字符串或 None"""
+    return Solver(layout).solve(max_nodes, time_limit)
+
+
+def solve_moves(layout, time_limit=DEFAULT_TIME_LIMIT):
+    """求关卡的步数最优解，返回 LURD 字符串或 None"""
+    return Solver(layout).solve_moves(time_limit)
@@ -0,0 +1,138 @@
+"""关卡结构分析：隧道、关节格和目标房间
+
+对每个布局做一次分析，结果按布局缓存：
+
+- 隧道：两侧都是墙的一格宽通道格子，箱子在里面只能沿通道推；
+- 关节格：被箱子堵住后关卡内部会分成几块的格子（图论中的割点）；
+- 目标房间：只有一个入口（关节格）、包含目标点、开局没有箱子的区域，
+  所有箱子都要经过入口推进去。
+
+宏移动、编辑器标注和难度评估直接读取这些集合，不必每次从 walls 重新推导。
+"""
+
+from engine import DELTAS, parse_level
+from layout_cache import cached_by_layout
+
+
+class LevelStructure:
+    """单个布局的结构分析结果"""
+
+    def __init__(self, layout):
+        walls, boxes, targets, player_pos, self.width, self.height = parse_level(layout)
+        self.walls = walls
+
+        def floor(cell):
+            x, y = cell
+            return 0 <= x < self.width and 0 <= y < self.height and cell not in walls
+
+        # 关卡内部：忽略箱子时玩家能到的格子；没有玩家时取所有非墙格子
+        if player_pos is not None:
+            interior = {player_pos}
+            stack = [player_pos]
+            while stack:
+                x, y = stack.pop()
+                for dx, dy in DELTAS:
+                    cell = (x + dx, y + dy)
+                    if cell not in interior and floor(cell):
+                        interior.add(cell)
+                        stack.append(cell)
+        else:
+            interior = {(x, y) for y in range(self.height) for x in range(self.width)
+                        if floor((x, y))}
+        self.interior = frozenset(interior)
+        self.neighbors = {
+            cell: tuple((cell[0] + dx, cell[1] + dy) for dx, dy in DELTAS
+                        if (cell[0] + dx, cell[1] + dy) in interior)
+            for cell in interior
+        }
+
+        # 隧道：左右都是墙或上下都是墙
+        tunnels = set()
+        for x, y in interior:
+            if ((not floor((x - 1, y)) and not floor((x + 1, y)))
+                    or (not floor((x, y - 1)) and not floor((x, y + 1)))):
+                tunnels.add((x, y))
+        self.tunnels = frozenset(tunnels)
+
+        self.articulations = frozenset(self.find_articulations())
+
+        # 目标房间：去掉入口后与其余部分分开、包含目标点且没有箱子的区域
+        rooms = {}
+        for entrance in self.articulations:
+            for room in self.components_without(entrance):
+                room_targets = room & targets
+                if room_targets and not room & boxes:
+                    # 同一组目标点只保留最小的房间，也就是离目标点最近的入口
+                    key = frozenset(room_targets)
+                    if key not in rooms or len(room) < len(rooms[key][1]):
+                        rooms[key] = (entrance, frozenset(room))
+        # 嵌套的房间只保留最外层，例如一排目标点只算一个房间
+        rooms = [(entrance, room) for entrance, room in rooms.values()
+                 if not any(room < other for _, other in rooms.values())]
+        self.goal_rooms = sorted(rooms, key=lambda item: (len(item[1]), min(item[1])))
+
+        # 格子 -> 所在目标房间的下标
+        self.room_of = {}
+        for i, (_, room) in enumerate(self.goal_rooms):
+            for cell in room:
+                self.room_of.setdefault(cell, i)
+
+    def find_articulations(self):
+        """Tarjan 算法求内部格子图的所有割点（迭代实现，避免递归过深）"""
+        order = {}
+        low = {}
+        result = set()
+        for root in self.interior:
+            if root in order:
+                continue
+            order[root] = low[root] = len(order)
+            root_children = 0
+            stack = [(root, None, iter(self.neighbors[root]))]
+            while stack:
+                cell, parent, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    if parent is not None:
+                        low[parent] = min(low[parent], low[cell])
+                        if parent != root and low[cell] >= order[parent]:
+                            result.add(parent)
+                    continue
+                if child == parent:
+                    continue
+                if child in order:
+                    low[cell] = min(low[cell], order[child])
+                else:
+                    order[child] = low[child] = len(order)
+                    if cell == root:
+                        root_children += 1
+                    stack.append((child, cell, iter(self.neighbors[child])))
+            if root_children > 1:
+                result.add(root)
+        return result
+
+    def components_without(self, blocked):
+        """去掉 blocked 格子后内部的各个连通块"""
+        seen = {blocked}
+        components = []
+        for start in self.neighbors[blocked]:
+            if start in seen:
+                continue
+            component = {start}
+            seen.add(start)
+            stack = [start]
+            while stack:
+                cell = stack.pop()
+                for neighbor in self.neighbors[cell]:
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        component.add(neighbor)
+                        stack.append(neighbor)
+            components.append(component)
+        return components
+
+
+@cached_by_layout()
+def level_structure(layout):
+    """返回布局的 LevelStructure，按布局缓存"""
+    return LevelStructure(layout)
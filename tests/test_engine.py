@@ -0,0 +1,350 @@
+import sys
+import os
+import unittest
+import random
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import DIRECTIONS, GameEngine, dead_squares, parse_level
+from bitboard import BitboardEngine
+from levels import LEVELS
+from fuzz import fuzz, shrink, find_divergence, replays
+from reachability import Reachability, analyze_state
+from layout_cache import LayoutCache, cached_by_layout
+
+SIMPLE_LEVEL = [
+    "#######",
+    "#@ $ .#",
+    "#######"
+]
+
+
+class TestGameEngine(unittest.TestCase):
+    def test_parse_level(self):
+        """测试关卡解析，包括 * 和 + 两种组合格子"""
+        walls, boxes, targets, player_pos, width, height = parse_level([
+            "#####",
+            "#+*$#",
+            "#####"
+        ])
+        self.assertEqual(player_pos, (1, 1))
+        self.assertEqual(boxes, {(2, 1), (3, 1)})
+        self.assertEqual(targets, {(1, 1), (2, 1)})
+        self.assertEqual((width, height), (5, 3))
+        self.assertIn((0, 0), walls)
+
+    def test_move_and_push(self):
+        """测试移动、推箱和计数"""
+        engine = GameEngine(SIMPLE_LEVEL)
+        self.assertTrue(engine.move_player(1, 0))
+        self.assertEqual((engine.moves, engine.pushes), (1, 0))
+        self.assertTrue(engine.move_player(1, 0))
+        self.assertEqual(engine.boxes, {(4, 1)})
+        self.assertEqual((engine.moves, engine.pushes), (2, 1))
+        self.assertFalse(engine.check_win())
+        self.assertTrue(engine.move_player(1, 0))
+        self.assertTrue(engine.check_win())
+
+    def test_blocked_moves(self):
+        """测试撞墙和箱子推不动时不计步"""
+        engine = GameEngine(SIMPLE_LEVEL)
+        self.assertFalse(engine.move_player(0, -1))
+        self.assertFalse(engine.move_player(-1, 0))
+        self.assertEqual(engine.play("rrrr"), 3)
+        self.assertEqual((engine.moves, engine.pushes), (3, 2))
+
+    def test_undo_redo(self):
+        """测试撤销、重做和回到起点"""
+        engine = GameEngine(SIMPLE_LEVEL)
+        engine.play("rrl")
+        self.assertEqual(engine.solution(), "rRl")
+        self.assertTrue(engine.undo())
+        self.assertTrue(engine.undo())
+        self.assertEqual(engine.player_pos, (2, 1))
+        self.assertEqual(engine.boxes, {(3, 1)})
+        self.assertEqual((engine.moves, engine.pushes), (1, 0))
+        self.assertTrue(engine.redo())
+        self.assertEqual(engine.boxes, {(4, 1)})
+        engine.rewind()
+        self.assertEqual(engine.player_pos, (1, 1))
+        self.assertFalse(engine.undo())
+        while engine.redo():
+            pass
+        self.assertEqual(engine.player_pos, (2, 1))
+        self.assertEqual((engine.moves, engine.pushes), (3, 1))
+        # 撤销后的新移动会丢弃后面的记录
+        engine.undo()
+        engine.play("r")
+        self.assertEqual(engine.solution(), "rRR")
+        self.assertFalse(engine.redo())
+
+    def test_boxes_on_targets(self):
+        """测试目标点上的箱子数随推动和撤销增量更新"""
+        engine = GameEngine([
+            "########",
+            "#@$.  *#",
+            "########"
+        ])
+        self.assertEqual(engine.boxes_on_targets, 1)
+        engine.play("r")
+        self.assertEqual(engine.boxes_on_targets, 2)
+        self.assertTrue(engine.check_win())
+        engine.play("r")
+        self.assertEqual(engine.boxes_on_targets, 1)
+        self.assertFalse(engine.check_win())
+        engine.undo()
+        self.assertTrue(engine.check_win())
+        engine.undo()
+        self.assertEqual(engine.boxes_on_targets, 1)
+
+    def test_zobrist_hash(self):
+        """测试哈希随推动增量更新，并与重新计算的结果一致"""
+        engine = GameEngine(SIMPLE_LEVEL)
+        start_hash = engine.hash
+        start_normalized = engine.normalized_hash()
+        engine.play("r")
+        self.assertNotEqual(engine.hash, start_hash)
+        self.assertEqual(engine.normalized_hash(), start_normalized)
+        engine.play("r")
+        fresh = GameEngine(["#######", "#  @$.#", "#######"])
+        self.assertEqual(engine.hash, fresh.hash)
+        self.assertEqual(engine.normalized_hash(), fresh.normalized_hash())
+        engine.undo()
+        self.assertEqual(engine.normalized_hash(), start_normalized)
+
+    def test_collapse_loops(self):
+        """测试回到之前的局面时撤销历史不再增长"""
+        engine = GameEngine(SIMPLE_LEVEL, collapse_loops=True)
+        engine.play("rlrl")
+        self.assertEqual(engine.solution(), "")
+        self.assertEqual(engine.moves, 4)
+        engine.play("rrl")
+        self.assertEqual(engine.solution(), "rRl")
+        engine.play("r")
+        self.assertEqual(engine.solution(), "rR")
+        engine.undo()
+        engine.play("l")
+        self.assertEqual(engine.solution(), "")
+        self.assertEqual(engine.player_pos, (1, 1))
+
+    def test_dead_squares(self):
+        """测试死格表：只有能推到目标点的格子是活格，推进死格后 deadlocked 为真"""
+        layout = [
+            "#######",
+            "#     #",
+            "# @$. #",
+            "#     #",
+            "#######"
+        ]
+        walls, _, _, _, width, height = parse_level(layout)
+        floor = {(x, y) for y in range(height) for x in range(width)} - walls
+        self.assertEqual(dead_squares(layout), floor - {(2, 2), (3, 2), (4, 2)})
+        self.assertIs(dead_squares(list(layout)), dead_squares(layout))
+
+        engine = GameEngine(layout)
+        engine.play("dru")
+        self.assertEqual(engine.boxes, {(3, 1)})
+        self.assertTrue(engine.deadlocked)
+        engine.undo()
+        self.assertFalse(engine.deadlocked)
+        engine.redo()
+        self.assertTrue(engine.deadlocked)
+        engine.rewind()
+        self.assertFalse(engine.deadlocked)
+
+    def test_freeze_deadlock(self):
+        """测试两个箱子靠墙并排时冻结死锁，撤销后解除"""
+        layout = [
+            "#######",
+            "#. $ .#",
+            "# $   #",
+            "# @   #",
+            "#######"
+        ]
+        engine = GameEngine(layout)
+        self.assertFalse(engine.deadlocked)
+        engine.play("u")
+        self.assertEqual(engine.boxes_on_dead, 0)
+        self.assertTrue(engine.deadlocked)
+        engine.undo()
+        self.assertFalse(engine.deadlocked)
+        engine.redo()
+        self.assertTrue(engine.deadlocked)
+
+        # 单个箱子靠墙还能左右推动，不算死锁
+        engine = GameEngine(["#######", "#.   .#", "# $   #", "# @   #", "#######"])
+        engine.play("u")
+        self.assertFalse(engine.deadlocked)
+
+
+class TestBitboardEngine(unittest.TestCase):
+    def test_matches_game_engine(self):
+        """测试位棋盘引擎与普通引擎在随机移动下结果一致"""
+        rng = random.Random(0)
+        for i, layout in enumerate(LEVELS):
+            with self.subTest(level_number=i+1):
+                reference = GameEngine(layout)
+                bitboard = BitboardEngine(layout)
+                for char in ''.join(rng.choice('udlr') for _ in range(500)):
+                    self.assertEqual(reference.play(char), bitboard.play(char))
+                    self.assertEqual(reference.player_pos, bitboard.player_pos)
+                    self.assertEqual(reference.boxes, bitboard.boxes)
+                    self.assertEqual(reference.check_win(), bitboard.check_win())
+                self.assertEqual((reference.moves, reference.pushes),
+                                 (bitboard.moves, bitboard.pushes))
+                self.assertEqual(reference.solution(), bitboard.solution())
+                while reference.undo():
+                    self.assertTrue(bitboard.undo())
+                self.assertEqual(bitboard.boxes, set(reference.initial_boxes))
+                self.assertEqual(bitboard.player_pos, reference.player_pos)
+
+    def test_reachable_and_state(self):
+        """测试可达区域和整数状态"""
+        engine = BitboardEngine(SIMPLE_LEVEL)
+        self.assertEqual(engine.to_positions(engine.reachable()), {(1, 1), (2, 1)})
+        state = engine.state()
+        engine.play("rr")
+        self.assertFalse(engine.check_win())
+        engine.play("r")
+        self.assertTrue(engine.check_win())
+        engine.set_state(state)
+        self.assertEqual(engine.player_pos, (1, 1))
+        self.assertEqual(engine.boxes, {(3, 1)})
+        self.assertEqual(engine.normalized_state(), state)
+
+
+class TestReachability(unittest.TestCase):
+    def test_corrals_and_pushes(self):
+        """测试箱子围出的区域和可达区域外的推动"""
+        layout = [
+            "#######",
+            "#@ #  #",
+            "#  $. #",
+            "#  #  #",
+            "#######"
+        ]
+        region, corrals, pushes = analyze_state(layout, {(3, 2)}, (1, 1))
+        self.assertEqual(region, {(1, 1), (2, 1), (1, 2), (2, 2), (1, 3), (2, 3)})
+        self.assertEqual(corrals, [{(4, 1), (5, 1), (4, 2), (5, 2), (4, 3), (5, 3)}])
+        self.assertEqual(pushes, [((3, 2), (1, 0))])
+
+    def test_matches_flood_fill(self):
+        """随机游玩时与 BitboardEngine.reachable 结果一致"""
+        rng = random.Random(3)
+        for level in LEVELS:
+            reach = Reachability(level)
+            board = BitboardEngine(level)
+            for _ in range(300):
+                board.move_player(*rng.choice(((0, 1), (0, -1), (1, 0), (-1, 0))))
+                region, corrals, pushes = reach.analyze(board.box_bits, board.player)
+                self.assertEqual(region, board.reachable())
+                for corral in corrals:
+                    self.assertFalse(corral & region)
+                self.assertEqual(sum(corrals) | region, reach.interior & ~board.box_bits)
+                for box, dest, direction in pushes:
+                    self.assertTrue(board.box_bits >> box & 1)
+                    self.assertEqual(dest - box, reach.shifts[direction])
+
+
+class TestLayoutCache(unittest.TestCase):
+    def setUp(self):
+        # 测试会清空全局的死格表缓存，结束后恢复原来的条目
+        self.saved_dead_squares = dead_squares.entries.copy()
+
+    def tearDown(self):
+        dead_squares.entries.clear()
+        dead_squares.entries.update(self.saved_dead_squares)
+
+    def test_lru_eviction(self):
+        """测试按布局缓存，超过容量时淘汰最久没有用过的布局"""
+        calls = []
+
+        @cached_by_layout(capacity=2)
+        def measure(layout, scale=1):
+            """布局的行数"""
+            calls.append(tuple(layout))
+            return len(layout) * scale
+
+        self.assertIsInstance(measure, LayoutCache)
+        self.assertEqual(measure.__doc__, "布局的行数")
+        first, second, third = ["#"], ["#", "#"], ["#", "#", "#"]
+        self.assertEqual(measure(first), 1)
+        # 列表和元组形式的同一个布局共用一个条目，后面的参数不参与缓存键
+        self.assertEqual(measure(tuple(first), scale=10), 1)
+        self.assertEqual(measure(second), 2)
+        measure(first)
+        self.assertEqual(measure(third), 3)
+        self.assertEqual(len(measure), 2)
+        self.assertIn(first, measure)
+        self.assertNotIn(second, measure)
+        self.assertEqual(calls, [tuple(first), tuple(second), tuple(third)])
+
+        measure.cache_clear()
+        self.assertEqual(len(measure), 0)
+
+    def test_dead_squares_cache_is_bounded(self):
+        """测试死格表缓存最多保留 capacity 个布局"""
+        dead_squares.cache_clear()
+        for width in range(5, 5 + dead_squares.capacity + 10):
+            dead_squares(["#" * width, "#@$" + " " * (width - 5) + ".#", "#" * width])
+        self.assertEqual(len(dead_squares), dead_squares.capacity)
+
+
+class BrokenEngine(GameEngine):
+    """第二次推箱子时计数出错的引擎，用来检验模糊测试能否发现问题"""
+
+    def move_player(self, dx, dy):
+        moved = super().move_player(dx, dy)
+        if moved and self.pushes == 2:
+            self.pushes = 3
+        return moved
+
+
+class BrokenCollapseEngine(GameEngine):
+    """截断移动记录时多删一步的引擎，局面不变但 solution() 回放不到当前局面"""
+
+    def __init__(self, layout):
+        super().__init__(layout, collapse_loops=True)
+
+    def truncate_history(self, end):
+        super().truncate_history(max(end - 1, 0))
+        self.cursor = min(self.cursor, len(self.history))
+
+
+class TestDifferentialFuzz(unittest.TestCase):
+    def test_engines_match_reference(self):
+        """测试现有引擎与参考实现一致"""
+        report = fuzz(sequences=200, length=100, seed=1)
+        self.assertEqual(report['sequences'], 200)
+        self.assertEqual(report['failures'], [])
+
+    def test_shrink(self):
+        """测试不一致的序列被缩减为最短复现用例"""
+        sequence = "llldd" + "uddu" * 5 + "rrrrrr"
+        self.assertIsNotNone(find_divergence(SIMPLE_LEVEL, sequence, BrokenEngine))
+        self.assertEqual(shrink(SIMPLE_LEVEL, sequence, BrokenEngine), "rrr")
+
+    def test_exact_sequence_count(self):
+        """测试序列数不能被批数整除时也恰好运行指定的数量"""
+        for sequences in (1, 10, 13):
+            report = fuzz(sequences=sequences, length=20, seed=2, workers=1)
+            self.assertEqual(report['sequences'], sequences)
+
+    def test_collapse_loops(self):
+        """测试折叠绕圈的引擎：局面与参考实现一致，solution() 能回放到当前局面"""
+        report = fuzz(sequences=40, length=150, seed=3, candidates=['collapse'])
+        self.assertEqual(report['failures'], [])
+
+        sequence = "rr" + "lr" * 2 + "r"
+        self.assertIsNone(find_divergence(SIMPLE_LEVEL, sequence,
+                                          lambda layout: GameEngine(layout, collapse_loops=True)))
+        engine = BrokenCollapseEngine(SIMPLE_LEVEL)
+        for char in sequence:
+            engine.move_player(*DIRECTIONS[char])
+        self.assertFalse(replays(SIMPLE_LEVEL, engine))
+        self.assertIsNotNone(find_divergence(SIMPLE_LEVEL, sequence, BrokenCollapseEngine))
+
+
+if __name__ == '__main__':
+    unittest.main()
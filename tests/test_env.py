@@ -0,0 +1,196 @@
+import sys
+import os
+import unittest
+import random
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_env import BatchSokobanEnv
+from levels.builtin import BUILTIN_LEVELS
+from sokoban_env import (OBS_BOX, OBS_PLAYER, OBS_TARGET, OBS_WALL, REWARD_BOX_OFF_TARGET,
+                         REWARD_BOX_ON_TARGET, REWARD_SOLVED, REWARD_STEP, SokobanEnv)
+
+# 玩家右边两格是箱子，再右边两格是目标点；第二行的箱子开局就在目标点上
+LEVELS = [
+    [
+        "#######",
+        "#@ $ .#",
+        "#######"
+    ],
+    [
+        "######",
+        "#@*  #",
+        "#. $ #",
+        "######"
+    ],
+]
+
+
+class TestSokobanEnv(unittest.TestCase):
+    def test_reset_observation(self):
+        """测试初始观测的形状和各格子的位标记"""
+        env = SokobanEnv(LEVELS)
+        observation = env.reset(0)
+        self.assertEqual(observation.shape, (3, 7))
+        self.assertEqual(observation.dtype, np.uint8)
+        self.assertTrue((observation[0] == OBS_WALL).all())
+        self.assertEqual(observation[1, 1], OBS_PLAYER)
+        self.assertEqual(observation[1, 2], 0)
+        self.assertEqual(observation[1, 3], OBS_BOX)
+        self.assertEqual(observation[1, 5], OBS_TARGET)
+
+        observation = env.reset(1)
+        self.assertEqual(observation.shape, (4, 6))
+        self.assertEqual(observation[1, 2], OBS_BOX | OBS_TARGET)
+        self.assertEqual(observation[2, 1], OBS_TARGET)
+
+    def test_step_rewards(self):
+        """测试走路、推箱和把箱子推上目标点的奖励，推完以后这一局结束"""
+        env = SokobanEnv(LEVELS)
+        env.reset(0)
+        observation, reward, done, info = env.step(3)
+        self.assertAlmostEqual(reward, REWARD_STEP)
+        self.assertFalse(done)
+        self.assertEqual((info['moves'], info['pushes']), (1, 0))
+        self.assertEqual(observation[1, 2], OBS_PLAYER)
+
+        observation, reward, done, info = env.step('r')
+        self.assertAlmostEqual(reward, REWARD_STEP)
+        self.assertFalse(done)
+        self.assertEqual((info['moves'], info['pushes']), (2, 1))
+        self.assertEqual(observation[1, 3], OBS_PLAYER)
+        self.assertEqual(observation[1, 4], OBS_BOX)
+
+        observation, reward, done, info = env.step(3)
+        self.assertAlmostEqual(reward, REWARD_STEP + REWARD_BOX_ON_TARGET + REWARD_SOLVED)
+        self.assertTrue(done)
+        self.assertTrue(info['solved'])
+        self.assertEqual(observation[1, 5], OBS_BOX | OBS_TARGET)
+
+    def test_push_off_target(self):
+        """测试把箱子推离目标点的奖励"""
+        env = SokobanEnv(LEVELS)
+        env.reset(1)
+        observation, reward, done, info = env.step(3)
+        self.assertAlmostEqual(reward, REWARD_STEP + REWARD_BOX_OFF_TARGET)
+        self.assertFalse(done)
+        self.assertEqual(observation[1, 2], OBS_TARGET | OBS_PLAYER)
+        self.assertEqual(observation[1, 3], OBS_BOX)
+        self.assertEqual(info['boxes_on_targets'], 0)
+
+    def test_illegal_move(self):
+        """测试撞墙的动作不改变局面，只计一步"""
+        env = SokobanEnv(LEVELS)
+        start = env.reset(0)
+        for action in (0, 1, 2):
+            observation, reward, done, info = env.step(action)
+            self.assertFalse(info['moved'])
+            self.assertAlmostEqual(reward, REWARD_STEP)
+            self.assertFalse(done)
+            np.testing.assert_array_equal(observation, start)
+        self.assertEqual((info['moves'], env.steps), (0, 3))
+
+    def test_step_limit(self):
+        """测试达到步数上限时这一局结束"""
+        env = SokobanEnv(LEVELS, max_steps=3)
+        env.reset(0)
+        dones = [env.step(2)[2] for _ in range(3)]
+        self.assertEqual(dones, [False, False, True])
+
+        env = SokobanEnv(LEVELS, max_steps=None)
+        env.reset(0)
+        self.assertFalse(any(env.step(2)[2] for _ in range(500)))
+
+    def test_step_before_reset(self):
+        with self.assertRaises(RuntimeError):
+            SokobanEnv(LEVELS).step(0)
+
+    def test_level_without_player(self):
+        """测试没有玩家的关卡在 reset() 时被拒绝，之前的一局不受影响"""
+        env = SokobanEnv(LEVELS + [["#####", "# $.#", "#####"]])
+        env.reset(0)
+        with self.assertRaises(ValueError):
+            env.reset(2)
+        self.assertEqual(env.level_id, 0)
+        self.assertTrue(env.step(3)[3]['moved'])
+
+
+class TestBatchSokobanEnv(unittest.TestCase):
+    def run_streams(self, levels, level_ids, steps, max_steps, auto_reset, seed):
+        """同一组随机动作分别交给批量环境和逐个的 SokobanEnv，逐步比较观测、奖励和结束标志"""
+        rng = random.Random(seed)
+        batch = BatchSokobanEnv(levels, max_steps=max_steps, auto_reset=auto_reset)
+        envs = [SokobanEnv(levels, max_steps=max_steps) for _ in level_ids]
+        observations = batch.reset(level_ids)
+        singles = [env.reset(level_id) for env, level_id in zip(envs, level_ids)]
+        finished = [False] * len(envs)
+        resets = 0
+
+        def check(observations, singles):
+            for i, single in enumerate(singles):
+                height, width = single.shape
+                # 批量环境四周多一圈补齐格
+                np.testing.assert_array_equal(observations[i, 1:height + 1, 1:width + 1], single)
+
+        check(observations, singles)
+        for _ in range(steps):
+            actions = [rng.randrange(4) for _ in envs]
+            observations, rewards, dones, info = batch.step(actions)
+            for i, (env, action) in enumerate(zip(envs, actions)):
+                if finished[i]:
+                    # 不自动重开时，结束的游戏忽略动作
+                    self.assertEqual(rewards[i], 0.0)
+                    self.assertTrue(dones[i])
+                    continue
+                single, reward, done, single_info = env.step(action)
+                self.assertAlmostEqual(rewards[i], reward)
+                self.assertEqual(bool(dones[i]), done)
+                self.assertEqual(info['moves'][i], single_info['moves'])
+                self.assertEqual(info['pushes'][i], single_info['pushes'])
+                if done and auto_reset:
+                    height, width = single.shape
+                    np.testing.assert_array_equal(
+                        info['final_observation'][i, 1:height + 1, 1:width + 1], single)
+                    single = env.reset(level_ids[i])
+                    resets += 1
+                elif done:
+                    finished[i] = True
+                singles[i] = single
+            check(observations, singles)
+        return resets, finished
+
+    def test_matches_single_envs(self):
+        """测试随机动作下与逐个 SokobanEnv 的结果一致"""
+        level_ids = [i % len(BUILTIN_LEVELS) for i in range(16)]
+        _, finished = self.run_streams(BUILTIN_LEVELS, level_ids, 300, 200, False, 1)
+        self.assertTrue(any(finished))
+
+    def test_auto_reset(self):
+        """测试结束的游戏自动重开，包括过关和达到步数上限两种情况"""
+        level_ids = [0, 0, 1, 1, 0, 1]
+        resets, _ = self.run_streams(LEVELS, level_ids, 400, 30, True, 2)
+        self.assertGreater(resets, len(level_ids))
+
+        # 一直往右推就能过关
+        batch = BatchSokobanEnv(LEVELS, max_steps=None, auto_reset=True)
+        start = batch.reset([0])
+        for _ in range(2):
+            observations, rewards, dones, info = batch.step([3])
+            self.assertFalse(dones[0])
+        observations, rewards, dones, info = batch.step([3])
+        self.assertTrue(dones[0] and info['solved'][0])
+        self.assertEqual(info['moves'][0], 3)
+        self.assertEqual(info['final_observation'][0, 2, 6], OBS_BOX | OBS_TARGET)
+        np.testing.assert_array_equal(observations, start)
+        self.assertEqual((batch.moves[0], batch.steps[0]), (0, 0))
+
+    def test_step_before_reset(self):
+        with self.assertRaises(RuntimeError):
+            BatchSokobanEnv(LEVELS).step([0])
+
+
+if __name__ == '__main__':
+    unittest.main()
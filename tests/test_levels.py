@@ -1,13 +1,20 @@
 import sys
 import os
 import unittest
+import tempfile
+import time
 import pygame
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import endgame
 from sokoban import Sokoban
-from levels import LEVELS, LEVEL_DATA
+from levels import LEVELS, LEVEL_DATA, Level, load_levels
+from levels.builtin import BUILTIN_LEVELS
+from structure import level_structure
+from collection_analysis import PAD, analyze_levels, border_cells, level_masks, pack_levels
+
 
 class TestSokobanLevels(unittest.TestCase):
     @classmethod
@@ -17,6 +24,10 @@ class TestSokobanLevels(unittest.TestCase):
         # 不要初始化音频系统
         # pygame.mixer.init()
         pygame.display.set_mode((800, 600))  # 创建一个测试窗口
+        # 游戏只读取残局库文件，指向空的临时目录，不受仓库里已有文件的影响
+        cls.endgame_dir = tempfile.TemporaryDirectory()
+        cls.saved_endgame_dir = endgame.ENDGAME_DIR
+        endgame.ENDGAME_DIR = cls.endgame_dir.name
 
     def test_all_levels(self):
         """测试所有关卡的可解性"""
@@ -44,6 +55,28 @@ class TestSokobanLevels(unittest.TestCase):
                 # 注意：这里只是基本的完整性检查，不是求解算法
                 self.assertTrue(len(game.level) > 0, f"关卡 {i+1} 为空")
 
+    def test_hint_runs_in_worker(self):
+        """测试按 H 时提示在工作进程中搜索，界面线程不等待结果"""
+        game = Sokoban()
+        game.current_level = next(i for i, level in enumerate(LEVELS) if level.name == "三箱子迷宫")
+        game.reset_level()
+        start = time.monotonic()
+        game.show_hint()
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertIsNone(game.hint)
+        deadline = time.monotonic() + 10
+        while game.hint_search is not None and time.monotonic() < deadline:
+            game.update_hint()
+            time.sleep(0.01)
+        self.assertIsNotNone(game.hint)
+        self.assertIn(game.hint[0], game.boxes)
+
+        # 移动后旧的提示和还没有结束的搜索都作废
+        game.show_hint()
+        game.clear_hint()
+        self.assertIsNone(game.hint_search)
+        self.assertIsNone(game.hint_text)
+
     def test_level_metadata(self):
         """测试关卡元数据的完整性"""
         self.assertEqual(len(LEVELS), len(LEVEL_DATA), "关卡数量与元数据数量不匹配")
@@ -63,6 +96,169 @@ class TestSokobanLevels(unittest.TestCase):
     def tearDownClass(cls):
         # 关闭Pygame
         pygame.quit()
+        endgame.ENDGAME_DIR = cls.saved_endgame_dir
+        cls.endgame_dir.cleanup()
+
+
+class TestLevelObject(unittest.TestCase):
+    def test_fixed_width_grid(self):
+        """测试关卡保存为定宽网格"""
+        level = Level(["#####", "#@$.#", "#####"], name="测试")
+        self.assertEqual((level.width, level.height), (5, 3))
+        self.assertEqual(level.grid, b"######@$.######")
+        self.assertEqual(level[0], "#####")
+        self.assertEqual(list(level), level.rows)
+        self.assertEqual(level.player, level.index(1, 1))
+        self.assertEqual(level.boxes, (level.index(2, 1),))
+        self.assertEqual(level.targets, (level.index(3, 1),))
+        self.assertEqual(level.position(level.player), (1, 1))
+
+    def test_ragged_rows(self):
+        """测试不等长的行被拒绝"""
+        with self.assertRaises(ValueError):
+            Level(["####", "#@$.#", "###"])
+        with self.assertRaises(ValueError):
+            Level.from_dict({'layout': ["#####", "#@$.#", "####"]})
+
+    def test_par_defaults(self):
+        """测试没有目标步数的关卡不会得到编造的数字"""
+        level = Level.from_dict({'layout': ["#####", "#@$.#", "#####"]})
+        self.assertEqual((level.par_moves, level.par_pushes), (0, 0))
+        self.assertEqual(Level(["#@$.#"]).metadata()['par_moves'], 0)
+
+    def test_immutable_and_interned(self):
+        """测试关卡不可修改，元数据字符串被驻留"""
+        first = Level(["#@$.#"], difficulty="".join(["简", "单"]))
+        second = Level(["#@$.#"], difficulty="简单")
+        self.assertIs(first.difficulty, second.difficulty)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        with self.assertRaises(AttributeError):
+            first.name = "修改"
+        with self.assertRaises(ValueError):
+            Level(["#@x#"])
+
+    def test_loaded_levels(self):
+        """测试加载的关卡都是 Level 对象且元数据一致"""
+        for level, level_data in zip(LEVELS, LEVEL_DATA):
+            self.assertIsInstance(level, Level)
+            self.assertEqual(level.metadata(), level_data)
+        self.assertEqual(len(BUILTIN_LEVELS), 10)
+
+    def test_load_levels_is_lazy(self):
+        """测试加载关卡时不计算死格表，也不留下缓存"""
+        from engine import dead_squares
+        saved = dead_squares.entries.copy()
+        self.addCleanup(dead_squares.entries.update, saved)
+        dead_squares.cache_clear()
+        levels, _ = load_levels()
+        self.assertEqual(levels, LEVELS)
+        self.assertEqual(len(dead_squares), 0)
+
+
+class TestLevelStructure(unittest.TestCase):
+    LAYOUT = [
+        "#########",
+        "#@ $    #",
+        "#   ### #",
+        "#####.# #",
+        "    #.  #",
+        "    #####"
+    ]
+
+    def test_tunnels_and_articulations(self):
+        structure = level_structure(self.LAYOUT)
+        self.assertIs(level_structure(list(self.LAYOUT)), structure)
+        self.assertEqual(structure.tunnels,
+                         {(4, 1), (5, 1), (6, 1), (7, 2), (7, 3), (6, 4), (5, 3)})
+        # 右侧通道上的每一格都是关节格，左边的开阔区域没有
+        self.assertIn((7, 2), structure.articulations)
+        self.assertIn((3, 1), structure.articulations)
+        self.assertNotIn((1, 1), structure.articulations)
+
+    def test_goal_rooms(self):
+        """两个目标点在同一个房间里，入口是离它们最近的关节格"""
+        structure = level_structure(self.LAYOUT)
+        self.assertEqual(structure.goal_rooms, [((6, 4), {(5, 3), (5, 4)})])
+        self.assertEqual(structure.room_of[(5, 3)], 0)
+        self.assertNotIn((6, 4), structure.room_of)
+
+
+class TestCollectionAnalysis(unittest.TestCase):
+    VALID = [
+        "#####",
+        "#@$.#",
+        "#####"
+    ]
+    # 右边的出口通向关卡外面
+    OPEN = [
+        "#######",
+        "#@$.   ",
+        "#######"
+    ]
+    UNBALANCED = [
+        "######",
+        "#@$$.#",
+        "######"
+    ]
+    # 右边隔开的房间里的箱子和目标点，玩家到不了
+    STRAY = [
+        "########",
+        "#@$.#$.#",
+        "########"
+    ]
+    NO_PLAYER = [
+        "#####",
+        "# $.#",
+        "#####"
+    ]
+
+    def test_padding(self):
+        """测试较小的关卡补齐到最大的宽高，补齐格不算墙也不算地面"""
+        tall = self.VALID + ["#   #", "#####"]
+        grids, levels = pack_levels([self.VALID, self.STRAY, tall])
+        self.assertEqual(grids.shape, (3, 5, 8))
+        self.assertEqual([level.rows for level in levels], [self.VALID, self.STRAY, tall])
+        self.assertTrue((grids[0, :, 5:] == PAD).all())
+        self.assertTrue((grids[0, 3:, :] == PAD).all())
+        self.assertFalse((grids[0, :3, :5] == PAD).any())
+
+        masks = level_masks(grids)
+        self.assertFalse((masks['walls'] | masks['floor'])[0, :, 5:].any())
+        self.assertEqual(masks['walls'][0].sum(), 12)
+        self.assertEqual(masks['floor'][0].sum(), 3)
+        self.assertEqual(masks['floor'][2].sum(), 6)
+
+        # 补齐区域旁边的格子算作边缘
+        border = border_cells(grids)
+        self.assertTrue(border[0, 1, 4])
+        self.assertFalse(border[0, 1, 2])
+        self.assertFalse(border[0, 3, 0])
+
+    def test_analysis(self):
+        """测试封闭性、箱子与目标点数量和有效性判断"""
+        results = analyze_levels([self.VALID, self.OPEN, self.UNBALANCED, self.STRAY,
+                                  self.NO_PLAYER])
+        self.assertEqual(list(results['index']), [0, 1, 2, 3, 4])
+        self.assertEqual(list(results['enclosed']), [True, False, True, True, True])
+        self.assertEqual(list(results['balanced']), [True, True, False, True, True])
+        self.assertEqual(list(results['valid']), [True, False, False, False, False])
+        self.assertEqual(list(results['boxes']), [1, 1, 2, 2, 1])
+        self.assertEqual(list(results['targets']), [1, 1, 1, 2, 1])
+        self.assertEqual(list(results['players']), [1, 1, 1, 1, 0])
+        self.assertEqual(results['interior'][0], 3)
+        self.assertEqual(results['interior'][3], 3)
+        self.assertEqual(list(results['width']), [5, 7, 6, 8, 5])
+
+        # 结构化数组可以直接筛选
+        self.assertEqual(list(results[~results['enclosed']]['index']), [1])
+
+    def test_builtin_levels(self):
+        results = analyze_levels(LEVELS)
+        self.assertEqual(len(results), len(LEVELS))
+        self.assertTrue(results['enclosed'].all())
+        self.assertEqual(list(results['players']), [1] * len(LEVELS))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,555 @@
+import sys
+import os
+import unittest
+import random
+import tempfile
+import asyncio
+import time
+import json
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameEngine
+from levels import LEVELS
+from levels.builtin import BUILTIN_LEVELS
+from solver import Solver, solve, solve_moves
+from lower_bound import INF, PushLowerBound
+from push_distances import UNREACHABLE, PushDistances, push_distances
+from pattern_db import HEADER, PatternDatabase, PatternDatabaseError, open_pattern_database, pattern_path
+from endgame import EndgameDatabase, endgame_database, endgame_path, main as endgame_main, read
+from bounded_solver import BoundedSolver, ClockTable, solve_bounded
+from parallel_solver import ParallelSolver, SharedTranspositionTable, fingerprint, solve_parallel
+from anytime_solver import AnytimeSearch, reap_cancelled, solve_anytime
+from solution_optimizer import SolutionOptimizer, main as optimizer_main, optimize_solution
+from hint import HintEngine, HintSearch, next_push
+from engine import DELTAS, parse_level
+
+SIMPLE_LEVEL = [
+    "#######",
+    "#@ $ .#",
+    "#######"
+]
+
+
+def level_named(name):
+    return next(level for level in LEVELS if level.name == name)
+
+
+class TestSolver(unittest.TestCase):
+    def assertSolves(self, layout, moves):
+        """解必须能在 GameEngine 中完整执行并过关"""
+        engine = GameEngine(layout)
+        self.assertEqual(engine.play(moves), len(moves))
+        self.assertTrue(engine.check_win())
+        return engine
+
+    def test_simple_level(self):
+        moves = solve(SIMPLE_LEVEL)
+        self.assertEqual(moves, "rRR")
+        self.assertSolves(SIMPLE_LEVEL, moves)
+
+    def test_push_optimal(self):
+        """推箱次数与穷举搜索得到的最优值一致"""
+        for name, pushes in (("三箱子迷宫", 11), ("多箱子协同", 14)):
+            with self.subTest(level=name):
+                level = level_named(name)
+                engine = self.assertSolves(level, solve(level))
+                self.assertEqual(engine.pushes, pushes)
+
+    def test_ida_star_matches_astar(self):
+        level = level_named("三箱子迷宫")
+        self.assertEqual(len(Solver(level).ida_star()), len(Solver(level).astar()))
+
+    def test_node_limit_applies_to_ida_star(self):
+        """A* 超出节点上限后改用的 IDA* 有自己的上限"""
+        level = level_named("三箱子迷宫")
+        solver = Solver(level)
+        self.assertIsNone(solver.solve(max_nodes=5, ida_max_nodes=5))
+        self.assertLessEqual(solver.nodes, 6)
+        # A* 找不到时 IDA* 仍然能在自己的上限内找到推动次数最少的解
+        engine = self.assertSolves(level, Solver(level).solve(max_nodes=5))
+        self.assertEqual(engine.pushes, 11)
+        self.assertEqual(len(Solver(level).solve(max_nodes=None)), len(solve(level)))
+
+    def test_unsolvable_time_limit(self):
+        """测试搜索无解的关卡时不超过时间上限，不限节点数也一样"""
+        level = next(level for level in BUILTIN_LEVELS if level.name == "宗师之境")
+        for search in (lambda solver: solver.solve(time_limit=0.5),
+                       lambda solver: solver.solve(None, 0.5, None),
+                       lambda solver: solver.solve_moves(time_limit=0.5)):
+            start = time.monotonic()
+            self.assertIsNone(search(Solver(level)))
+            self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_move_optimal(self):
+        """步数与穷举 (箱子, 玩家) 状态的广度优先搜索结果一致"""
+        self.assertEqual(solve_moves(SIMPLE_LEVEL), "rRR")
+        for name, moves in (("三箱子迷宫", 27), ("多箱子协同", 28)):
+            with self.subTest(level=name):
+                level = level_named(name)
+                solution = solve_moves(level)
+                self.assertEqual(len(solution), moves)
+                self.assertSolves(level, solution)
+
+    def test_move_time_limit(self):
+        self.assertIsNone(Solver(level_named("多箱子协同")).solve_moves(time_limit=0))
+
+    def test_unsolvable(self):
+        # 箱子比目标点多
+        self.assertIsNone(solve(["######", "#@$$.#", "######"]))
+        # 箱子在死角
+        self.assertIsNone(solve(["####", "#$ #", "#@.#", "####"]))
+
+
+class TestPushLowerBound(unittest.TestCase):
+    def test_incremental_matches_reset(self):
+        """随机游玩时增量更新的结果与从头求解一致"""
+        rng = random.Random(5)
+        for level in LEVELS:
+            engine = GameEngine(level)
+            bound = PushLowerBound(level)
+            fresh = PushLowerBound(level)
+            for _ in range(200):
+                engine.play(rng.choice('udlr'))
+                if rng.random() < 0.1:
+                    engine.undo()
+                fresh.reset(engine.boxes)
+                self.assertEqual(bound.sync(engine.boxes), fresh.value)
+
+    def test_bound_values(self):
+        # 两个箱子最近的目标点相同，只按最近距离求和是 3 + 1，匹配后是 3 + 2
+        bound = PushLowerBound(["########", "#@$ $..#", "########"])
+        self.assertEqual(bound.value, 5)
+        bound.sync({(3, 1), (4, 1)})
+        self.assertEqual(bound.value, 4)
+        # 箱子在死角
+        self.assertEqual(PushLowerBound(["####", "#$ #", "#@.#", "####"]).value, INF)
+        # 不超过最优解的推动次数
+        level = level_named("多箱子协同")
+        self.assertLessEqual(PushLowerBound(level).value, 14)
+
+
+class TestPushDistances(unittest.TestCase):
+    def test_table(self):
+        """推动距离要求箱子后面有玩家的站位"""
+        table = PushDistances([
+            "######",
+            "#@$ .#",
+            "#   .#",
+            "######"
+        ])
+        self.assertEqual(table.targets, [(4, 1), (4, 2)])
+        self.assertEqual(list(table.distances((2, 1))), [2, UNREACHABLE])
+        self.assertEqual(table.distance((2, 2), (4, 2)), 2)
+        self.assertEqual(table.to_nearest((3, 2)), 1)
+        # 靠墙的格子只能沿墙推
+        self.assertEqual(table.to_nearest((1, 2)), UNREACHABLE)
+
+    def test_numpy_view_and_cache(self):
+        level = level_named("多箱子协同")
+        table = push_distances(level)
+        self.assertIs(push_distances(level), table)
+        view = table.as_numpy()
+        self.assertEqual(view.shape, (table.height, table.width, len(table.targets)))
+        for t, target in enumerate(table.targets):
+            self.assertEqual(view[target[1], target[0], t], 0)
+        self.assertEqual(view.min(axis=2).ravel().tolist(), list(table.nearest))
+
+
+class TestPatternDatabase(unittest.TestCase):
+    LAYOUT = [
+        "#######",
+        "#     #",
+        "# $.  #",
+        "# $.@ #",
+        "#     #",
+        "#######"
+    ]
+
+    def test_build_and_lookup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            level_path = os.path.join(directory, 'level.json')
+            db = open_pattern_database(self.LAYOUT, level_path, size=2)
+            self.assertEqual(db.path, pattern_path(level_path, 2))
+            self.assertEqual(db.cost([(2, 2), (2, 3)]), 2)
+            self.assertEqual(db.cost([(3, 2), (3, 3)]), 0)
+            # 死角里的箱子
+            self.assertIsNone(db.cost([(1, 1), (3, 3)]))
+            # 两个箱子的模式数据库对整个关卡是精确的
+            self.assertEqual(db.lower_bound([(2, 2), (2, 3)]),
+                             sum(c.isupper() for c in solve(self.LAYOUT)))
+            db.close()
+
+    def test_layout_change_rebuilds(self):
+        with tempfile.TemporaryDirectory() as directory:
+            level_path = os.path.join(directory, 'level.json')
+            open_pattern_database(self.LAYOUT, level_path, size=2).close()
+            changed = list(self.LAYOUT)
+            changed[1] = "#   # #"
+            with self.assertRaises(PatternDatabaseError):
+                PatternDatabase(pattern_path(level_path, 2), changed)
+            open_pattern_database(changed, level_path, size=2).close()
+            reopened = PatternDatabase(pattern_path(level_path, 2), changed)
+            self.assertEqual(reopened.cost([(2, 2), (2, 3)]), 2)
+            reopened.close()
+
+    def test_empty_or_truncated_file_rebuilds(self):
+        with tempfile.TemporaryDirectory() as directory:
+            level_path = os.path.join(directory, 'level.json')
+            path = pattern_path(level_path, 2)
+            open_pattern_database(self.LAYOUT, level_path, size=2).close()
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 空文件、文件头不完整、活格表不完整
+            for content in (b'', data[:10], data[:HEADER.size + 3]):
+                with open(path, 'wb') as f:
+                    f.write(content)
+                with self.assertRaises(PatternDatabaseError):
+                    PatternDatabase(path, self.LAYOUT)
+                db = open_pattern_database(self.LAYOUT, level_path, size=2)
+                self.assertEqual(db.cost([(2, 2), (2, 3)]), 2)
+                db.close()
+
+
+class TestEndgameDatabase(unittest.TestCase):
+    LAYOUT = TestPatternDatabase.LAYOUT
+
+    def test_exact_distances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = EndgameDatabase(self.LAYOUT, depth=3, directory=directory).start()
+            self.assertTrue(db.wait(10))
+            self.assertEqual(db.depth, 3)
+            self.assertEqual(db.lookup({(2, 2), (2, 3)}, (4, 3)), 2)
+            self.assertEqual(db.lookup({(3, 2), (3, 3)}, (4, 3)), 0)
+            # 超过 3 次推动的局面不在表里
+            self.assertIsNone(db.lookup({(2, 1), (2, 4)}, (4, 3)))
+
+            # 表里的距离与求解器的最优推动次数一致
+            for (boxes, low), distance in db.table.items():
+                solver = Solver(self.LAYOUT)
+                solver.board.initial_boxes = boxes
+                solver.board.initial_player = low
+                self.assertEqual(len(solver.astar()), distance)
+
+    def test_persisted_per_layout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = EndgameDatabase(self.LAYOUT, depth=3, directory=directory).start()
+            db.wait(10)
+            self.assertEqual(db.path, endgame_path(self.LAYOUT, directory))
+            requested, depth, table = read(self.LAYOUT, db.path)
+            self.assertEqual((requested, depth, table), (3, 3, db.table))
+
+            changed = list(self.LAYOUT)
+            changed[1] = "#   # #"
+            self.assertIsNone(read(changed, db.path))
+            self.assertNotEqual(endgame_path(changed, directory), db.path)
+
+    def test_game_only_reads_files(self):
+        """测试游戏用的残局库只读取离线构建的文件，没有文件时不构建"""
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch('endgame.ENDGAME_DIR', directory):
+                db = endgame_database(self.LAYOUT)
+                endgame_database.entries.pop(tuple(self.LAYOUT))
+            self.assertTrue(db.wait(10))
+            self.assertIsNone(db.table)
+            self.assertIsNone(db.lookup({(3, 2), (3, 3)}, (4, 3)))
+            self.assertEqual(os.listdir(directory), [])
+
+            level_path = os.path.join(directory, 'level.json')
+            with open(level_path, 'w', encoding='utf-8') as f:
+                json.dump({'layout': self.LAYOUT}, f)
+            argv = ['endgame.py', level_path, '--depth', '3', '--directory', directory]
+            with mock.patch('sys.argv', argv), mock.patch('builtins.print'):
+                self.assertEqual(endgame_main(), 0)
+            # 文件的层数比要求的少也照用
+            db = EndgameDatabase(self.LAYOUT, directory=directory, build=False).start()
+            self.assertTrue(db.wait(10))
+            self.assertEqual(db.depth, 3)
+            self.assertEqual(db.lookup({(2, 2), (2, 3)}, (4, 3)), 2)
+
+    def test_state_limit_keeps_complete_layers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = EndgameDatabase(self.LAYOUT, depth=10, directory=directory, max_states=8).start()
+            db.wait(10)
+            self.assertLess(db.depth, 10)
+            self.assertLessEqual(len(db.table), 8)
+            self.assertEqual(max(db.table.values()), db.depth)
+
+
+class TestBoundedSolver(unittest.TestCase):
+    def test_clock_table_evicts_unreferenced(self):
+        table = ClockTable(3)
+        for key in (1, 2, 3):
+            table.add(key)
+        self.assertIn(1, table)
+        table.add(4)
+        # 1 刚被命中，淘汰的是 2
+        self.assertEqual(len(table), 3)
+        self.assertNotIn(2, table)
+        self.assertIn(1, table)
+        self.assertIn(4, table)
+        self.assertEqual(table.evictions, 1)
+
+    def test_matches_unbounded_solver(self):
+        for name, pushes in (("三箱子迷宫", 11), ("多箱子协同", 14)):
+            with self.subTest(level=name):
+                level = level_named(name)
+                with tempfile.TemporaryDirectory() as directory:
+                    # 很小的内存上限，迫使前沿多次写到磁盘
+                    # 每次最多归并 2 个段，迫使归并分多轮进行
+                    solver = BoundedSolver(level, memory_limit=20000, spill_dir=directory,
+                                           fan_in=2)
+                    moves = solver.solve()
+                    self.assertGreater(solver.runs_written, pushes)
+                    self.assertGreater(solver.merge_passes, 0)
+                    self.assertEqual(os.listdir(directory), [])
+                engine = TestSolver.assertSolves(self, level, moves)
+                self.assertEqual(engine.pushes, pushes)
+
+    def test_simple_and_unsolvable(self):
+        self.assertEqual(solve_bounded(SIMPLE_LEVEL), "rRR")
+        self.assertIsNone(solve_bounded(["######", "#@$$.#", "######"]))
+        self.assertIsNone(BoundedSolver(level_named("多箱子协同")).solve(time_limit=0))
+        self.assertIsNone(BoundedSolver(level_named("多箱子协同")).solve(max_nodes=10))
+        self.assertEqual(BoundedSolver(SIMPLE_LEVEL).solve(200000, None), "rRR")
+
+
+class TestParallelSolver(unittest.TestCase):
+    def test_shared_table(self):
+        table = SharedTranspositionTable(size=64, stripes=4)
+        try:
+            values = [fingerprint(state) for state in range(100)]
+            self.assertEqual(len(set(values)), 100)
+            self.assertTrue(table.add(values[0]))
+            self.assertFalse(table.add(values[0]))
+            # 段满以后仍然返回 True，不会把新局面误当成重复
+            self.assertTrue(all(table.add(value) for value in values[1:]))
+            self.assertEqual(len(table), 64)
+        finally:
+            table.close()
+            table.unlink()
+
+    def test_matches_sequential_solver(self):
+        for name, pushes in (("三箱子迷宫", 11), ("多箱子协同", 14)):
+            for processes in (1, 2):
+                with self.subTest(level=name, processes=processes):
+                    level = level_named(name)
+                    moves = ParallelSolver(level, processes, table_size=1 << 16).solve()
+                    engine = TestSolver.assertSolves(self, level, moves)
+                    self.assertEqual(engine.pushes, pushes)
+
+    def test_simple_and_unsolvable(self):
+        self.assertEqual(solve_parallel(SIMPLE_LEVEL, processes=2), "rRR")
+        self.assertIsNone(solve_parallel(["######", "#@$$.#", "######"], processes=2))
+        self.assertIsNone(ParallelSolver(level_named("多箱子协同"), 1).solve(max_nodes=10))
+
+
+class TestAnytimeSolver(unittest.TestCase):
+    def collect(self, *args, **kwargs):
+        async def run():
+            return [progress async for progress in solve_anytime(*args, poll_interval=0.01, **kwargs)]
+        return asyncio.run(run())
+
+    def test_improves_to_optimal(self):
+        level = level_named("三箱子迷宫")
+        updates = self.collect(level, time_limit=30)
+        final = updates[-1]
+        self.assertTrue(final.done)
+        self.assertTrue(final.optimal)
+        self.assertEqual(final.pushes, 11)
+        self.assertEqual(TestSolver.assertSolves(self, level, final.moves).pushes, 11)
+        # 解的长度只会越来越短
+        lengths = [progress.pushes for progress in updates if progress.pushes is not None]
+        self.assertEqual(lengths, sorted(lengths, reverse=True))
+
+    def test_start_from_state_and_unsolvable(self):
+        final = self.collect(SIMPLE_LEVEL, boxes={(4, 1)}, player_pos=(3, 1))[-1]
+        self.assertEqual((final.pushes, final.moves, final.optimal), (1, "R", True))
+        final = self.collect(["######", "#@$$.#", "######"])[-1]
+        self.assertEqual((final.pushes, final.optimal, final.done), (None, True, True))
+
+    def test_cancel(self):
+        search = AnytimeSearch(level_named("多箱子协同"), time_limit=30).start()
+        start = time.monotonic()
+        search.cancel()
+        # 取消不等待工作进程退出
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(search.poll(), [])
+        search.cancel()
+        deadline = time.monotonic() + 5
+        while reap_cancelled() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(search.process.is_alive())
+        self.assertEqual(reap_cancelled(), 0)
+
+
+class TestSolutionOptimizer(unittest.TestCase):
+    def noisy_solution(self, layout, noise, seed):
+        """随机走 noise 步（走进死局就撤销），再接上从那里开始的推动最优解
+
+        随机走到无解的局面时一直撤销到能解为止。
+        """
+        rng = random.Random(seed)
+        engine = GameEngine(layout)
+        while engine.moves < noise:
+            dx, dy = rng.choice(DELTAS)
+            if engine.move_player(dx, dy) and engine.deadlocked:
+                engine.undo()
+        while True:
+            solver = Solver(layout)
+            solver.board.initial_boxes = solver.board.to_bits(engine.boxes)
+            solver.board.initial_player = solver.board.index(*engine.player_pos)
+            tail = solver.solve()
+            if tail is not None:
+                return engine.solution() + tail
+            pushes = engine.pushes
+            while engine.pushes == pushes:
+                engine.undo()
+
+    def test_shortens_long_solution(self):
+        level = level_named("三箱子迷宫")
+        moves = self.noisy_solution(level, 5000, 3)
+        start = time.monotonic()
+        result = optimize_solution(level, moves)
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertLess(len(result), len(moves) // 10)
+        self.assertLessEqual(sum(c.isupper() for c in result), sum(c.isupper() for c in moves))
+        TestSolver.assertSolves(self, level, result)
+
+    def test_removes_push_cycles(self):
+        layout = ["#######",
+                  "#     #",
+                  "#@ $ .#",
+                  "#     #",
+                  "#######"]
+        # 箱子推过去又从另一侧推回来，然后才推到目标点
+        moves = "rR" + "urrdL" + "ulldRR"
+        optimizer = SolutionOptimizer(layout)
+        pushes = optimizer.parse(moves)
+        self.assertEqual(len(optimizer.remove_cycles(pushes)), 2)
+        self.assertEqual(optimize_solution(layout, moves), "rRR")
+
+    def test_invalid_solution(self):
+        with self.assertRaises(ValueError):
+            optimize_solution(SIMPLE_LEVEL, "rR")
+        with self.assertRaises(ValueError):
+            optimize_solution(SIMPLE_LEVEL, "lrRR")
+        self.assertEqual(optimize_solution(SIMPLE_LEVEL, "r R\nR"), "rRR")
+
+    def test_write_par(self):
+        """目标步数和推箱次数都来自优化后的解，手填的值被覆盖"""
+        with tempfile.TemporaryDirectory() as directory:
+            level_path = os.path.join(directory, 'level.json')
+            solution_path = os.path.join(directory, 'solution.txt')
+            with open(level_path, 'w', encoding='utf-8') as f:
+                json.dump({'layout': SIMPLE_LEVEL, 'par_moves': 1, 'par_pushes': 99}, f)
+            with open(solution_path, 'w', encoding='utf-8') as f:
+                f.write("rlrRR")
+            argv = ['solution_optimizer.py', level_path, solution_path, '--write-par']
+            with mock.patch('sys.argv', argv), mock.patch('builtins.print'):
+                self.assertEqual(optimizer_main(), 0)
+            with open(level_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.assertEqual((data['par_moves'], data['par_pushes']), (3, 2))
+
+
+class TestHintEngine(unittest.TestCase):
+    def test_simple_hint(self):
+        self.assertEqual(next_push(SIMPLE_LEVEL, {(3, 1)}, (1, 1), budget=0.05), ((3, 1), (1, 0)))
+        # 已经过关或无路可走
+        self.assertIsNone(next_push(SIMPLE_LEVEL, {(5, 1)}, (4, 1), budget=0.05))
+        self.assertIsNone(next_push(["######", "#@$$.#", "######"], {(2, 1), (3, 1)}, (1, 1),
+                                    budget=0.05))
+
+    def test_frozen_pushes_pruned(self):
+        layout = ["#######",
+                  "#.$  .#",
+                  "#  $  #",
+                  "#  @  #",
+                  "#######"]
+        engine = HintEngine(layout)
+        board = engine.board
+        boxes = board.initial_boxes
+        # 向上推以后两个箱子并排贴着上墙，冻结在目标点外；这一格本身不是死格
+        pushed = board.to_bits({(2, 1), (3, 1)})
+        self.assertTrue(engine.frozen(pushed, board.index(3, 1)))
+        self.assertFalse(engine.dead >> board.index(3, 1) & 1)
+        region = engine.reachable(boxes, board.initial_player)
+        pushes = [(board.position(box), board.position(dest)) for box, dest, _, _ in
+                  engine.moves(boxes, region, engine.heuristic(boxes))]
+        self.assertNotIn(((3, 2), (3, 1)), pushes)
+        self.assertIn(((3, 2), (4, 2)), pushes)
+
+    def test_frozen_matches_game_engine(self):
+        """提示搜索的冻结判定与 GameEngine.freeze_deadlock 在随机局面上结果相同（墙和死格的位图一致）"""
+        rng = random.Random(7)
+        checked = frozen = 0
+        for level in LEVELS:
+            engine = GameEngine(level)
+            hints = HintEngine(level)
+            board = hints.board
+            # 玩家能到的区域（忽略箱子）里随机摆放箱子
+            interior = sorted(board.to_positions(board.reachable(0, board.initial_player)))
+            count = min(len(interior), engine.box_count + 3)
+            for _ in range(100):
+                boxes = set(rng.sample(interior, count))
+                engine.boxes = boxes
+                bits = board.to_bits(boxes)
+                for box in boxes:
+                    expected = engine.freeze_deadlock(box)
+                    self.assertEqual(hints.frozen(bits, board.index(*box)), expected,
+                                     (level.name, sorted(boxes), box))
+                    checked += 1
+                    frozen += expected
+        self.assertGreater(frozen, 0)
+        self.assertGreater(checked - frozen, 0)
+
+    def test_follow_hints(self):
+        level = level_named("三箱子迷宫")
+        engine = GameEngine(level)
+        hints = HintEngine(level, seed=0)
+        for _ in range(20):
+            if engine.check_win():
+                break
+            moves = hints.hint_moves(engine.boxes, engine.player_pos, budget=10, iterations=100)
+            self.assertEqual(engine.play(moves), len(moves))
+        self.assertTrue(engine.check_win())
+        self.assertEqual(engine.pushes, 11)
+
+    def test_time_budget(self):
+        level = level_named("多箱子协同")
+        start = time.monotonic()
+        self.assertIsNotNone(next_push(level, parse_level(level)[1], parse_level(level)[3],
+                                       budget=0.1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_worker_search(self):
+        """测试在工作进程中搜索提示，启动和读取结果都不阻塞"""
+        for boxes, player_pos, expected in (({(3, 1)}, (1, 1), ((3, 1), (1, 0))),
+                                            ({(5, 1)}, (4, 1), None)):
+            start = time.monotonic()
+            search = HintSearch(SIMPLE_LEVEL, boxes, player_pos, budget=0.05).start()
+            self.assertFalse(search.done)
+            self.assertLess(time.monotonic() - start, 0.1)
+            deadline = time.monotonic() + 10
+            while not search.poll() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(search.done)
+            self.assertEqual(search.hint, expected)
+            self.assertFalse(search.poll())
+            search.cancel()
+
+        level = level_named("多箱子协同")
+        search = HintSearch(level, parse_level(level)[1], parse_level(level)[3], budget=5).start()
+        search.cancel()
+        self.assertFalse(search.poll())
+        deadline = time.monotonic() + 5
+        while reap_cancelled() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(search.process.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()